@@ -0,0 +1,158 @@
+# aec.py
+# 스피커로 나간 소리(재생 워커가 쓴 PCM)를 참조 신호로 써서 녹음에서 꾸로 자신의 목소리(에코)를 뺌
+# - 전체 지연: GCC-PHAT 로 한 번 추정 (ALSA/USB 버퍼 + 스피커~마이크 거리)
+# - 남은 방 반사: 주파수 영역 적응 필터 (FDAF, overlap-save, 정규화 스텝)
+# - numpy 가 없으면 그대로 통과 (enabled() False)
+#   python aec.py --eval mic.wav ref.wav   → 녹음 fixture 로 지연/ERLE 측정
+#   python aec.py --selftest               → 합성 fixture 로 같은 측정
+import os, sys, math, wave
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+RATE = 16000
+BLOCK = 256                      # 16ms 블록, 필터 길이도 256 taps (지연 보정 뒤 남은 반사용)
+MU = 0.4
+POWER_SMOOTH = 0.9
+MAX_DELAY_SEC = float(os.getenv("AEC_MAX_DELAY_MS", "400")) / 1000
+MIN_REF_RMS = 100.0              # 참조가 이보다 조용하면 (스피커 무음) AEC 생략
+
+
+def enabled() -> bool:
+    return np is not None and os.getenv("AEC", "1") == "1"
+
+
+def _f32(pcm) -> "np.ndarray":
+    return np.frombuffer(pcm, dtype="<i2").astype(np.float32)
+
+
+def resample(pcm: bytes, src_rate: int, dst_rate: int = RATE) -> bytes:
+    """참조 신호용 선형 보간 resample (24k TTS → 16k)"""
+    if src_rate == dst_rate or not pcm:
+        return pcm
+    x = _f32(pcm)
+    n = int(len(x) * dst_rate / src_rate)
+    y = np.interp(np.arange(n) * (src_rate / dst_rate), np.arange(len(x)), x)
+    return y.astype("<i2").tobytes()
+
+
+def estimate_delay(mic: "np.ndarray", ref: "np.ndarray", max_lag: int) -> int:
+    """ref 가 mic 보다 몇 샘플 앞서는지 (GCC-PHAT, 0..max_lag)"""
+    n = 1 << int(math.ceil(math.log2(len(mic) + len(ref))))
+    cross = np.fft.rfft(mic, n) * np.conj(np.fft.rfft(ref, n))
+    cc = np.fft.irfft(cross / (np.abs(cross) + 1e-9), n)
+    return int(np.argmax(cc[:max_lag + 1]))
+
+
+class Fdaf:
+    """overlap-save 주파수 영역 NLMS. 버퍼는 한 번만 잡고 블록마다 재사용"""
+
+    def __init__(self, n: int = BLOCK, mu: float = MU):
+        self.n = n
+        self.mu = mu
+        self.W = np.zeros(n + 1, dtype=np.complex128)
+        self.P: "np.ndarray | None" = None     # 참조 대역별 전력 (첫 블록으로 시작 → 초반 과도한 스텝 방지)
+        self._x = np.zeros(2 * n)        # [이전 블록 | 이번 블록] 참조
+        self._e = np.zeros(2 * n)        # [0 | 오차]
+
+    def rewind(self) -> None:
+        """필터는 그대로 두고 참조 이력만 비움 (같은 발화를 처음부터 다시 돌릴 때)"""
+        self._x[:] = 0
+
+    def process(self, x_blk: "np.ndarray", d_blk: "np.ndarray") -> "np.ndarray":
+        n = self.n
+        self._x[:n] = self._x[n:]
+        self._x[n:] = x_blk
+        X = np.fft.rfft(self._x)
+        y = np.fft.irfft(X * self.W)[n:]
+        e = d_blk - y
+        self._e[n:] = e
+        E = np.fft.rfft(self._e)
+        power = X.real ** 2 + X.imag ** 2
+        self.P = power + 1e3 if self.P is None else POWER_SMOOTH * self.P + (1 - POWER_SMOOTH) * power
+        g = np.fft.irfft(self.mu * np.conj(X) * E / (self.P + 1e-6))
+        g[n:] = 0                          # 인과 필터 (앞쪽 n taps 만)
+        self.W += np.fft.rfft(g)
+        return e
+
+
+def erle_db(mic: "np.ndarray", out: "np.ndarray") -> float:
+    """Echo Return Loss Enhancement: 입력 대비 출력 에너지가 얼마나 줄었나 (클수록 좋음)"""
+    return float(10 * np.log10((np.dot(mic, mic) + 1e-9) / (np.dot(out, out) + 1e-9)))
+
+
+def cancel(mic_pcm: bytes, ref_pcm: bytes) -> tuple[bytes, dict]:
+    """16k mono 녹음에서 같은 구간 16k mono 참조(스피커 출력)를 뺀 결과와 측정값"""
+    mic = _f32(mic_pcm)
+    ref = _f32(ref_pcm)[:len(mic)]
+    if len(ref) < len(mic):
+        ref = np.pad(ref, (0, len(mic) - len(ref)))
+    if not len(mic) or float(np.sqrt(np.mean(ref * ref))) < MIN_REF_RMS:
+        return mic_pcm, {"applied": False}
+
+    delay = estimate_delay(mic, ref, int(MAX_DELAY_SEC * RATE))
+    ref = np.concatenate([np.zeros(delay, dtype=np.float32), ref[:len(ref) - delay]])
+
+    f = Fdaf()
+    blocks = len(mic) // BLOCK
+    out = np.empty(blocks * BLOCK, dtype=np.float32)
+    # 발화 전체가 손에 있으니 두 번: 첫 번째는 필터 수렴용, 두 번째 출력은 처음부터 수렴된 필터로
+    for _ in range(2):
+        f.rewind()
+        for b in range(blocks):
+            s = slice(b * BLOCK, (b + 1) * BLOCK)
+            out[s] = f.process(ref[s], mic[s])
+    tail = mic[blocks * BLOCK:]                  # 마지막 조각(블록 미만)은 그대로
+    full = np.concatenate([out, tail])
+    info = {"applied": True, "delay_ms": round(delay * 1000 / RATE, 1), "erle_db": round(erle_db(mic, full), 1)}
+    return np.clip(full, -32768, 32767).astype("<i2").tobytes(), info
+
+
+# ===== 오프라인 평가 =====
+def _read_wav(path: str) -> tuple[bytes, int]:
+    """→ 16k 가 아니어도 되는 mono PCM (스테레오 48k 녹음이면 pcm_frames 로 downmix/resample)"""
+    with wave.open(path, "rb") as w:
+        ch, rate, pcm = w.getnchannels(), w.getframerate(), w.readframes(w.getnframes())
+    if ch == 2 and rate == 48000:
+        import pcm_frames
+        return pcm_frames.to_mono16k(pcm), RATE
+    if ch != 1:
+        raise ValueError(f"{path}: mono 또는 48k 스테레오만 ({ch}ch {rate}Hz)")
+    return pcm, rate
+
+
+def evaluate(mic_path: str, ref_path: str) -> dict:
+    mic, mic_rate = _read_wav(mic_path)
+    ref, ref_rate = _read_wav(ref_path)
+    mic = resample(mic, mic_rate)
+    ref = resample(ref, ref_rate)
+    _, info = cancel(mic, ref)
+    return info
+
+
+def _synth_fixture(seconds: float = 4.0, seed: int = 0) -> tuple[bytes, bytes]:
+    """참조: 음성 대역 잡음 버스트, 녹음: 120ms 지연 + 방 반사 + 배경 잡음"""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * RATE)
+    ref = rng.normal(0, 3000, n) * (np.sin(np.arange(n) * 2 * np.pi * 3 / RATE) > -0.3)
+    room = np.zeros(200)
+    room[0], room[37], room[120] = 0.6, 0.25, -0.1
+    echo = np.convolve(ref, room)[:n]
+    d = int(0.12 * RATE)
+    mic = np.concatenate([np.zeros(d), echo[:n - d]]) + rng.normal(0, 30, n)
+    as_pcm = lambda x: np.clip(x, -32768, 32767).astype("<i2").tobytes()
+    return as_pcm(mic), as_pcm(ref)
+
+
+if __name__ == "__main__":
+    if np is None:
+        print("AEC 는 numpy 가 필요함")
+    elif len(sys.argv) >= 4 and sys.argv[1] == "--eval":
+        print("[AEC EVAL]", evaluate(sys.argv[2], sys.argv[3]))
+    elif len(sys.argv) >= 2 and sys.argv[1] == "--selftest":
+        mic, ref = _synth_fixture()
+        print("[AEC SELFTEST] (합성: 지연 120ms)", cancel(mic, ref)[1])
+    else:
+        print("usage: python aec.py --eval mic.wav ref.wav | --selftest")
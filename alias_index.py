@@ -0,0 +1,287 @@
+# alias_index.py
+# "꾸로" 오인식 / 역할 명사 근사 보정: 손으로 늘려 온 치환 목록 대신 자모 단위 편집 거리 + BK-tree
+# - 음절을 초/중/종성 자모로 풀어서 비교 ("구로" ↔ "꾸로" 는 ㄱ/ㄲ 한 자모 차이)
+# - 비슷한 소리(ㄱ/ㄲ/ㅋ, ㅗ/ㅜ, ㅐ/ㅔ ...)는 치환 비용 0.5 → 거리 공간은 그대로라 BK-tree 가지치기 가능
+# - 조사는 떼고 비교한 뒤 받침에 맞춰 다시 붙임 ("꾸론은" → "꾸로는")
+# - 짧은 키(자모 SHORT_KEY 개 이하)는 허용치를 줄임: 두 글자 낱말은 한 자모만 달라도 다른 흔한 낱말 ("주로", "기차")
+#   꾸로는 이름 자리(문장 첫 낱말 + 는/야/랑..., 또는 부르는 말)일 때만 원래 허용치
+#   문장 중간의 조사 붙은 낱말은 이름 자리로 안 봄 ("그래서 그로는 안돼" 의 "그로" 는 대명사)
+#   python alias_index.py --bench   → 오인식/일반 문장 말뭉치로 기존 normalize_gguro 와 정확도/속도 비교
+import re, sys, time
+
+CHO = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+JUNG = "ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ"
+JONG = ["", "ㄱ", "ㄲ", "ㄳ", "ㄴ", "ㄵ", "ㄶ", "ㄷ", "ㄹ", "ㄺ", "ㄻ", "ㄼ", "ㄽ", "ㄾ", "ㄿ", "ㅀ",
+        "ㅁ", "ㅂ", "ㅄ", "ㅅ", "ㅆ", "ㅇ", "ㅈ", "ㅊ", "ㅋ", "ㅌ", "ㅍ", "ㅎ"]
+
+# 비슷하게 들리는 자모 묶음 (같은 묶음끼리 치환 0.5)
+_SIMILAR = ["ㄱㄲㅋ", "ㄷㄸㅌ", "ㅂㅃㅍ", "ㅈㅉㅊ", "ㅅㅆ", "ㅗㅜ", "ㅜㅡ", "ㅓㅗ", "ㅐㅔ", "ㅒㅖ", "ㅙㅚㅞ"]
+_HALF = {(a, b) for g in _SIMILAR for a in g for b in g if a != b}
+
+PARTICLES = ["이랑", "이야", "이고", "한테", "은", "는", "이", "가", "을", "를", "고", "야", "랑", "도", "의", "와", "과"]
+_VOWEL_FORM = {"은": "는", "이": "가", "을": "를", "과": "와", "이랑": "랑", "이야": "야", "이고": "고"}
+_CONSONANT_FORM = {v: k for k, v in _VOWEL_FORM.items()}
+NAME_PARTICLES = {"은", "는", "이", "가", "야", "이야", "랑", "이랑", "한테"}   # 이름 뒤에 오는 조사
+VOCATIVE_NEXT = {"안녕", "놀자", "있잖아", "이리", "고마워", "미안해"}     # 문장 첫 낱말 + 이것 → 부르는 말
+SHORT_KEY = 4
+_WORD = re.compile(r"([가-힣ㄱ-ㅣ]+)(.*)")
+JOIN_MAX = 4           # 띄어 들린 음절을 최대 몇 낱말까지 붙여 볼지
+MEMO_MAX = 4096
+
+
+def jamo(text: str) -> str:
+    """한글 음절 → 호환 자모 (그 밖의 글자는 그대로)"""
+    out = []
+    for ch in text:
+        code = ord(ch) - 0xAC00
+        if 0 <= code < 11172:
+            out.append(CHO[code // 588] + JUNG[code % 588 // 28] + JONG[code % 28])
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+def distance(a: str, b: str) -> float:
+    """자모 문자열 가중 편집 거리 (삽입/삭제 1, 치환 1 또는 비슷한 소리 0.5)"""
+    if len(a) < len(b):
+        a, b = b, a
+    prev = [float(j) for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        cur = [float(i)]
+        for j, cb in enumerate(b, 1):
+            sub = 0.0 if ca == cb else 0.5 if (ca, cb) in _HALF else 1.0
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + sub))
+        prev = cur
+    return prev[-1]
+
+
+def _has_final(word: str) -> bool:
+    code = ord(word[-1]) - 0xAC00
+    return 0 <= code < 11172 and code % 28 != 0
+
+
+class BKTree:
+    """거리 공간 색인: 노드와의 거리 d 로 자식을 나눠 두고, 검색은 [d - tol, d + tol] 자식만 내려감"""
+
+    def __init__(self):
+        self._root: tuple | None = None     # (key, value, {거리: 자식})
+
+    def add(self, key: str, value) -> None:
+        if self._root is None:
+            self._root = (key, value, {})
+            return
+        node = self._root
+        while True:
+            d = distance(key, node[0])
+            if d == 0:
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = (key, value, {})
+                return
+            node = child
+
+    def search(self, key: str, tol: float) -> list[tuple[float, str, object]]:
+        out, stack = [], [self._root] if self._root else []
+        while stack:
+            k, v, children = stack.pop()
+            d = distance(key, k)
+            if d <= tol:
+                out.append((d, k, v))
+            stack.extend(c for cd, c in children.items() if d - tol <= cd <= d + tol)
+        return sorted(out, key=lambda r: r[0])
+
+
+class AliasIndex:
+    """aliases: {별칭(들린 모양 포함): 정식 표기}. tol: 자모 편집 거리 허용치
+    short_tol: 짧은 키(자모 SHORT_KEY 개 이하)의 허용치 (이름 자리에서 찾을 때는 tol)"""
+
+    def __init__(self, aliases: dict[str, str], tol: float = 1.0, keep=(), short_tol: float | None = None):
+        self.tol = tol
+        self.short_tol = tol if short_tol is None else short_tol
+        self.keep = set(keep)            # 가까워도 고치지 않을 실제 낱말
+        self._tree = BKTree()
+        self._exact: dict[str, str] = {}
+        for alias, canon in aliases.items():
+            self._tree.add(jamo(alias), canon)
+            self._exact[alias] = canon
+        self._lens = sorted({len(jamo(a)) for a in aliases})
+        self._memo: dict[tuple, str | None] = {}   # STT 낱말은 자주 반복 → snap 결과 기억
+
+    def _limit(self, key: str, named: bool) -> float:
+        return self.tol if named or len(key) > SHORT_KEY else self.short_tol
+
+    def lookup(self, word: str, named: bool = False) -> tuple[str, float] | None:
+        """word (조사 없이) → (정식 표기, 거리). 허용치 밖이거나 keep 이면 None. named: 이름 자리"""
+        if word in self._exact:
+            return self._exact[word], 0.0
+        if word in self.keep:
+            return None
+        j = jamo(word)
+        if not any(abs(len(j) - n) <= self.tol for n in self._lens):
+            return None
+        hits = [h for h in self._tree.search(j, self.tol) if h[0] <= self._limit(h[1], named)]
+        return (hits[0][2], hits[0][0]) if hits else None
+
+    def snap(self, token: str, vocative: bool = False, first: bool = True) -> str | None:
+        """조사 붙은 낱말 → 고친 낱말 (조사는 정식 표기 받침에 맞춤). 못 고치면 None
+        vocative(부르는 말)이거나, first(문장 첫 낱말)에 이름 조사가 붙었으면 이름 자리로 보고 찾음"""
+        key = (token, vocative, first)
+        if key in self._memo:
+            return self._memo[key]
+        out = self._snap(token, vocative, first)
+        if len(self._memo) >= MEMO_MAX:
+            self._memo.clear()
+        self._memo[key] = out
+        return out
+
+    def _snap(self, token: str, vocative: bool, first: bool) -> str | None:
+        best = None
+        for p in [""] + [p for p in PARTICLES if token.endswith(p) and len(token) > len(p)]:
+            stem = token[:len(token) - len(p)] if p else token
+            hit = self.lookup(stem, named=vocative or (first and p in NAME_PARTICLES))
+            if hit and (best is None or hit[1] < best[1]):
+                best = (hit[0], hit[1], p)
+        if best is None:
+            return None
+        canon, _, p = best
+        if p:
+            p = _CONSONANT_FORM.get(p, p) if _has_final(canon) else _VOWEL_FORM.get(p, p)
+        return canon + p
+
+    def correct(self, text: str) -> str:
+        """띄어쓰기 낱말마다 snap. 한 글자씩 띄어 들린 것("꾸 로 는", "꾸 론은")은 붙여서 먼저 시도"""
+        words = text.split()
+        out, i = [], 0
+        while i < len(words):
+            for j in range(min(len(words), i + JOIN_MAX), i + 1, -1):
+                if all(len(w) == 1 for w in words[i:j - 1]) and _WORD.fullmatch(words[j - 1]):
+                    m = _WORD.fullmatch("".join(words[i:j]))
+                    fixed = m and self.snap(m.group(1), _vocative(words, i, j, m.group(2)), i == 0)
+                    if fixed:
+                        out.append(fixed + m.group(2))
+                        i = j
+                        break
+            else:
+                m = _WORD.fullmatch(words[i])
+                fixed = m and self.snap(m.group(1), _vocative(words, i, i + 1, m.group(2)), i == 0)
+                out.append(fixed + m.group(2) if fixed else words[i])
+                i += 1
+        return " ".join(out)
+
+
+def _vocative(words: list[str], i: int, j: int, rest: str) -> bool:
+    """words[i:j] 가 부르는 말인지: 문장 첫 낱말이고 혼자이거나, 쉼표/느낌표가 붙었거나, 뒤에 인사말"""
+    if i != 0:
+        return False
+    return j == len(words) or rest[:1] in (",", "!") or words[j] in VOCATIVE_NEXT
+
+
+# ===== 색인 =====
+# 로봇 이름: 정식 표기 + 소리가 많이 다른데 자주 들린 모양만 (가까운 오인식은 거리로 잡힘)
+# keep: 꾸로와 한 자모 차이인 흔한 낱말 (이름 자리처럼 보여도 안 고침: "그 후로는", "도로는")
+ROBOT = AliasIndex({"꾸로": "꾸로", "코로나": "꾸로"}, tol=1.0, short_tol=0.5,
+                   keep=("코로", "주로", "후로", "도로", "수로", "추로", "누로", "무로", "부로", "두로", "투로", "우로",
+                         "소로", "노로", "모로", "보로", "조로", "구루마"))
+# 역할놀이에서 자주 나오는 역할 명사 ("선생임" → "선생님")
+ROLES = AliasIndex({w.replace(" ", ""): w.replace(" ", "") for w in (
+    "엄마", "아빠", "아기", "언니", "오빠", "누나", "형", "동생", "할머니", "할아버지", "선생님", "학생", "친구",
+    "의사", "간호사", "환자", "경찰", "경찰관", "도둑", "소방관", "요리사", "손님", "사장님", "점원", "가게 주인",
+    "왕", "왕비", "공주", "왕자", "마법사", "기사", "해적", "선장", "우주인", "과학자", "농부", "강아지", "고양이",
+    "토끼", "곰", "사자", "호랑이", "공룡", "로봇", "버스 기사", "택배 기사", "미용사", "가수", "아이",
+)}, tol=1.0, short_tol=0.5)
+
+
+def normalize_gguro(text: str) -> str:
+    """STT 결과에서 '꾸로' 근사 오인식을 보정"""
+    if not text:
+        return text
+    out = re.sub(r"ㄲ\s*ㅜ\s*ㄹ\s*ㅗ", "꾸로", text)    # 자모로 풀려 나온 경우
+    return re.sub(r"\s+", " ", ROBOT.correct(out)).strip()
+
+
+def snap_role(role: str) -> str:
+    """역할 명사 근사 보정 (목록에 없거나 멀면 그대로)"""
+    hit = ROLES.lookup(role) if role else None
+    return hit[0] if hit else role
+
+
+# ===== 벤치마크 =====
+# (STT 결과, 기대 보정 결과)
+CORPUS = [
+    ("구로는 엄마야", "꾸로는 엄마야"), ("쿠로 안녕", "꾸로 안녕"), ("고로는 아기야", "꾸로는 아기야"),
+    ("꾸루야 놀자", "꾸로야 놀자"), ("꾸르 안녕", "꾸로 안녕"), ("구루는 선생님", "꾸로는 선생님"),
+    ("코로나는 학생이야", "꾸로는 학생이야"), ("꾸 로 는 의사야", "꾸로는 의사야"), ("꾸 론은 환자", "꾸로는 환자"),
+    ("ㄲㅜㄹㅗ 안녕", "꾸로 안녕"), ("꾸론은 아빠야", "꾸로는 아빠야"), ("그로는 경찰이야", "꾸로는 경찰이야"),
+    ("꼬로 안녕", "꾸로 안녕"), ("꾸로랑 놀래", "꾸로랑 놀래"), ("쿠로이 하자", "꾸로가 하자"),
+    # 고치면 안 되는 일반 문장
+    ("노래 부르는 거 좋아", "노래 부르는 거 좋아"), ("사과 고르는 중", "사과 고르는 중"),
+    ("프로그램 보고 싶어", "프로그램 보고 싶어"), ("코로 숨 쉬어", "코로 숨 쉬어"), ("구름이 예뻐", "구름이 예뻐"),
+    ("공이 굴러가", "공이 굴러가"), ("그러는 거 아니야", "그러는 거 아니야"), ("꼬리가 길어", "꼬리가 길어"),
+    ("우리는 친구야", "우리는 친구야"), ("고려 시대", "고려 시대"),
+    # 꾸로와 한 자모 차이인 흔한 낱말
+    ("주로 뭐 해?", "주로 뭐 해?"), ("그 후로 학교 갔어", "그 후로 학교 갔어"), ("그 후로는 잤어", "그 후로는 잤어"),
+    ("그로 인해 늦었어", "그로 인해 늦었어"), ("도로는 위험해", "도로는 위험해"), ("무로 국 끓였어", "무로 국 끓였어"),
+    ("추로 재 봐", "추로 재 봐"), ("누로 할까", "누로 할까"), ("밥을 주로 먹어", "밥을 주로 먹어"),
+    ("수로에 물이 있어", "수로에 물이 있어"), ("구루마 끌자", "구루마 끌자"),
+    # 문장 중간의 조사 붙은 낱말 (첫 낱말이 아니면 이름 자리가 아님)
+    ("그래서 그로는 안돼", "그래서 그로는 안돼"), ("나는 구로랑 놀래", "나는 꾸로랑 놀래"),
+]
+# (역할 말, 기대 보정 결과): 한 자모 차이인 다른 흔한 낱말은 그대로
+ROLE_CORPUS = [
+    ("선생임", "선생님"), ("겅찰", "경찰"), ("할머이", "할머니"), ("소방괌", "소방관"), ("간호싸", "간호사"),
+    ("꽁주", "공주"), ("고양히", "고양이"), ("아바", "아빠"),
+    ("사장", "사장"), ("이사", "이사"), ("의자", "의자"), ("기차", "기차"), ("가자", "가자"), ("누가", "누가"),
+    ("토기", "토끼"), ("학상", "학생"),
+]
+
+
+def _legacy(text: str) -> str:
+    """이전 normalize_gguro (치환 목록 + 정규식)"""
+    out = text
+    for k, v in {"구로": "꾸로", "쿠로": "꾸로", "고로": "꾸로", "꾸루": "꾸로", "꾸르": "꾸로", "프로": "꾸로",
+                 "프로는": "꾸로는", "쿠루": "꾸로", "구루": "꾸로", "코로나": "꾸로", "코 로 나": "꾸로",
+                 "코로나는": "꾸로는", "코로는": "꾸로는", "그 러는": "꾸로는", "고르는": "꾸로는",
+                 "구르는": "꾸로는", "쿠르는": "꾸로는", "부르는": "꾸로는"}.items():
+        out = out.replace(k, v)
+    out = re.sub(r"곧\s*그\s*러는", "꾸로는", out)
+    out = re.sub(r"고\s*그\s*러는", "꾸로는", out)
+    out = re.sub(r"꾸\s*론은", "꾸로는", out)
+    out = re.sub(r"꾸\s*로\s*는", "꾸로는", out)
+    out = re.sub(r"(고|구|쿠)\s*르는", "꾸로는", out)
+    out = re.sub(r"(고|구|쿠)\s*부르는", "꾸로는", out)
+    out = re.sub(r"ㄲ\s*ㅜ\s*ㄹ\s*ㅗ", "꾸로", out)
+    out = re.sub(r"ㄲㅜ\s*로", "꾸로", out)
+    return re.sub(r"\s+", " ", out).strip()
+
+
+def bench(rounds: int = 300) -> dict:
+    res = {}
+    for name, fn in (("legacy", _legacy), ("index", normalize_gguro)):
+        ROBOT._memo.clear()
+        t0 = time.perf_counter()
+        wrong = [(t, want, got) for t, want in CORPUS if (got := fn(t)) != want]
+        cold = (time.perf_counter() - t0) / len(CORPUS) * 1e6      # 처음 보는 낱말 (기억 없음)
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            for t, _ in CORPUS:
+                fn(t)
+        us = (time.perf_counter() - t0) / (rounds * len(CORPUS)) * 1e6
+        res[name] = {"accuracy": round(1 - len(wrong) / len(CORPUS), 3), "cold_us": round(cold, 1),
+                     "us_per_utt": round(us, 1), "wrong": wrong}
+    wrong = [(t, want, got) for t, want in ROLE_CORPUS if (got := snap_role(t)) != want]
+    res["role"] = {"accuracy": round(1 - len(wrong) / len(ROLE_CORPUS), 3), "wrong": wrong}
+    return res
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--bench"]:
+        r = bench()
+        print(f"[ALIAS BENCH] corpus={len(CORPUS)} roles={len(ROLE_CORPUS)}")
+        for name, v in r.items():
+            speed = f" cold={v['cold_us']}us/utt warm={v['us_per_utt']}us/utt" if "cold_us" in v else ""
+            print(f"[ALIAS BENCH] {name:>6}: accuracy={v['accuracy']}{speed}")
+            for t, want, got in v["wrong"]:
+                print(f"    {t!r}: want={want!r} got={got!r}")
+    else:
+        print("usage: python alias_index.py --bench")
@@ -0,0 +1,326 @@
+# api_load.py
+# 제어 API 동시 요청 부하 테스트 (/start/*, /stop, /state, /volume, /set-profile)
+# - pi_controller 를 이 프로세스에 올림: 오디오는 stub 제공자, 백엔드는 로컬 스텁 HTTP 서버(지연 설정 가능)
+# - 서버는 운영과 같은 socketio.run (eventlet wsgi, monkey_patch 없음) 을 한 스레드에 띄움. emit 다리 pump 도 그 hub 에서
+#   → 라우트 핸들러가 백엔드/join/락에 막히면 hub 가 같이 멈추는 것까지 그대로 보임
+# - 클라이언트 N개(스레드)가 seed 로 정한 요청 순서를 진짜 HTTP 로 동시에 보냄 → 같은 seed 면 같은 부하
+# - 라우트별 지연 p50/p95/max, 상태 코드, 예외, 큐에서 emit 까지 지연(hub 가 막히면 늘어남)
+# - 검사
+#   · /state 응답의 session_id 가 그 mode 로 시작된 요청의 것인지 (current_session 이 섞였는지)
+#   · 부하 중/끝에 살아 있는 worker-* 스레드가 sessions 가 들고 있는 워커뿐인지 (고아 워커)
+#   · 마지막 /stop 뒤 mode=None, running=False
+# - --out 으로 JSON 리포트 저장, --compare 로 이전 리포트와 p95 비교 (릴리스마다 추적)
+#   python api_load.py [--clients 8] [--requests 400] [--seed 1] [--backend-ms 30] [--out r.json] [--compare old.json]
+# - --devices N: 장치 1, 2, 4 .. N 개가 동시에 턴을 돌릴 때 처리량 (장치마다 진짜 turn_machine.Runner + stub 제공자,
+#   백엔드는 같은 스텁 HTTP 서버) → 턴마다 상태 전이, deadline.stats, HTTP 왕복 + JSON, 저널/알림 잠금 경합이 실제로 돎
+#   python api_load.py --devices 16 [--backend-ms 50]
+import os, sys, json, time, random, socket, argparse, threading, tempfile
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+MIX = [   # (가중치, 이름)
+    (3, "start_quiz"), (2, "start_safety_quiz"), (2, "start_animal_quiz"), (2, "start_conversation"),
+    (2, "start_roleplay"), (3, "stop"), (6, "state"), (2, "volume"), (1, "set_profile"),
+]
+MODES = {"start_quiz": "quiz", "start_safety_quiz": "safety_quiz", "start_animal_quiz": "animal_quiz",
+         "start_conversation": "conversation", "start_roleplay": "roleplay"}
+
+
+# ===== 스텁 백엔드 =====
+def _stub_backend(delay_ms: float) -> ThreadingHTTPServer:
+    """모든 POST/GET 에 delay_ms 뒤 그럴듯한 JSON (quiz/conversation/roleplay 응답 모양을 한꺼번에)"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self):
+            n = int(self.headers.get("Content-Length") or 0)
+            if n:
+                self.rfile.read(n)
+            time.sleep(delay_ms / 1000)
+            body = json.dumps({"status": "ok", "response": "좋아, 다음 문제!", "message": "ok", "chatroom_id": 1,
+                               "session_id": "stub", "is_correct": False, "quizzes": []}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_POST = do_GET = _reply
+
+        def log_message(self, *a):
+            pass
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, name="stub-backend", daemon=True).start()
+    return srv
+
+
+def _controller(backend_url: str):
+    """stub 제공자 + 스텁 백엔드로 pi_controller import (장치/저널/텔레메트리/호출어 끔)"""
+    tmp = tempfile.mkdtemp(prefix="api_load_")
+    os.environ.update({
+        "TTS_PROVIDER": "stub", "STT_PROVIDER": "stub", "STUB_TTS_CPS": "0", "BACKEND_BASE": backend_url,
+        "SERVER_URL": backend_url,
+        "JOURNAL_PATH": "off", "TELEMETRY": "0", "CAPTURE_STATS_PATH": "off", "CAPTURE_RING": "0",
+        "PLAYBACK_DAEMON": "0", "THINKING_EARCON": "0", "WAKE_WORD": "0", "QUIZ_LOCAL": "off",
+        "QUIZ_BANK_PATH": os.path.join(tmp, "quiz_bank.json"), "QUIZ_OUTBOX_PATH": os.path.join(tmp, "outbox.jsonl"),
+    })
+    import pi_controller as pc
+    import emit_bridge
+    pc.app.logger.disabled = True
+    pc._resolve_tts_stt()
+    # hub(eventlet) 가 안 도니 emit 은 스레드 다리로 받아 세기만
+    emitted = {"n": 0}
+    pc.emits = emit_bridge.EmitBridge(lambda e, p: emitted.__setitem__("n", emitted["n"] + 1))
+    threading.Thread(target=pc.emits.pump, name="emit-pump", daemon=True).start()
+    return pc, emitted
+
+
+def _serve(pc, emitted: dict) -> str:
+    """운영과 같은 socketio.run(eventlet) 을 데몬 스레드에 띄우고 base URL. emit pump 는 그 스레드의 hub 에서"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    def count_emit(event, payload):
+        emitted["n"] += 1
+        pc.socketio.emit(event, payload)
+
+    def serve():
+        import emit_bridge
+        from eventlet.hubs import trampoline
+        pc.emits.close()
+        pc.emits = emit_bridge.EmitBridge(count_emit, lambda fd: trampoline(fd, read=True))
+        pc.socketio.start_background_task(pc.emits.pump)
+        pc.socketio.run(pc.app, host="127.0.0.1", port=port, log_output=False)
+
+    threading.Thread(target=serve, name="eventlet-server", daemon=True).start()
+    url = f"http://127.0.0.1:{port}"
+    import requests
+    for _ in range(100):
+        try:
+            requests.get(url + "/state", timeout=1)
+            return url
+        except requests.ConnectionError:
+            time.sleep(0.05)
+    raise RuntimeError("eventlet 서버가 뜨지 않음")
+
+
+# ===== 요청 =====
+def _request(http, url: str, name: str, i: int):
+    """(응답 상태, JSON, 시작했으면 session_id)"""
+    pid = 1 + i % 3
+    sid = f"load-{name}-{i}"
+    post = lambda path, **kw: http.post(url + path, timeout=30, **kw)
+    if name == "start_quiz":
+        r = post("/start/quiz", json={"profile_id": pid, "session_id": sid})
+    elif name == "start_safety_quiz":
+        r = post("/start/safety-quiz", json={"profile_id": pid, "session_id": sid, "topic": "교통"})
+    elif name == "start_animal_quiz":
+        r = post("/start/animal-quiz", json={"profile_id": pid, "session_id": sid, "animal_name": "호랑이"})
+    elif name == "start_conversation":
+        r = post("/start/conversation", json={"profile_id": pid, "session_id": sid, "access_token": "t"})
+    elif name == "start_roleplay":
+        r = post("/start/roleplay", json={"profile_id": pid, "session_id": sid}, headers={"Authorization": "Bearer t"})
+    elif name == "stop":
+        r, sid = post("/stop"), None
+    elif name == "state":
+        r, sid = http.get(url + "/state", timeout=30), None
+    elif name == "volume":
+        r, sid = post("/volume", json={"percent": 10 * (i % 11)}), None
+    else:
+        r, sid = post("/set-profile", json={"profile_id": pid}), None
+    try:
+        body = r.json()
+    except ValueError:
+        body = {}
+    return r.status_code, body, sid
+
+
+def _orphans(pc) -> list[str]:
+    """sessions 가 들고 있지 않은데 살아 있는 워커 스레드"""
+    known = {s.worker for s in pc.sessions.all() if s.worker}
+    return [t.name for t in threading.enumerate() if t.name.startswith("worker-") and t.is_alive() and t not in known]
+
+
+def _pct(xs: list[float]) -> dict:
+    xs = sorted(xs)
+    pick = lambda p: round(xs[min(len(xs) - 1, int(p * len(xs)))], 1)
+    return {"n": len(xs), "p50": pick(0.5), "p95": pick(0.95), "max": round(xs[-1], 1)}
+
+
+def run(clients: int = 8, requests: int = 400, seed: int = 1, backend_ms: float = 30.0) -> dict:
+    import requests as http_lib
+    import deadline
+    srv = _stub_backend(backend_ms)
+    pc, emitted = _controller(f"http://127.0.0.1:{srv.server_address[1]}")
+    url = _serve(pc, emitted)
+    rng = random.Random(seed)
+    names = rng.choices([n for _, n in MIX], weights=[w for w, _ in MIX], k=requests)
+    plan = [list(enumerate(names))[c::clients] for c in range(clients)]
+
+    lock = threading.Lock()
+    lat: dict[str, list] = {}
+    statuses: dict[str, dict] = {}
+    errors: list[str] = []
+    started: dict[str, str] = {}     # session_id → mode (시작 요청이 받아들여진 것)
+    states: list[dict] = []
+    orphan_peak = [0]
+
+    def client_loop(items):
+        http = http_lib.Session()
+        for i, name in items:
+            t = time.perf_counter()
+            try:
+                code, body, sid = _request(http, url, name, i)
+            except Exception as e:
+                with lock:
+                    errors.append(f"{name}#{i}: {type(e).__name__}: {e}")
+                continue
+            ms = (time.perf_counter() - t) * 1000
+            with lock:
+                lat.setdefault(name, []).append(ms)
+                statuses.setdefault(name, {}).setdefault(str(code), 0)
+                statuses[name][str(code)] += 1
+                if sid and code == 202:
+                    started[sid] = MODES[name]
+                if name == "state":
+                    states.append(body)
+                orphan_peak[0] = max(orphan_peak[0], len(_orphans(pc)))
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=client_loop, args=(p,), name=f"load-client-{c}") for c, p in enumerate(plan)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    wall = time.perf_counter() - t0
+
+    # /state 마다: 모드가 있으면 session_id 는 그 모드로 시작된 요청의 것이어야 함
+    corrupted = []
+    for st in states:
+        sid, mode = (st.get("session") or {}).get("session_id"), st.get("mode")
+        if mode and sid in started and started[sid] != mode:
+            corrupted.append({"mode": mode, "session_id": sid, "started_as": started[sid]})
+
+    http_lib.post(url + "/stop", timeout=30)
+    time.sleep(1.5)                  # join 시간 안에 못 끝난 워커가 자기 stop_event 를 보고 나갈 시간
+    final = http_lib.get(url + "/state", timeout=30).json()
+    orphans = _orphans(pc)
+    emit_ms = deadline.stats.snapshot()["latency_ms"].get("emit", {})    # 마지막 500개
+    srv.shutdown()
+
+    ok = not errors and not corrupted and not orphans and not final.get("running") and final.get("mode") is None
+    return {
+        "version": pc.VERSION, "seed": seed, "clients": clients, "requests": requests, "backend_ms": backend_ms,
+        "wall_sec": round(wall, 2), "req_per_sec": round(requests / wall, 1), "emitted": emitted["n"], "emit_ms": emit_ms,
+        "latency_ms": {k: _pct(v) for k, v in sorted(lat.items())}, "status": statuses,
+        "errors": errors[:20], "corrupted_state": corrupted[:20], "corrupted_count": len(corrupted),
+        "orphan_workers_peak": orphan_peak[0], "orphan_workers_final": orphans,
+        "final_state": {"mode": final.get("mode"), "running": final.get("running")}, "ok": ok,
+    }
+
+
+# ===== 장치 수 확장 =====
+def _device_loop(stub, backend_url: str, counter: list, idx: int, notify):
+    import requests
+    import session_manager
+    from turn_machine import Mode, State, Runner, BACKEND
+
+    def backend(ctx, text):
+        r = requests.post(f"{backend_url}/load/talk", json={"device": idx, "text": text}, timeout=5)
+        r.raise_for_status()
+        return r.json()
+
+    def on_reply(ctx, res):
+        stub.say(res.get("response") or "")
+        counter[idx] += 1
+        return None
+
+    mode = Mode("load", start="talk", backend=backend, awaited=False, on_reply=on_reply, states=[
+        State("talk", prepare=str.strip, text_event="user_input", handle=BACKEND),
+    ])
+    stop = session_manager.current_stop_event()
+    Runner(say=stub.say, listen=lambda: stub.listen(5), notify=notify, stopped=stop.is_set,
+           await_backend=lambda fn, *a: fn(*a)).run(mode)
+
+
+def devices(max_devices: int = 16, duration: float = 2.0, backend_ms: float = 50.0) -> list[dict]:
+    """장치 수를 1, 2, 4 .. 로 늘리며 duration 초 동안 턴/초. ideal: 턴이 백엔드 지연만큼만 걸릴 때"""
+    import audio_providers
+    from session_manager import SessionManager
+    from session_journal import SessionJournal
+
+    srv = _stub_backend(backend_ms)
+    url = f"http://127.0.0.1:{srv.server_address[1]}"
+    journal = SessionJournal(os.path.join(tempfile.mkdtemp(prefix="api_load_"), "journal.jsonl")).open()
+    events, events_lock = [0], threading.Lock()
+
+    def notify(event, data):
+        with events_lock:
+            events[0] += 1
+
+    rows, base, n = [], None, 1
+    try:
+        while n <= max_devices:
+            mgr = SessionManager(journal=journal)
+            counter = [0] * n
+            for i in range(n):
+                stub = audio_providers.StubProvider(quiet=True)
+                stub.push(*["오늘 유치원에서 그림 그렸어"] * int(duration * 1000 / backend_ms * 2 + 10))
+                mgr.create(f"sim{i}").start(_device_loop, stub, url, counter, i, notify, mode="load")
+            time.sleep(duration)
+            rate = sum(counter) / duration
+            mgr.stop_all()
+            base = base or rate
+            rows.append({"devices": n, "turns_per_sec": round(rate, 1), "ideal": round(n * 1000 / backend_ms, 1),
+                         "scaling": round(rate / (base * n), 3)})
+            n *= 2
+    finally:
+        srv.shutdown()
+        journal.close()
+    return rows
+
+
+def _print(r: dict, old: dict | None) -> None:
+    print(f"[API LOAD] {r['version']} seed={r['seed']} clients={r['clients']} requests={r['requests']} "
+          f"backend={r['backend_ms']}ms → {r['req_per_sec']} req/s ({r['wall_sec']}s)")
+    for name, v in r["latency_ms"].items():
+        delta = ""
+        if old and name in old.get("latency_ms", {}):
+            delta = f" (p95 {v['p95'] - old['latency_ms'][name]['p95']:+.1f}ms)"
+        print(f"[API LOAD] {name:<18} n={v['n']:>4} p50={v['p50']:>7} p95={v['p95']:>7} max={v['max']:>7}"
+              f" status={r['status'].get(name)}{delta}")
+    if r.get("emit_ms"):
+        e = r["emit_ms"]
+        print(f"[API LOAD] emit (queue → hub emit) n={e['n']} p50={e['p50']} p95={e['p95']} max={e['max']}")
+    print(f"[API LOAD] corrupted_state={r['corrupted_count']} orphan_workers(peak)={r['orphan_workers_peak']} "
+          f"final={r['final_state']} errors={len(r['errors'])}")
+    for e in r["errors"][:5]:
+        print(f"    {e}")
+    print(f"[API LOAD] {'PASS' if r['ok'] else 'FAIL'}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="제어 API 동시 요청 부하 테스트")
+    ap.add_argument("--clients", type=int, default=8)
+    ap.add_argument("--requests", type=int, default=400)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--backend-ms", type=float, default=30.0)
+    ap.add_argument("--out")
+    ap.add_argument("--compare")
+    ap.add_argument("--devices", type=int, help="장치 수 확장 측정 (1, 2, 4 .. N)")
+    a = ap.parse_args()
+    if a.devices:
+        for row in devices(a.devices, backend_ms=a.backend_ms):
+            print(f"[DEVICE LOAD] devices={row['devices']:>3} turns/s={row['turns_per_sec']:>7} "
+                  f"(ideal {row['ideal']:>6}) scaling={row['scaling']}")
+        sys.exit(0)
+    report = run(a.clients, a.requests, a.seed, a.backend_ms)
+    old = None
+    if a.compare:
+        with open(a.compare, encoding="utf-8") as f:
+            old = json.load(f)
+    _print(report, old)
+    if a.out:
+        with open(a.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    sys.exit(0 if report["ok"] else 1)
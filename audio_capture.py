@@ -0,0 +1,255 @@
+# audio_capture.py
+# 마이크를 계속 열어 둔 arecord 하나가 링 버퍼에 녹음 → 발화 추출은 링에서 꺼냄
+# - 매 턴 arecord 를 새로 띄우는 동안 아이가 바로 대답하면 첫 음절이 잘림 → pre-roll(기본 0.3초)만큼 앞에서부터 꺼냄
+# - 에너지 VAD 로 말이 끝나면(hangover 무음) 창이 끝나기 전에 바로 끊음
+# - 말 시작이 pre-roll 구간에 있었던 비율을 셈 (capture.onset_in_preroll / capture.utterances)
+# - arecord 출력은 링 슬롯에 바로 readinto, VAD/downmix 는 슬롯 memoryview 로 (프레임마다 복사/할당 없음)
+import os, time, wave, threading, subprocess
+
+import pcm_frames
+from pcm_frames import IN_RATE as RATE, CHANNELS, FRAME_BYTES
+
+BYTES_PER_SEC = RATE * CHANNELS * 2
+RING_SEC = float(os.getenv("CAPTURE_RING_SEC", "15"))
+PREROLL_SEC = float(os.getenv("CAPTURE_PREROLL_MS", "300")) / 1000
+NOISE_SEC = 3.0          # 추출 시작 전 이만큼(스피커가 울리지 않던 프레임만)으로 잡음 크기 추정
+NOISE_MIN_FRAMES = 10    # 그런 프레임이 이보다 적으면(방금까지 꾸로가 말함) 직전 추정값을 씀
+ECHO_TAIL_SEC = 0.3      # 재생이 끝난 뒤에도 이만큼은 에코(잔향/출력 지연)로 봄
+SPEECH_FACTOR = 3.0      # 잡음 RMS 의 몇 배면 말소리
+MIN_THRESHOLD = 300.0    # 조용한 방에서도 이 밑은 말로 안 봄
+ONSET_FRAMES = 3         # 연속 3프레임(60ms) 넘어야 말 시작
+SPEECH_PAD_SEC = (0.1, 0.2)   # 말 구간 앞/뒤로 남길 여유
+RESIDUAL_FACTOR = 1.5    # 에코 제거 뒤 남은 소리: 잡음의 이 배만 넘어도 말일 수 있음 → 애매하면 STT 로 보냄
+ECHO_COUPLING = float(os.getenv("AEC_ECHO_COUPLING", "0.5"))   # 스피커 출력 RMS 대비 마이크에 들어오는 에코 크기 (VAD 문턱용)
+
+
+def enabled() -> bool:
+    return os.getenv("CAPTURE_RING", "1") == "1"
+
+
+class Capture:
+    """링에서 꺼낸 발화 (S16_LE, RATE, CHANNELS)"""
+
+    def __init__(self, pcm: bytes, preroll_sec: float, onset_sec: float | None, ended_early: bool,
+                 speech: tuple[int, int] | None = None, t0: float = 0.0, threshold: float = MIN_THRESHOLD,
+                 noise: float = 0.0):
+        self.pcm = pcm
+        self.t0 = t0                        # pcm 첫 샘플 시각 (time.perf_counter, playback.Reference 와 같은 시계)
+        self.threshold = threshold          # 이번 추출에 쓴 VAD 문턱
+        self.noise = noise                  # 에코 없는 프레임으로 잰 잡음 RMS
+        self.preroll_sec = preroll_sec      # pcm 앞쪽 중 mark 이전 길이
+        self.onset_sec = onset_sec          # mark 기준 말 시작 (pre-roll 안이면 음수), 말이 없으면 None
+        self.ended_early = ended_early      # hangover 로 창보다 먼저 끝남
+        self.speech = speech                # pcm 안 말 구간 [시작, 끝) 바이트, 말이 없으면 None
+
+    def _bounds(self) -> tuple[int, int]:
+        if not self.speech:
+            return 0, len(self.pcm)
+        pad_a, pad_b = (int(p * BYTES_PER_SEC) // FRAME_BYTES * FRAME_BYTES for p in SPEECH_PAD_SEC)
+        return max(0, self.speech[0] - pad_a), min(len(self.pcm), self.speech[1] + pad_b)
+
+    def speech_view(self) -> memoryview:
+        """말 구간(+여유)만 memoryview 로. 말이 없으면 전체 (sox trim 실패 때처럼)"""
+        a, b = self._bounds()
+        return memoryview(self.pcm)[a:b]
+
+    def speech_times(self) -> tuple[float, float]:
+        """speech_view() 구간의 시각 (에코 참조 신호를 같은 구간으로 자를 때)"""
+        a, b = self._bounds()
+        return self.t0 + a / BYTES_PER_SEC, self.t0 + b / BYTES_PER_SEC
+
+    def mono16k(self, weights=(0.5, 0.5)) -> bytes:
+        """말 구간 → STT 입력(16kHz mono). sox trim/conv 프로세스 없이"""
+        return pcm_frames.to_mono16k(self.speech_view(), weights)
+
+    @property
+    def residual_threshold(self) -> float:
+        """에코 제거 뒤 말이 남았는지 볼 문턱 (VAD 문턱보다 낮게: 놓치는 것보다 STT 한 번 더가 나음)"""
+        return max(MIN_THRESHOLD, self.noise * RESIDUAL_FACTOR)
+
+    @property
+    def duration(self) -> float:
+        return len(self.pcm) / BYTES_PER_SEC
+
+    @property
+    def onset_in_preroll(self) -> bool:
+        return self.onset_sec is not None and self.onset_sec < 0
+
+    def write_wav(self, path: str) -> None:
+        with wave.open(path, "wb") as w:
+            w.setnchannels(CHANNELS)
+            w.setsampwidth(2)
+            w.setframerate(RATE)
+            w.writeframes(self.pcm)
+
+
+class CaptureRing:
+    def __init__(self, device: str, ring_sec: float = RING_SEC):
+        self.device = device
+        self.size = int(ring_sec * BYTES_PER_SEC) // FRAME_BYTES * FRAME_BYTES
+        self._buf = bytearray(self.size)
+        self.total = 0                        # 시작 이후 들어온 바이트 (절대 위치)
+        self._anchor = (0, time.perf_counter())   # (total, 그 프레임이 들어온 시각)
+        self._cond = threading.Condition()
+        self._proc: subprocess.Popen | None = None
+        self._closed = False
+        self.floor = 0.0                      # 마지막으로 에코 없이 잰 잡음 RMS
+        self._thread = threading.Thread(target=self._loop, name=f"capture-{device}", daemon=True)
+        self._thread.start()
+
+    # ---------- 녹음 스레드 ----------
+    def _ensure_proc(self) -> subprocess.Popen:
+        if self._proc is None or self._proc.poll() is not None:
+            self._proc = subprocess.Popen(
+                ["arecord", "-D", self.device, "-q", "-t", "raw", "-f", "S16_LE", "-c", str(CHANNELS), "-r", str(RATE)],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            )
+            print(f"[CAPTURE] arecord opened on {self.device}")
+        return self._proc
+
+    def _loop(self) -> None:
+        ring = memoryview(self._buf)
+        while not self._closed:
+            proc = self._ensure_proc()
+            # 다음 슬롯에 바로 읽어 넣음 (size 가 FRAME_BYTES 배수라 슬롯은 끝에서 안 갈라짐)
+            off = self.total % self.size
+            slot, got = ring[off:off + FRAME_BYTES], 0
+            while got < FRAME_BYTES:
+                n = proc.stdout.readinto(slot[got:])
+                if not n:
+                    break
+                got += n
+            if got < FRAME_BYTES:
+                print(f"[CAPTURE] arecord ended on {self.device}, reopening")
+                proc.wait()
+                time.sleep(0.5)
+                continue
+            with self._cond:
+                self.total += FRAME_BYTES
+                self._anchor = (self.total, time.perf_counter())
+                self._cond.notify_all()
+
+    def close(self) -> None:
+        self._closed = True
+        if self._proc:
+            self._proc.kill()
+
+    # ---------- 읽기 ----------
+    def time_of(self, pos: int) -> float:
+        """절대 위치 pos 샘플이 녹음된 시각 (도착 시각 기준 추정)"""
+        total, t = self._anchor
+        return t - (total - pos) / BYTES_PER_SEC
+
+    def frame(self, pos: int) -> memoryview:
+        """절대 위치 pos 의 프레임 슬롯 view (복사 없음, 링이 한 바퀴 돌면 덮어써짐)"""
+        off = pos % self.size
+        return memoryview(self._buf)[off:off + FRAME_BYTES]
+
+    def read(self, start: int, end: int) -> bytes:
+        """절대 위치 [start, end) 복사본 (링에서 밀려났거나 지금 쓰는 중인 슬롯은 잘림)"""
+        with self._cond:
+            start = max(start, self.total - self.size + FRAME_BYTES, 0)
+            end = min(end, self.total)
+            if end <= start:
+                return b""
+            s, e = start % self.size, end % self.size
+            if s < e:
+                return bytes(self._buf[s:e])
+            return bytes(self._buf[s:]) + bytes(self._buf[:e])
+
+    def _wait_for(self, pos: int, timeout: float) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: self.total >= pos or self._closed, timeout=timeout) and not self._closed
+
+    def noise_floor(self, before: int, echo_level=None) -> float:
+        """before 직전 NOISE_SEC 동안 프레임 RMS 중앙값
+
+        echo_level 이 있으면 스피커가 울리던(+ECHO_TAIL_SEC) 프레임은 뺌 → tts_say 직후라도 꾸로 목소리를 잡음으로 안 봄
+        남은 프레임이 모자라면 직전 추정값(self.floor)
+        """
+        pcm = self.read(before - int(NOISE_SEC * BYTES_PER_SEC), before)
+        start = before - len(pcm)
+        view = memoryview(pcm)
+        levels = []
+        for i in range(0, len(pcm) - FRAME_BYTES + 1, FRAME_BYTES):
+            if echo_level:
+                t = self.time_of(start + i)
+                if echo_level(t) > 0 or echo_level(t - ECHO_TAIL_SEC) > 0:
+                    continue
+            levels.append(pcm_frames.frame_rms(view[i:i + FRAME_BYTES]))
+        if len(levels) >= NOISE_MIN_FRAMES:
+            levels.sort()
+            self.floor = levels[len(levels) // 2]
+        return self.floor
+
+    def capture(self, seconds: float, hangover: float = 0.8, preroll: float = PREROLL_SEC,
+                echo_level=None) -> Capture:
+        """지금(mark)부터 최대 seconds 초, pre-roll 포함. 말이 끝나고 hangover 만큼 조용하면 바로 반환
+
+        echo_level(t): t 에 스피커로 나가던 소리 크기 (playback.Reference.level) → 그 동안은 VAD 문턱을 올림
+        """
+        with self._cond:
+            mark = self.total
+        start = max(0, mark - int(preroll * BYTES_PER_SEC) // FRAME_BYTES * FRAME_BYTES, mark - self.size + FRAME_BYTES)
+        noise = self.noise_floor(start, echo_level)
+        threshold = max(MIN_THRESHOLD, noise * SPEECH_FACTOR)
+        limit = mark + int(seconds * BYTES_PER_SEC)
+        hang_bytes = int(hangover * BYTES_PER_SEC)
+
+        pos, run, speech_at, last_voice, ended_early = start, 0, None, None, False
+        while pos < limit:
+            if not self._wait_for(pos + FRAME_BYTES, timeout=1.0):
+                print(f"[CAPTURE] no audio from {self.device}")
+                break
+            level = threshold
+            if echo_level:
+                level = max(level, ECHO_COUPLING * echo_level(self.time_of(pos)))
+            if pcm_frames.frame_rms(self.frame(pos)) > level:
+                run += 1
+                last_voice = pos + FRAME_BYTES
+                if run >= ONSET_FRAMES and speech_at is None:
+                    speech_at = pos - (ONSET_FRAMES - 1) * FRAME_BYTES
+            else:
+                run = 0
+            pos += FRAME_BYTES
+            if speech_at is not None and pos - last_voice >= hang_bytes:
+                ended_early = True
+                break
+
+        onset = (speech_at - mark) / BYTES_PER_SEC if speech_at is not None else None
+        speech = (speech_at - start, last_voice - start) if speech_at is not None else None
+        return Capture(self.read(start, pos), (mark - start) / BYTES_PER_SEC, onset, ended_early, speech,
+                       t0=self.time_of(start), threshold=threshold, noise=noise)
+
+
+def has_speech(mono16k: bytes, threshold: float) -> bool:
+    """16k mono 에 문턱을 넘는 프레임이 ONSET_FRAMES 연속으로 있는지 (에코 제거 뒤 재확인)"""
+    view = memoryview(mono16k)
+    step = 16000 * 2 * pcm_frames.FRAME_MS // 1000
+    run = 0
+    for i in range(0, len(view) - step + 1, step):
+        run = run + 1 if pcm_frames.frame_rms(view[i:i + step], 1) > threshold else 0
+        if run >= ONSET_FRAMES:
+            return True
+    return False
+
+
+# ===== 장치별 링 =====
+_rings: dict[str, CaptureRing] = {}
+_rings_lock = threading.Lock()
+
+
+def ring_for(device: str) -> CaptureRing:
+    with _rings_lock:
+        r = _rings.get(device)
+        if r is None:
+            r = _rings[device] = CaptureRing(device)
+        return r
+
+
+def close_all() -> None:
+    with _rings_lock:
+        targets = list(_rings.values())
+        _rings.clear()
+    for r in targets:
+        r.close()
@@ -0,0 +1,105 @@
+# audio_format.py
+# TTS 오디오 포맷 협상: 제공자가 PCM(WAV) 출력을 지원하면 PCM 으로 받아 디코드 없이 바로 재생
+#   python audio_format.py --bench fixture.mp3 fixture.wav [횟수]
+#   → 같은 문장의 MP3/WAV 녹음본으로 CPU 시간, 첫 샘플까지 시간 비교
+import os, sys, time, struct, resource, subprocess, threading
+from collections import namedtuple
+
+import playback
+
+# fmt: "pcm"(S16_LE mono, rate Hz) | "mp3"
+AudioClip = namedtuple("AudioClip", ["fmt", "data", "rate"])
+
+
+def negotiate(capabilities) -> str:
+    """재생 워커가 켜져 있고 제공자가 PCM 을 줄 수 있으면 pcm, 아니면 mp3"""
+    pref = os.getenv("TTS_FORMAT", "pcm")
+    if pref == "pcm" and "pcm" in capabilities and playback.enabled():
+        return "pcm"
+    return "mp3"
+
+
+def parse_wav(data: bytes) -> AudioClip:
+    """RIFF/WAVE 에서 data 청크만 꺼냄 (PCM16 mono 만 허용)"""
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("WAV 가 아님")
+    pos, fmt = 12, None
+    view = memoryview(data)
+    while pos + 8 <= len(data):
+        cid, size = data[pos:pos + 4], struct.unpack_from("<I", data, pos + 4)[0]
+        body = pos + 8
+        if cid == b"fmt ":
+            audio_fmt, channels, rate, _, _, bits = struct.unpack_from("<HHIIHH", data, body)
+            fmt = (audio_fmt, channels, rate, bits)
+        elif cid == b"data":
+            if not fmt or fmt[0] != 1 or fmt[1] != 1 or fmt[3] != 16:
+                raise ValueError(f"지원하지 않는 WAV 포맷: {fmt}")
+            # 스트리밍 응답은 size 가 0xFFFFFFFF 인 경우가 있어 남은 전부로 자름
+            end = min(len(data), body + size)
+            return AudioClip("pcm", bytes(view[body:end]), fmt[2])
+        pos = body + size + (size & 1)
+    raise ValueError("WAV data 청크 없음")
+
+
+def decode_mp3(data: bytes, rate: int = playback.RATE) -> AudioClip:
+    """mpg123 로 한 번에 PCM 으로 (캐시 저장용)"""
+    proc = subprocess.run(
+        ["mpg123", "-q", "-s", "-m", "-r", str(rate), "-e", "s16", "-"],
+        input=data, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True,
+    )
+    return AudioClip("pcm", proc.stdout, rate)
+
+
+# ===== 벤치마크 =====
+def _cpu() -> float:
+    me = resource.getrusage(resource.RUSAGE_SELF)
+    ch = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return me.ru_utime + me.ru_stime + ch.ru_utime + ch.ru_stime
+
+
+def _first_sample_mp3(data: bytes) -> float:
+    """mpg123 스트림 디코드에서 첫 PCM 청크가 나올 때까지 (재생 워커와 같은 방식)"""
+    t = time.perf_counter()
+    dec = subprocess.Popen(
+        ["mpg123", "-q", "-s", "-m", "-r", str(playback.RATE), "-e", "s16", "-"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
+    threading.Thread(target=playback.PlaybackWorker._feed, args=(dec, data), daemon=True).start()
+    dec.stdout.read(960)
+    first = time.perf_counter() - t
+    dec.stdout.read()
+    dec.wait()
+    return first
+
+
+def _first_sample_pcm(data: bytes) -> float:
+    """WAV 는 헤더만 떼면 바로 첫 샘플"""
+    t = time.perf_counter()
+    parse_wav(data)
+    return time.perf_counter() - t
+
+
+def bench(mp3_path: str, wav_path: str, n: int = 10) -> dict:
+    with open(mp3_path, "rb") as f:
+        mp3 = f.read()
+    with open(wav_path, "rb") as f:
+        wav = f.read()
+    out = {}
+    for name, run in (("mp3", lambda: _first_sample_mp3(mp3)), ("pcm", lambda: _first_sample_pcm(wav))):
+        c0, firsts = _cpu(), []
+        for _ in range(n):
+            firsts.append(run())
+        out[name] = {
+            "cpu_ms_per_utt": round((_cpu() - c0) * 1000 / n, 2),
+            "first_sample_ms": round(sorted(firsts)[n // 2] * 1000, 2),
+        }
+    return out
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 4 and sys.argv[1] == "--bench":
+        res = bench(sys.argv[2], sys.argv[3], int(sys.argv[4]) if len(sys.argv) > 4 else 10)
+        for k, v in res.items():
+            print(f"[BENCH] {k}: cpu/utt={v['cpu_ms_per_utt']}ms first-sample={v['first_sample_ms']}ms")
+    else:
+        print("usage: python audio_format.py --bench fixture.mp3 fixture.wav [n]")
@@ -0,0 +1,281 @@
+# audio_providers.py
+# STT/TTS 제공자 레지스트리
+# - 제공자는 capabilities 를 한 번 선언하고, 시작할 때 resolve() 로 고정
+# - 이후 호출은 say()/listen() 고정 시그니처로만 (매 턴 TypeError 로 시그니처 추측 X)
+import os, time, threading
+from collections import OrderedDict
+
+import audio_format, playback
+from audio_format import AudioClip
+
+TTS = "tts"          # say() 가능
+STT = "stt"          # listen() 가능
+SYNTH = "synth"      # synthesize()/play() 로 합성과 재생을 나눌 수 있음 (캐시 가능)
+DEVICES = "devices"  # in_dev/out_dev 장치 지정 지원
+PCM = "pcm"          # synthesize() 가 디코드 없는 PCM 을 줄 수 있음 (audio_format.negotiate)
+
+
+# capability → 그 capability 를 선언한 제공자가 구현해야 하는 메서드 (TTS 는 SYNTH 가 있으면 기본 say 로 충분)
+_REQUIRED = {TTS: ("say",), STT: ("listen",), SYNTH: ("synthesize", "play")}
+
+
+class AudioProvider:
+    """capabilities 에 선언한 것만 구현. 선언했는데 안 만든 메서드는 클래스 정의 때 TypeError,
+    선언 안 한 기능을 부르면 어느 제공자가 무엇을 지원 안 하는지 NotImplementedError"""
+    name = "base"
+    capabilities: frozenset = frozenset()
+
+    def __init_subclass__(cls, **kw):
+        super().__init_subclass__(**kw)
+        caps = cls.__dict__.get("capabilities", frozenset())
+        required = [m for cap in caps for m in _REQUIRED.get(cap, ())
+                    if not (cap == TTS and SYNTH in caps)]
+        missing = [m for m in required if getattr(cls, m) is getattr(AudioProvider, m)]
+        if missing:
+            raise TypeError(f"{cls.__name__}: capabilities {sorted(caps)} 인데 {missing} 구현 없음")
+
+    def _unsupported(self, cap: str):
+        return NotImplementedError(f"'{self.name}' 제공자는 {cap} 를 지원하지 않음")
+
+    def say(self, text: str, out_dev: str | None = None, tag: str | None = None) -> None:
+        """SYNTH 제공자면 합성 → 재생"""
+        if SYNTH not in self.capabilities:
+            raise self._unsupported(TTS)
+        self.play(self.synthesize(text), out_dev, tag)
+
+    def listen(self, seconds: float, in_dev: str | None = None, tag: str | None = None,
+               hangover: float = 0.8, out_dev: str | None = None) -> str:
+        """최대 seconds 초 녹음 → 텍스트. hangover: 말 끝으로 볼 무음 길이, out_dev: 에코 참조로 쓸 스피커"""
+        raise self._unsupported(STT)
+
+    def last_capture(self, tag: str | None = None) -> dict | None:
+        """마지막 listen() 의 측정값 {"window", "onset", "speech"} (capture_stats 용, 선택)"""
+        return None
+
+    def last_audio(self, tag: str | None = None) -> bytes | None:
+        """마지막 listen() 이 STT 로 보낸 wav (session_trace 용, 선택)"""
+        return None
+
+    def warm(self, in_dev: str | None = None, out_dev: str | None = None) -> None:
+        """시작할 때 백그라운드에서 장치/커넥션을 미리 열어 둠 (선택)"""
+
+    def interrupt(self, out_dev: str | None = None) -> None:
+        """재생 중인 발화 끊기 (선택)"""
+
+    def play_background(self, pcm: bytes, out_dev: str | None = None):
+        """다음 발화가 올 때까지 깔아 두는 소리 (earcon). 지원하면 cancel() 가능한 핸들 (선택)"""
+        return None
+
+    # SYNTH 제공자만
+    def synthesize(self, text: str) -> AudioClip:
+        raise self._unsupported(SYNTH)
+
+    def play(self, clip: AudioClip, out_dev: str | None = None, tag: str | None = None) -> None:
+        raise self._unsupported(SYNTH)
+
+
+class ClovaProvider(AudioProvider):
+    """NAVER Clova Premium TTS + CSR (clova_conversation)"""
+    name = "clova"
+    capabilities = frozenset({TTS, STT, SYNTH, DEVICES, PCM})
+
+    def __init__(self):
+        import clova_conversation
+        self._cc = clova_conversation
+
+    def say(self, text, out_dev=None, tag=None):
+        try:
+            self.play(self.synthesize(text), out_dev, tag)
+            print("[TTS] done")
+        except Exception as e:
+            print("[TTS ERROR]", e)
+
+    def listen(self, seconds, in_dev=None, tag=None, hangover=0.8, out_dev=None):
+        return self._cc.stt_once(seconds, in_dev=in_dev, tag=tag, hangover=hangover, out_dev=out_dev)
+
+    def last_capture(self, tag=None):
+        return self._cc.last_capture.get(tag or "")
+
+    def last_audio(self, tag=None):
+        return self._cc.last_audio.get(tag or "")
+
+    def synthesize(self, text):
+        if audio_format.negotiate(self.capabilities) == "pcm":
+            return audio_format.parse_wav(self._cc.synthesize(text, fmt="wav", rate=playback.RATE))
+        return AudioClip("mp3", self._cc.synthesize(text), None)
+
+    def warm(self, in_dev=None, out_dev=None):
+        import http_client
+        self._cc.warm_devices(in_dev, out_dev)
+        http_client.warm([self._cc.TTS_URL.rsplit("/tts-premium", 1)[0] + "/"])
+
+    def play(self, clip, out_dev=None, tag=None):
+        if clip.fmt == "pcm":
+            self._cc.play_pcm(clip.data, out_dev)
+        else:
+            self._cc.play_mp3(clip.data, out_dev, tag)
+
+    def interrupt(self, out_dev=None):
+        self._cc.stop_playback(out_dev)
+
+    def play_background(self, pcm, out_dev=None):
+        return self._cc.play_background(pcm, out_dev)
+
+
+class StubProvider(AudioProvider):
+    """장치/네트워크 없이 도는 로컬 제공자 (개발, 부하 테스트용)
+    - say: 글자 수에 비례해 잠깐 쉼 (STUB_TTS_CPS 글자/초, 0이면 안 쉼)
+    - listen: push() 로 넣은 문장 또는 STUB_STT_SCRIPT("a|b|c")를 차례로 반환, 없으면 ""
+    - quiet: say 마다 찍는 로그 끔 (부하 테스트)
+    """
+    name = "stub"
+    capabilities = frozenset({TTS, STT, SYNTH, DEVICES})
+
+    def __init__(self, quiet: bool = False):
+        self.quiet = quiet
+        self.cps = float(os.getenv("STUB_TTS_CPS", "0"))
+        self._lock = threading.Lock()
+        self._script = [t for t in os.getenv("STUB_STT_SCRIPT", "").split("|") if t]
+        self.spoken: list[str] = []
+
+    def push(self, *texts: str) -> None:
+        with self._lock:
+            self._script.extend(texts)
+
+    def say(self, text, out_dev=None, tag=None):
+        if not self.quiet:
+            print(f"[STUB TTS] '{text[:60]}'")
+        with self._lock:
+            self.spoken.append(text)
+        if self.cps > 0:
+            time.sleep(len(text) / self.cps)
+
+    def listen(self, seconds, in_dev=None, tag=None, hangover=0.8, out_dev=None):
+        with self._lock:
+            if self._script:
+                return self._script.pop(0)
+        time.sleep(min(seconds, 0.05))
+        return ""
+
+    def synthesize(self, text):
+        return AudioClip("text", text.encode("utf-8"), None)
+
+    def play(self, clip, out_dev=None, tag=None):
+        self.say(clip.data.decode("utf-8"), out_dev, tag)
+
+
+class CachedProvider(AudioProvider):
+    """SYNTH 제공자를 감싸서 같은 문장은 합성 결과를 재사용 (LRU)
+    - MP3 로 받은 결과는 재생 워커가 켜져 있으면 PCM 으로 디코드해서 저장 → 다음부턴 디코드 없음
+    """
+
+    def __init__(self, inner: AudioProvider, max_bytes: int | None = None):
+        if SYNTH not in inner.capabilities:
+            raise RuntimeError(f"cached: '{inner.name}' 제공자는 합성/재생 분리({SYNTH})를 지원하지 않음")
+        self.inner = inner
+        self.name = f"cached:{inner.name}"
+        self.capabilities = inner.capabilities
+        # PCM 은 24kHz 기준 1초에 48KB → 개수가 아니라 바이트로 제한 (TTS_CACHE_MB, 기본 8MB)
+        self.max_bytes = max_bytes or int(float(os.getenv("TTS_CACHE_MB", "8")) * 1024 * 1024)
+        self.size = 0
+        self._cache: OrderedDict[str, AudioClip] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def synthesize(self, text):
+        with self._lock:
+            clip = self._cache.get(text)
+            if clip is not None:
+                self._cache.move_to_end(text)
+                self.hits += 1
+                return clip
+            self.misses += 1
+        clip = self.inner.synthesize(text)
+        if clip.fmt == "mp3" and playback.enabled():
+            try:
+                clip = audio_format.decode_mp3(clip.data)
+            except Exception as e:
+                print("[TTS CACHE] mp3 디코드 실패, mp3 로 저장:", e)
+        with self._lock:
+            old = self._cache.pop(text, None)
+            self.size -= len(old.data) if old else 0
+            self._cache[text] = clip
+            self.size += len(clip.data)
+            while self.size > self.max_bytes and len(self._cache) > 1:
+                _, evicted = self._cache.popitem(last=False)
+                self.size -= len(evicted.data)
+        return clip
+
+    def play(self, clip, out_dev=None, tag=None):
+        self.inner.play(clip, out_dev, tag)
+
+    def say(self, text, out_dev=None, tag=None):
+        try:
+            self.play(self.synthesize(text), out_dev, tag)
+        except Exception as e:
+            print("[TTS ERROR]", e)
+
+    def listen(self, seconds, in_dev=None, tag=None, hangover=0.8, out_dev=None):
+        return self.inner.listen(seconds, in_dev, tag, hangover, out_dev)
+
+    def last_capture(self, tag=None):
+        return self.inner.last_capture(tag)
+
+    def last_audio(self, tag=None):
+        return self.inner.last_audio(tag)
+
+    def peek(self, text: str) -> AudioClip | None:
+        """캐시에 있는 합성 결과 (순서/통계는 안 건드림)"""
+        with self._lock:
+            return self._cache.get(text)
+
+    def warm(self, in_dev=None, out_dev=None):
+        self.inner.warm(in_dev, out_dev)
+
+    def interrupt(self, out_dev=None):
+        self.inner.interrupt(out_dev)
+
+    def play_background(self, pcm, out_dev=None):
+        return self.inner.play_background(pcm, out_dev)
+
+
+# ===== 레지스트리 =====
+_REGISTRY: dict[str, type] = {}
+_INSTANCES: dict[str, AudioProvider] = {}
+_lock = threading.Lock()
+
+
+def register(name: str, factory) -> None:
+    _REGISTRY[name] = factory
+
+
+def get(name: str) -> AudioProvider:
+    """이름으로 제공자 인스턴스 (같은 이름은 하나만 생성). 'cached:<이름>' 은 캐시 래퍼"""
+    with _lock:
+        prov = _INSTANCES.get(name)
+        if prov:
+            return prov
+    if name.startswith("cached:"):
+        prov = CachedProvider(get(name.split(":", 1)[1]))
+    else:
+        factory = _REGISTRY.get(name)
+        if not factory:
+            raise RuntimeError(f"알 수 없는 오디오 제공자: {name} (등록됨: {sorted(_REGISTRY)})")
+        prov = factory()
+    with _lock:
+        return _INSTANCES.setdefault(name, prov)
+
+
+def resolve(tts_name: str, stt_name: str) -> tuple[AudioProvider, AudioProvider]:
+    """시작할 때 한 번: TTS/STT 제공자를 고르고 capability 확인"""
+    tts, stt = get(tts_name), get(stt_name)
+    if TTS not in tts.capabilities:
+        raise RuntimeError(f"'{tts.name}' 제공자는 TTS 를 지원하지 않음")
+    if STT not in stt.capabilities:
+        raise RuntimeError(f"'{stt.name}' 제공자는 STT 를 지원하지 않음")
+    return tts, stt
+
+
+register(ClovaProvider.name, ClovaProvider)
+register(StubProvider.name, StubProvider)
@@ -0,0 +1,167 @@
+# beamform.py
+# ReSpeaker 2-mic 두 채널을 그냥 평균(sox -c 1) 내지 않고
+# - 두 마이크 도달 시간차(TDOA, GCC-PHAT)를 맞춰 더하거나 (delay-and-sum)
+# - 한쪽이 막혔거나/클리핑이면 SNR 좋은 채널 하나만 씀
+# 결과는 (정렬된 스테레오, 채널 가중치) → pcm_frames.to_mono16k 에 그대로
+#   python beamform.py --bench a.wav b.wav ...   → fixture 녹음(48k 스테레오)별 SNR: 평균 / 최적 채널 / delay-and-sum
+#   python beamform.py --bench --stt a.wav ...   → 같은 파일을 Clova STT 로 보내 a.txt 정답과 비교 (성공률)
+#   python beamform.py --selftest
+import os, sys, math, wave
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+RATE = 48000
+MIC_SPACING_M = float(os.getenv("BEAM_MIC_SPACING_MM", "58")) / 1000   # ReSpeaker 2-mic HAT
+SOUND_MPS = 343.0
+MAX_LAG = int(math.ceil(MIC_SPACING_M / SOUND_MPS * RATE)) + 1
+FRAME = RATE * 20 // 1000
+PICK_DB = 6.0          # 두 채널 SNR 차이가 이보다 크면 좋은 채널 하나만
+CLIP_RATE = 0.005      # 이 비율 이상 클리핑된 채널은 안 씀
+MEAN = (0.5, 0.5)
+
+
+def enabled() -> bool:
+    return np is not None and os.getenv("BEAMFORM", "1") == "1"
+
+
+def _channels(pcm) -> "np.ndarray":
+    x = np.frombuffer(pcm, dtype="<i2")
+    return x[: len(x) // 2 * 2].reshape(-1, 2)
+
+
+def snr_db(x: "np.ndarray") -> float:
+    """프레임 전력 상위(말) / 하위(잡음) 분위수 비"""
+    n = len(x) // FRAME
+    if n < 5:
+        return 0.0
+    p = np.mean(x[: n * FRAME].astype(np.float64).reshape(n, FRAME) ** 2, axis=1)
+    noise, speech = np.percentile(p, 20), np.percentile(p, 90)
+    return float(10 * np.log10((speech + 1e-9) / (noise + 1e-9)))
+
+
+def tdoa(left: "np.ndarray", right: "np.ndarray", max_lag: int = MAX_LAG) -> int:
+    """right 가 left 보다 늦게 도착한 샘플 수 (음수면 먼저). GCC-PHAT"""
+    n = 1 << int(math.ceil(math.log2(2 * len(left))))
+    cross = np.fft.rfft(right.astype(np.float64), n) * np.conj(np.fft.rfft(left.astype(np.float64), n))
+    cc = np.fft.irfft(cross / (np.abs(cross) + 1e-9), n)
+    window = np.concatenate([cc[-max_lag:], cc[:max_lag + 1]])    # lag -max..+max
+    return int(np.argmax(window)) - max_lag
+
+
+def align(x: "np.ndarray", lag: int) -> "np.ndarray":
+    """right 채널을 lag 만큼 당겨(늦게 온 만큼) left 와 맞춘 스테레오"""
+    out = x.copy()
+    if lag > 0:
+        out[:-lag, 1] = x[lag:, 1]
+        out[-lag:, 1] = 0
+    elif lag < 0:
+        out[-lag:, 1] = x[:lag, 1]
+        out[:-lag, 1] = 0
+    return out
+
+
+def steer(pcm) -> tuple[bytes, tuple[float, float], dict]:
+    """48k 스테레오 발화 → (정렬된 스테레오 PCM, 채널 가중치, 측정값)"""
+    if not enabled():
+        return bytes(pcm), MEAN, {"mode": "mean"}
+    x = _channels(pcm)
+    if len(x) < FRAME * 5:
+        return bytes(pcm), MEAN, {"mode": "mean"}
+    left, right = x[:, 0], x[:, 1]
+    snr = (snr_db(left), snr_db(right))
+    clipped = [float(np.mean(np.abs(c.astype(np.int32)) >= 32767)) > CLIP_RATE for c in (left, right)]
+    info = {"snr_l": round(snr[0], 1), "snr_r": round(snr[1], 1)}
+
+    if clipped[0] != clipped[1] or abs(snr[0] - snr[1]) > PICK_DB:
+        best = 1 if clipped[0] or (not clipped[1] and snr[1] > snr[0]) else 0
+        info.update(mode="best", channel="lr"[best])
+        return bytes(pcm), ((1.0, 0.0), (0.0, 1.0))[best], info
+
+    lag = tdoa(left, right)
+    info.update(mode="delay_and_sum", lag=lag)
+    return align(x, lag).tobytes(), MEAN, info
+
+
+# ===== 벤치마크 =====
+def _read_stereo(path: str) -> bytes:
+    with wave.open(path, "rb") as w:
+        if w.getnchannels() != 2 or w.getframerate() != RATE:
+            raise ValueError(f"{path}: 48k 스테레오 녹음만 ({w.getnchannels()}ch {w.getframerate()}Hz)")
+        return w.readframes(w.getnframes())
+
+
+def _mono_snr(pcm: bytes, weights) -> float:
+    x = _channels(pcm).astype(np.float64)
+    return snr_db(x[:, 0] * weights[0] + x[:, 1] * weights[1])
+
+
+def _stt(pcm: bytes, weights) -> str:
+    import io
+    import pcm_frames, clova_conversation as cc, http_client
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(16000)
+        w.writeframes(pcm_frames.to_mono16k(pcm, weights))
+    r = http_client.session().post(cc.STT_URL, headers=cc.HEADERS_STT, data=buf.getvalue(), timeout=30)
+    return r.json().get("text", "").strip() if r.ok else ""
+
+
+def _norm(t: str) -> str:
+    return "".join(ch for ch in t if ch.isalnum())
+
+
+def bench(paths: list[str], stt: bool = False) -> list[dict]:
+    rows = []
+    for p in paths:
+        pcm = _read_stereo(p)
+        steered, weights, info = steer(pcm)
+        row = {"file": os.path.basename(p), "mode": info["mode"],
+               "snr_mean": round(_mono_snr(pcm, MEAN), 1), "snr_steered": round(_mono_snr(steered, weights), 1),
+               "snr_best_channel": round(max(info.get("snr_l", 0), info.get("snr_r", 0)), 1)}
+        txt_path = os.path.splitext(p)[0] + ".txt"
+        if stt and os.path.exists(txt_path):
+            with open(txt_path, encoding="utf-8") as f:
+                want = _norm(f.read())
+            row["stt_ok_mean"] = _norm(_stt(pcm, MEAN)) == want
+            row["stt_ok_steered"] = _norm(_stt(steered, weights)) == want
+        rows.append(row)
+    return rows
+
+
+def _synth(seconds: float = 2.0, lag: int = 5, seed: int = 0) -> bytes:
+    """한 음원이 right 에 lag 샘플 늦게 + 채널마다 독립 잡음"""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * RATE)
+    src = rng.normal(0, 2000, n) * (np.sin(np.arange(n) * 2 * np.pi * 2 / RATE) > 0)
+    left = src + rng.normal(0, 300, n)
+    right = np.concatenate([np.zeros(lag), src[:n - lag]]) + rng.normal(0, 300, n)
+    return np.clip(np.stack([left, right], axis=1), -32768, 32767).astype("<i2").tobytes()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if np is None:
+        print("beamform 은 numpy 가 필요함")
+    elif args[:1] == ["--selftest"]:
+        pcm = _synth()
+        steered, weights, info = steer(pcm)
+        print(f"[BEAM SELFTEST] {info} SNR mean={_mono_snr(pcm, MEAN):.1f}dB steered={_mono_snr(steered, weights):.1f}dB")
+    elif args[:1] == ["--bench"] and len(args) > 1:
+        stt = "--stt" in args
+        rows = bench([a for a in args[1:] if a != "--stt"], stt)
+        for r in rows:
+            print("[BEAM BENCH]", r)
+        if rows:
+            gain = sum(r["snr_steered"] - r["snr_mean"] for r in rows) / len(rows)
+            print(f"[BEAM BENCH] files={len(rows)} mean SNR gain={gain:.1f}dB")
+            scored = [r for r in rows if "stt_ok_mean" in r]
+            if scored:
+                print(f"[BEAM BENCH] STT success mean={sum(r['stt_ok_mean'] for r in scored)}/{len(scored)} "
+                      f"steered={sum(r['stt_ok_steered'] for r in scored)}/{len(scored)}")
+    else:
+        print("usage: python beamform.py --bench [--stt] a.wav b.wav ... | --selftest")
@@ -0,0 +1,130 @@
+# capture_stats.py
+# profile_id × mode 별로 실제 발화 길이를 기록해서 녹음 창(max 길이)과 끝 무음(hangover)을 자동 조정
+# - 퀴즈 답은 한두 단어 → 8초 고정 녹음을 기다릴 필요 없음
+# - 대화/역할놀이는 길고 중간에 쉬는 경우가 많음 → hangover 를 늘림
+# - 재시작해도 유지되도록 JSON 파일에 저장
+import os, json, math, threading
+from collections import deque
+
+MIN_SEC, MAX_SEC = 2.0, 12.0
+MARGIN_SEC = 0.8           # 관측된 발화 끝(p90) 뒤 여유
+MIN_SAMPLES = 5            # 이만큼 모이기 전엔 모드 기본값
+HISTORY = 30
+TRUNC_RATE_GROW = 0.2      # 창 끝까지 말한 비율이 이보다 크면 창을 키움
+
+# mode -> (기본 녹음 창, 기본 hangover)
+DEFAULTS = {
+    "quiz":         (5.0, 0.6),
+    "safety_quiz":  (6.0, 0.7),
+    "animal_quiz":  (5.0, 0.6),
+    "roleplay":     (8.0, 0.8),
+    "conversation": (8.0, 0.9),
+}
+FALLBACK = (8.0, 0.8)
+
+
+def _pct(xs: list[float], p: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(math.ceil(p * len(xs))) - 1)]
+
+
+class AdaptiveWindows:
+    def __init__(self, path: str | None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        # key -> {"end": deque(발화 끝 시각), "speech": deque(발화 길이), "trunc": deque(bool), "window": float}
+        self._data: dict[str, dict] = {}
+        self._load()
+
+    @staticmethod
+    def key(profile_id, mode: str | None) -> str:
+        return f"{profile_id}:{mode or 'default'}"
+
+    # ---------- 조회 ----------
+    def window(self, profile_id, mode: str | None) -> tuple[float, float]:
+        """(녹음 최대 길이 초, 끝 무음 hangover 초)"""
+        base_win, base_hang = DEFAULTS.get(mode or "", FALLBACK)
+        with self._lock:
+            d = self._data.get(self.key(profile_id, mode))
+            if not d or len(d["end"]) < MIN_SAMPLES:
+                return base_win, base_hang
+            return d["window"], self._hangover(d, base_hang)
+
+    @staticmethod
+    def _hangover(d: dict, base: float) -> float:
+        # 길게 말하는 아이일수록 문장 중간 쉼도 길다 → 발화 길이 중앙값에 비례해 늘림
+        med = _pct(list(d["speech"]), 0.5)
+        return round(min(1.2, max(0.5, base * 0.7 + 0.08 * med)), 2)
+
+    # ---------- 관측 ----------
+    def observe(self, profile_id, mode: str | None, onset: float, speech: float, window: float) -> None:
+        """onset: 녹음 시작~말 시작, speech: 말 길이(VAD trim 후), window: 이번 녹음 창"""
+        end = onset + speech
+        truncated = end >= window - 0.3
+        base_win = DEFAULTS.get(mode or "", FALLBACK)[0]
+        with self._lock:
+            d = self._data.setdefault(self.key(profile_id, mode), {
+                "end": deque(maxlen=HISTORY), "speech": deque(maxlen=HISTORY),
+                "trunc": deque(maxlen=HISTORY), "window": base_win,
+            })
+            d["end"].append(round(end, 2))
+            d["speech"].append(round(speech, 2))
+            d["trunc"].append(truncated)
+            if len(d["end"]) >= MIN_SAMPLES:
+                target = _pct(list(d["end"]), 0.9) + MARGIN_SEC
+                if sum(d["trunc"]) / len(d["trunc"]) > TRUNC_RATE_GROW:
+                    # 잘린 발화는 실제 끝을 모름 → 현재 창보다 키움
+                    target = max(target, d["window"] * 1.25)
+                d["window"] = round(min(MAX_SEC, max(MIN_SEC, target)), 1)
+        self._save()
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = {}
+            for k, d in self._data.items():
+                base_win, base_hang = DEFAULTS.get(k.split(":", 1)[1], FALLBACK)
+                n = len(d["end"])
+                ready = n >= MIN_SAMPLES
+                out[k] = {
+                    "samples": n,
+                    "end_p50": _pct(list(d["end"]), 0.5) if n else None,
+                    "end_p90": _pct(list(d["end"]), 0.9) if n else None,
+                    "speech_p50": _pct(list(d["speech"]), 0.5) if n else None,
+                    "truncated_rate": round(sum(d["trunc"]) / n, 2) if n else None,
+                    "window": d["window"] if ready else base_win,
+                    "hangover": self._hangover(d, base_hang) if ready else base_hang,
+                }
+            return out
+
+    # ---------- 저장 ----------
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                raw = json.load(f)
+            for k, d in raw.items():
+                self._data[k] = {
+                    "end": deque(d.get("end", []), maxlen=HISTORY),
+                    "speech": deque(d.get("speech", []), maxlen=HISTORY),
+                    "trunc": deque(d.get("trunc", []), maxlen=HISTORY),
+                    "window": d.get("window", FALLBACK[0]),
+                }
+        except Exception as e:
+            print("[CAPTURE STATS] load 실패:", e)
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            raw = {k: {"end": list(d["end"]), "speech": list(d["speech"]),
+                       "trunc": list(d["trunc"]), "window": d["window"]} for k, d in self._data.items()}
+        tmp = self.path + ".tmp"
+        with self._save_lock:
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(raw, f)
+                os.replace(tmp, self.path)
+            except Exception as e:
+                print("[CAPTURE STATS] save 실패:", e)
@@ -1,6 +1,13 @@
-import os, subprocess, shlex, requests, traceback
+import os, subprocess, shlex, traceback, math, wave
+import http_client
+import deadline
+import playback
+import audio_capture
+import aec
+import beamform
+import pcm_frames
+from alias_index import normalize_gguro
 from dotenv import load_dotenv
-import re
 
 load_dotenv()
 
@@ -14,8 +21,10 @@ TTS_URL = "https://naveropenapi.apigw.ntruss.com/tts-premium/v1/tts"
 
 # ===== Device =====
 IN_DEV     = "hw:4,0"                   # 🎤 ReSpeaker 마이크
-MPG123_OUT = "-a plughw:3,0 -f 18000"   # 🔊 USB 스피커
+OUT_DEV    = "plughw:3,0"               # 🔊 USB 스피커
+MPG123_OUT = f"-a {OUT_DEV} -f 18000"
 SR         = 16000
+HEDGE      = os.getenv("HEDGE", "1") == "1"   # 멱등 요청(STT/TTS) hedge 허용
 MIN_SEC    = 0.3
 
 # ===== Temp Files =====
@@ -23,6 +32,14 @@ TMP_RAW = "/tmp/utt_raw.wav"
 TMP_ST  = "/tmp/utt_st.wav"
 TMP_WAV = "/tmp/utt.wav"
 TMP_MP3 = "/tmp/tts.mp3"
+CAPTURE_SAVE_DIR = os.getenv("CAPTURE_SAVE_DIR", "")   # 설정하면 링 녹음 원본을 fixture 로 저장
+
+def _tmp(path: str, tag: str | None) -> str:
+    """장치별 세션이 동시에 돌 때 임시 파일이 겹치지 않도록 태그를 붙임"""
+    if not tag:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}_{tag}{ext}"
 
 # ===== Headers =====
 HEADERS_STT = {
@@ -37,69 +54,197 @@ HEADERS_TTS = {
 }
 
 # ===== TTS =====
-def say(text: str, speaker="ndain", speed="0"):
+def synthesize(text: str, speaker="ndain", speed="0", fmt: str = "mp3", rate: int = 24000) -> bytes:
+    """Premium TTS 호출 -> MP3 바이트 (fmt="wav" 면 PCM16 mono WAV, rate Hz)"""
+    print(f"[TTS req] '{text[:60] + ('...' if len(text)>60 else '')}' fmt={fmt}")
+    data = {"speaker": speaker, "speed": speed, "text": text}
+    if fmt == "wav":
+        data["format"] = "wav"
+        data["sampling-rate"] = str(rate)
+    # TTS 는 멱등 → 느리면 hedge. 답은 꼭 말해야 하니 timeout 하한을 넉넉히
+    r = deadline.hedged("clova_tts", lambda: http_client.session().post(
+        TTS_URL, headers=HEADERS_TTS, data=data, timeout=deadline.timeout(30, floor=5.0)), HEDGE)
+    r.raise_for_status()
+    return r.content
+
+def play_mp3(audio: bytes, out_dev: str | None = None, tag: str | None = None) -> None:
+    if playback.enabled():
+        # 장치를 열어 둔 재생 워커로 (mpg123 는 디코드만, shell/장치 open 없음)
+        playback.worker_for(out_dev or OUT_DEV).play_mp3(audio)
+        return
+    mp3_path = _tmp(TMP_MP3, tag)
+    out = f"-a {out_dev} -f 18000" if out_dev else MPG123_OUT
+    with open(mp3_path, "wb") as f:
+        f.write(audio)
+    cmd = f"mpg123 {out} {shlex.quote(mp3_path)} >/dev/null 2>&1"
+    subprocess.call(cmd, shell=True)
+
+def play_pcm(pcm: bytes, out_dev: str | None = None) -> None:
+    """디코드 없이 재생 워커로 바로 (S16_LE mono, playback.RATE)"""
+    playback.worker_for(out_dev or OUT_DEV).play_pcm(pcm)
+
+def play_background(pcm: bytes, out_dev: str | None = None):
+    """다음 발화가 올 때까지 반복 재생 (재생 워커 사용 시만, 기다리지 않음). cancel() 가능한 핸들"""
+    if not playback.enabled():
+        return None
+    return playback.worker_for(out_dev or OUT_DEV).play_background(pcm)
+
+def stop_playback(out_dev: str | None = None) -> None:
+    """재생 중/대기 중인 TTS 끊기 (재생 워커 사용 시)"""
+    playback.stop(out_dev or OUT_DEV)
+
+def say(text: str, speaker="ndain", speed="0", out_dev: str | None = None, tag: str | None = None):
     try:
-        print(f"[TTS req] '{text[:60] + ('...' if len(text)>60 else '')}'")
-        data = {"speaker": speaker, "speed": speed, "text": text}
-        r = requests.post(TTS_URL, headers=HEADERS_TTS, data=data, timeout=30)
-        r.raise_for_status()
-        with open(TMP_MP3, "wb") as f:
-            f.write(r.content)
-        cmd = f"mpg123 {MPG123_OUT} {shlex.quote(TMP_MP3)} >/dev/null 2>&1"
-        subprocess.call(cmd, shell=True)
+        play_mp3(synthesize(text, speaker, speed), out_dev, tag)
         print("[TTS] done")
     except Exception as e:
         print("[TTS ERROR]", e)
         traceback.print_exc()
 
+# ===== 장치 워밍업 =====
+def warm_devices(in_dev: str | None = None, out_dev: str | None = None) -> None:
+    """부팅 직후 첫 ALSA open(USB 스피커 깨우기 등)이 느린 걸 첫 턴 전에 미리 치러 둠"""
+    if audio_capture.enabled():
+        audio_capture.ring_for(in_dev or IN_DEV)   # 링 녹음 시작 (이후 계속 열어 둠)
+    else:
+        subprocess.call(f"arecord -D {in_dev or IN_DEV} -q -f S16_LE -c2 -r48000 -s 4800 /dev/null", shell=True)
+    if playback.enabled():
+        playback.worker_for(out_dev or OUT_DEV).play_pcm(b"\0" * 4800)   # 워커가 장치를 연 채로 유지
+    else:
+        subprocess.call(f"head -c 4800 /dev/zero | aplay -D {out_dev or OUT_DEV} -q -t raw -f S16_LE -r 24000 -c 1", shell=True)
+    print("[WARM] audio devices ready")
+
 # ===== STT =====
-def stt_once() -> str:
-    rec = f"arecord -D {IN_DEV} -f S16_LE -c2 -r48000 -d 8 {TMP_RAW}"
-    print("[ARECORD]", rec)
-    subprocess.call(rec, shell=True)
+RAW_BYTES_PER_SEC = 48000 * 2 * 2   # arecord: 48kHz, 2ch, S16
 
-    if not os.path.exists(TMP_RAW) or os.path.getsize(TMP_RAW) < 500:
-        print("[ARECORD] no audio captured or too small")
-        return ""
+# tag -> 마지막 녹음 측정값 {"window", "onset", "speech"} (capture_stats 가 가져감)
+last_capture: dict[str, dict] = {}
+# tag -> 마지막으로 STT 에 보낸 wav (16k mono, session_trace 가 가져감)
+last_audio: dict[str, bytes] = {}
 
-    # VAD trim
+def _wav_sec(path: str, bytes_per_sec: int) -> float:
+    return max(0.0, (os.path.getsize(path) - 44) / bytes_per_sec) if os.path.exists(path) else 0.0
+
+def _sox_trim_conv(raw_path: str, st_path: str, wav_path: str, hangover: float) -> bool:
+    """arecord 녹음 파일 → VAD trim → 16k mono. trim 성공 여부"""
+    # VAD trim (끝 무음 hangover 는 profile/mode 별로 capture_stats 가 정함)
     vad_rules = [
-        "silence 1 0.05 -20d 1 0.8 -20d",
-        "silence 1 0.05 -18d 1 0.7 -18d",
-        "silence 1 0.05  7%  1 0.8  7%",
+        f"silence 1 0.05 -20d 1 {hangover:.2f} -20d",
+        f"silence 1 0.05 -18d 1 {max(0.3, hangover - 0.1):.2f} -18d",
+        f"silence 1 0.05  7%  1 {hangover:.2f}  7%",
     ]
     trimmed = False
     for rule in vad_rules:
-        cmd = f"sox {TMP_RAW} {TMP_ST} highpass 100 {rule}"
+        cmd = f"sox {raw_path} {st_path} highpass 100 {rule}"
         print("[SOX TRIM]", cmd)
         subprocess.call(cmd, shell=True)
-        if os.path.exists(TMP_ST) and os.path.getsize(TMP_ST) > 500:
-            print(f"[SOX TRIM] ok, size={os.path.getsize(TMP_ST)} bytes")
+        if os.path.exists(st_path) and os.path.getsize(st_path) > 500:
+            print(f"[SOX TRIM] ok, size={os.path.getsize(st_path)} bytes")
             trimmed = True
             break
-    src_for_conv = TMP_ST if trimmed else TMP_RAW
+    src_for_conv = st_path if trimmed else raw_path
 
     # convert
-    conv = f"sox {src_for_conv} -c 1 -r {SR} -b 16 -e signed-integer {TMP_WAV}"
+    conv = f"sox {src_for_conv} -c 1 -r {SR} -b 16 -e signed-integer {wav_path}"
     print("[SOX CONV]", conv)
     subprocess.call(conv, shell=True)
+    return trimmed
+
+def _write_wav16k(path: str, pcm: bytes) -> None:
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SR)
+        w.writeframes(pcm)
+
+def stt_once(seconds: float = 8, in_dev: str | None = None, tag: str | None = None, hangover: float = 0.8,
+             out_dev: str | None = None) -> str:
+    raw_path, st_path, wav_path = _tmp(TMP_RAW, tag), _tmp(TMP_ST, tag), _tmp(TMP_WAV, tag)
+    lead_path = _tmp("/tmp/utt_lead.wav", tag)
+    last_capture.pop(tag or "", None)
+    last_audio.pop(tag or "", None)
+    cap = None
+    if audio_capture.enabled():
+        # 계속 녹음 중인 링에서 pre-roll 포함해 꺼냄 (첫 음절 안 잘림, 말 끝나면 창보다 먼저 반환)
+        # 스피커로 나간 소리(reference)가 있으면 그동안 VAD 문턱을 올려 꾸로 자신의 목소리로 말 시작을 잡지 않게
+        ref = playback.worker_for(out_dev or OUT_DEV).reference if playback.enabled() else None
+        cap = audio_capture.ring_for(in_dev or IN_DEV).capture(seconds, hangover, echo_level=ref and ref.level)
+        deadline.stats.count("capture.utterances")
+        if cap.onset_in_preroll:
+            deadline.stats.count("capture.onset_in_preroll")
+        print(f"[CAPTURE] {cap.duration:.2f}s (pre-roll {cap.preroll_sec:.2f}s, onset={cap.onset_sec}, early={cap.ended_early})")
+        if CAPTURE_SAVE_DIR:
+            # beamform.py --bench 용 fixture (48k 스테레오 원본)
+            cap.write_wav(os.path.join(CAPTURE_SAVE_DIR, f"{tag or 'utt'}-{int(cap.t0 * 1000)}.wav"))
+        # 두 마이크를 평균 내지 않고 도달 시간차 맞춰 더하거나(delay-and-sum) 좋은 채널 하나만
+        stereo, weights, beam = beamform.steer(cap.speech_view())
+        deadline.stats.count(f"beam.{beam['mode']}")
+        if beam["mode"] != "mean":
+            print(f"[BEAM] {beam}")
+        # 링 VAD 가 잡은 말 구간만 프로세스 없이 downmix/resample (sox trim/conv 대신)
+        mono = pcm_frames.to_mono16k(stereo, weights)
+        if ref and aec.enabled():
+            mono, info = aec.cancel(mono, aec.resample(ref.slice(*cap.speech_times()), playback.RATE))
+            if info["applied"]:
+                deadline.stats.count("aec.applied")
+                print(f"[AEC] delay={info['delay_ms']}ms ERLE={info['erle_db']}dB")
+                if not audio_capture.has_speech(mono, cap.residual_threshold):
+                    # 에코를 빼고 나니 잡음 수준 소리뿐 → STT 요청 안 함 (조금이라도 넘으면 보냄)
+                    deadline.stats.count("aec.echo_only")
+                    print("[AEC] echo only -> skip STT")
+                    return ""
+        _write_wav16k(wav_path, mono)
+    else:
+        rec = f"arecord -D {in_dev or IN_DEV} -f S16_LE -c2 -r48000 -d {max(1, math.ceil(seconds))} {raw_path}"
+        print("[ARECORD]", rec)
+        subprocess.call(rec, shell=True)
+
+        if not os.path.exists(raw_path) or os.path.getsize(raw_path) < 500:
+            print("[ARECORD] no audio captured or too small")
+            return ""
+        trimmed = _sox_trim_conv(raw_path, st_path, wav_path, hangover)
 
-    if not os.path.exists(TMP_WAV) or os.path.getsize(TMP_WAV) < 500:
+    if not os.path.exists(wav_path) or os.path.getsize(wav_path) < 500:
         print("[SOX CONV] failed or too small")
         return ""
 
-    wav_size = os.path.getsize(TMP_WAV)
+    wav_size = os.path.getsize(wav_path)
     dur = (wav_size - 44) / (SR * 2)
     if dur < MIN_SEC:
         print(f"[CHECK] too short: {dur:.2f}s -> skip")
         return ""
 
+    # 말 시작 시점 측정용 (앞 무음만 자름). STT 요청과 겹쳐서 돌림 (링 녹음은 VAD 가 이미 잼)
+    onset_proc = None
+    if cap:
+        last_capture[tag or ""] = {
+            "window": seconds,
+            "onset": round(max(0.0, cap.onset_sec or 0.0), 2),
+            "speech": round(dur, 2),
+            "preroll_hit": cap.onset_in_preroll,
+        }
+    elif trimmed:
+        onset_proc = subprocess.Popen(
+            ["sox", raw_path, lead_path, "highpass", "100", "silence", "1", "0.05", "-20d"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+
     try:
-        with open(TMP_WAV, "rb") as f:
-            print("[STT] request (CSR short sentence)…")
-            r = requests.post(STT_URL, headers=HEADERS_STT, data=f.read(), timeout=60)
+        with open(wav_path, "rb") as f:
+            audio = f.read()
+        last_audio[tag or ""] = audio
+        print("[STT] request (CSR short sentence)…")
+        r = deadline.hedged("clova_stt", lambda: http_client.session().post(
+            STT_URL, headers=HEADERS_STT, data=audio, timeout=deadline.timeout(60, floor=3.0)), HEDGE)
 
         print(f"[STT] status={r.status_code} ct={r.headers.get('Content-Type')}")
+        if onset_proc and onset_proc.wait() == 0:
+            raw_sec = _wav_sec(raw_path, RAW_BYTES_PER_SEC)
+            last_capture[tag or ""] = {
+                "window": max(1, math.ceil(seconds)),
+                "onset": round(raw_sec - _wav_sec(lead_path, RAW_BYTES_PER_SEC), 2),
+                "speech": round(dur, 2),
+            }
         if not r.ok:
             print("[STT ERROR]", r.text[:500])
             return ""
@@ -113,51 +258,3 @@ def stt_once() -> str:
         print("[STT ERROR]", e)
         traceback.print_exc()
         return ""
-
-
-import re
-
-def normalize_gguro(text: str) -> str:
-    """STT 결과에서 '꾸로'/'꾸로는'을 강력 보정"""
-    out = text
-
-    # --- 직접적으로 들린 단어들 교정 ---
-    replacements = {
-        "구로": "꾸로",
-        "쿠로": "꾸로",
-        "고로": "꾸로",
-        "꾸루": "꾸로",
-        "꾸르": "꾸로",
-        "프로": "꾸로",
-        "프로는": "꾸로는",
-        "쿠루": "꾸로",
-        "구루": "꾸로",
-        "코로나": "꾸로",
-        "코 로 나": "꾸로",
-        "코로나는": "꾸로는",
-        "코로는": "꾸로는",
-        "그 러는": "꾸로는",
-        "고르는": "꾸로는",
-        "구르는": "꾸로는",
-        "쿠르는": "꾸로는",
-        "부르는": "꾸로는",
-    }
-    for k, v in replacements.items():
-        out = out.replace(k, v)
-
-    # --- 정규식 기반 교정 ---
-    out = re.sub(r"곧\s*그\s*러는", "꾸로는", out)
-    out = re.sub(r"고\s*그\s*러는", "꾸로는", out)
-    out = re.sub(r"꾸\s*론은", "꾸로는", out)
-    out = re.sub(r"꾸\s*로\s*는", "꾸로는", out)
-    out = re.sub(r"(고|구|쿠)\s*르는", "꾸로는", out)
-    out = re.sub(r"(고|구|쿠)\s*부르는", "꾸로는", out)
-
-    # 자모 분리
-    out = re.sub(r"ㄲ\s*ㅜ\s*ㄹ\s*ㅗ", "꾸로", out)
-    out = re.sub(r"ㄲㅜ\s*로", "꾸로", out)
-
-    # 불필요한 공백 제거
-    out = re.sub(r"\s+", " ", out).strip()
-
-    return out
@@ -1,4 +1,7 @@
-import os, subprocess, shlex, traceback, requests
+import os, subprocess, shlex, traceback
+import http_client
+import deadline
+from alias_index import snap_role
 from session_store import current_session, current_roles
 from dotenv import load_dotenv
 import re
@@ -35,7 +38,7 @@ def say(text: str, speaker="ndain", speed="0"):
         preview = text[:60] + ("..." if len(text) > 60 else "")
         print(f"[TTS req] '{preview}'")
         data = {"speaker": speaker, "speed": speed, "text": text}
-        r = requests.post(TTS_URL, headers={
+        r = http_client.session().post(TTS_URL, headers={
             "X-NCP-APIGW-API-KEY-ID": NCP_KEY_ID,
             "X-NCP-APIGW-API-KEY": NCP_KEY,
             "Content-Type": "application/x-www-form-urlencoded; charset=utf-8",
@@ -61,7 +64,7 @@ def stt_once() -> str:
     subprocess.call(conv, shell=True)
 
     with open(TMP_WAV, "rb") as f:
-        r = requests.post(STT_URL, headers={
+        r = http_client.session().post(STT_URL, headers={
             "X-NCP-APIGW-API-KEY-ID": NCP_KEY_ID,
             "X-NCP-APIGW-API-KEY": NCP_KEY,
             "Content-Type": "application/octet-stream",
@@ -117,6 +120,9 @@ def _clean_role(s: str) -> str:
     s = re.sub(r"(입니다|이에요|예요|할래|할게|할께|야|이야)$", "", s)
     s = re.sub(r"(은|는|이|가|을|를)$", "", s)
 
+    # ✅ 자주 나오는 역할 명사 근사 보정 ("선생임" → "선생님")
+    s = snap_role(s)
+
     print(f"[_clean_role] before='{orig}' after='{s}'")
     return s
 	
@@ -134,51 +140,41 @@ def _auth_headers():
 # SERVER_URL 은 환경변수 그대로 유지
 SERVER_URL = (os.getenv("SERVER_URL") or "").rstrip("/")
 
-def _auth_headers():
+def _auth_headers(token: str | None = None):
+    """token 을 주면 그 세션의 것, 없으면 기본 장치 세션의 access_token"""
     h = {"Content-Type": "application/json"}
-    token = current_session.get("access_token")
+    token = token or current_session.get("access_token")
     print(f"[DEBUG] _auth_headers token={token}")
     if token:
         h["Authorization"] = f"Bearer {token}"
     return h
 
-def call_start(user_role: str, bot_role: str, session_id: str) -> dict:
-    url = f"{SERVER_URL}/api/roleplay/start"
-    payload = {
-        "session_id": session_id,
-        "profile_id": current_roles.get("profile_id"),
-        "user_role": user_role,
-        "bot_role": bot_role,
-    }
-    print(f"[CALL_START] payload={payload}")
-    r = requests.post(url, headers=_auth_headers(), json=payload, timeout=20)
-    r.raise_for_status()
-    res = r.json()
-    print(f"[CALL_START] response={res}")
-    return res
-
-def call_talk(chatroom_id: int, user_text: str, session_id: str) -> dict:
+def call_talk(chatroom_id: int, user_text: str, session_id: str, profile_id: int | None = None,
+              access_token: str | None = None) -> dict:
+    """profile_id/access_token: 호출한 장치 세션의 값 (없으면 기본 장치의 전역 값)"""
     url = f"{SERVER_URL}/api/roleplay/{chatroom_id}/talk"
     payload = {
         "user_input": user_text,
         "session_id": session_id,
-        "profile_id": current_roles.get("profile_id"),
+        "profile_id": profile_id or current_roles.get("profile_id"),
     }
     print(f"[CALL_TALK] url={url} payload={payload}")
-    r = requests.post(url, headers=_auth_headers(), json=payload, timeout=20)
+    r = deadline.timed("backend:/api/roleplay/{id}/talk", http_client.session().post, url,
+                       headers=_auth_headers(access_token), json=payload, timeout=deadline.BACKEND_TIMEOUT)
     r.raise_for_status()
     res = r.json()
     print(f"[CALL_TALK] response={res}")
     return res
 
-def call_end(session_id: str) -> dict:
+def call_end(session_id: str, profile_id: int | None = None, access_token: str | None = None) -> dict:
     url = f"{SERVER_URL}/api/conversation/end"
     payload = {
         "session_id": session_id,
-        "profile_id": current_roles.get("profile_id"),
+        "profile_id": profile_id or current_roles.get("profile_id"),
     }
     print(f"[CALL_END] payload={payload}")
-    r = requests.post(url, headers=_auth_headers(), json=payload, timeout=20)
+    r = deadline.timed("backend:/api/conversation/end", http_client.session().post, url,
+                       headers=_auth_headers(access_token), json=payload, timeout=deadline.BACKEND_TIMEOUT)
     r.raise_for_status()
     res = r.json()
     print(f"[CALL_END] response={res}")
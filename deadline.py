@@ -0,0 +1,132 @@
+# deadline.py
+# 턴 단위 지연 예산
+# - stt_once 가 턴을 시작하면서 deadline 을 걸고, STT/TTS 요청은 남은 시간으로 timeout 을 정함
+#   백엔드 talk/start 는 멱등이 아니라 timeout 은 고정(BACKEND_TIMEOUT), deadline 은 필러/earcon 시점에만 씀
+# - 멱등 요청(STT, TTS)은 p95 를 넘기면 한 번 더 보내고(hedge) 먼저 온 응답을 씀
+# - 요청별 지연을 모아 p50/p95/p99 로 보여줌 (/debug/latency)
+import os, time, threading
+from collections import deque, defaultdict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+_local = threading.local()
+
+# 백엔드(talk/start/end) 요청 timeout 초. pi_controller 와 clova_roleplay 가 같은 값을 씀
+BACKEND_TIMEOUT = int(os.getenv("BACKEND_TIMEOUT", "30"))
+
+
+class Deadline:
+    def __init__(self, budget_sec: float):
+        self.budget = budget_sec
+        self.start = time.monotonic()
+        self.at = self.start + budget_sec
+
+    def remaining(self) -> float:
+        return self.at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: float, floor: float = 1.0) -> float:
+        """요청 timeout: 남은 예산과 cap 중 작은 값 (너무 짧아지지 않게 floor 보장)"""
+        return max(floor, min(cap, self.remaining()))
+
+
+def begin(budget_sec: float) -> Deadline:
+    """현재 스레드의 턴 deadline 을 새로 검 (이전 턴 것은 버림)"""
+    d = Deadline(budget_sec)
+    _local.deadline = d
+    return d
+
+
+def current() -> Deadline | None:
+    return getattr(_local, "deadline", None)
+
+
+def timeout(cap: float, floor: float = 1.0) -> float:
+    d = current()
+    return d.timeout(cap, floor) if d else cap
+
+
+def bind(d: Deadline | None, fn):
+    """다른 스레드에서 돌릴 함수에 현재 deadline 을 넘겨줌"""
+    def _run(*args, **kw):
+        _local.deadline = d
+        try:
+            return fn(*args, **kw)
+        finally:
+            _local.deadline = None
+    return _run
+
+
+# ===== 지연 통계 =====
+class LatencyStats:
+    def __init__(self, history: int = 500):
+        self._lock = threading.Lock()
+        self._ms: dict[str, deque] = defaultdict(lambda: deque(maxlen=history))
+        self._counts: dict[str, int] = defaultdict(int)
+
+    def record(self, name: str, ms: float) -> None:
+        with self._lock:
+            self._ms[name].append(ms)
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counts[name] += n
+
+    def percentile(self, name: str, p: float, min_samples: int = 20) -> float | None:
+        with self._lock:
+            xs = sorted(self._ms.get(name, ()))
+        if len(xs) < min_samples:
+            return None
+        return xs[min(len(xs) - 1, int(p * len(xs)))]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            items = {k: sorted(v) for k, v in self._ms.items()}
+            counts = dict(self._counts)
+        out = {}
+        for k, xs in items.items():
+            if not xs:
+                continue
+            pick = lambda p: round(xs[min(len(xs) - 1, int(p * len(xs)))], 1)
+            out[k] = {"n": len(xs), "p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": round(xs[-1], 1)}
+        return {"latency_ms": out, "counts": counts}
+
+
+stats = LatencyStats()
+_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+
+
+def timed(name: str, fn, *args, **kw):
+    t = time.perf_counter()
+    try:
+        return fn(*args, **kw)
+    finally:
+        stats.record(name, (time.perf_counter() - t) * 1000)
+
+
+def hedged(name: str, fn, enabled: bool = True):
+    """멱등 요청 전용: p95 가 지나도 안 끝나면 같은 요청을 한 번 더 보내고 먼저 성공한 결과를 씀"""
+    hedge_after = stats.percentile(name, 0.95) if enabled else None
+    if hedge_after is None:
+        return timed(name, fn)
+
+    d = current()
+    t = time.perf_counter()
+    futs = [_pool.submit(bind(d, fn))]
+    done, _ = wait(futs, timeout=hedge_after / 1000)
+    if not done:
+        stats.count(f"{name}.hedged")
+        futs.append(_pool.submit(bind(d, fn)))
+    pending, first_err = set(futs), None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for f in done:
+            if f.exception() is None:
+                stats.record(name, (time.perf_counter() - t) * 1000)
+                if len(futs) > 1 and f is futs[1]:
+                    stats.count(f"{name}.hedge_won")
+                return f.result()
+            first_err = first_err or f.exception()
+    stats.record(name, (time.perf_counter() - t) * 1000)
+    raise first_err
@@ -0,0 +1,65 @@
+# earcons.py
+# 백엔드 답을 기다리는 동안 깔아 두는 "생각 중" 소리
+# - 로컬에서 한 번 합성한 PCM (네트워크/TTS 없이 요청 보내는 즉시 재생)
+# - 재생 워커의 background 항목으로 반복 → 진짜 답(TTS)이 큐에 들어오면 워커가 알아서 끊음
+# - EARCON_WAV 로 녹음한 소리(PCM16 mono, 24kHz)를 쓸 수도 있음
+import os, math
+from array import array
+
+import playback
+
+AMPLITUDE = 0.12       # 최대 음량 대비 (답 음성보다 한참 작게)
+TONES = ((660, 0.09), (880, 0.09))   # (Hz, 초) 짧은 두 음 "뾰롱"
+GAP_SEC = 0.04
+LOOP_SEC = 1.2         # 한 번 반복 길이 (나머지는 무음)
+FADE_SEC = 0.015       # 음마다 앞뒤 페이드 → 중간에 끊겨도 딸깍 소리 없음
+
+_thinking: bytes | None = None
+
+
+def tone(freq: float, sec: float, rate: int = playback.RATE, amp: float = AMPLITUDE) -> array:
+    n = int(sec * rate)
+    fade = max(1, int(FADE_SEC * rate))
+    out = array("h", bytes(2 * n))
+    for i in range(n):
+        env = min(1.0, i / fade, (n - 1 - i) / fade)
+        out[i] = int(32767 * amp * env * math.sin(2 * math.pi * freq * i / rate))
+    return out
+
+
+def silence(sec: float, rate: int = playback.RATE) -> array:
+    return array("h", bytes(2 * int(sec * rate)))
+
+
+def thinking() -> bytes:
+    """반복 재생용 한 마디 (처음 한 번만 합성)"""
+    global _thinking
+    if _thinking is None:
+        _thinking = _load_wav(os.getenv("EARCON_WAV")) or _synth_thinking()
+    return _thinking
+
+
+def _synth_thinking() -> bytes:
+    pcm = array("h")
+    for freq, sec in TONES:
+        pcm += tone(freq, sec)
+        pcm += silence(GAP_SEC)
+    rest = LOOP_SEC - len(pcm) / playback.RATE
+    if rest > 0:
+        pcm += silence(rest)
+    return pcm.tobytes()
+
+
+def _load_wav(path: str | None) -> bytes | None:
+    if not path:
+        return None
+    import audio_format
+    try:
+        with open(path, "rb") as f:
+            clip = audio_format.parse_wav(f.read())
+        if clip.rate != playback.RATE:
+            raise ValueError(f"샘플레이트 {clip.rate} (필요: {playback.RATE})")
+        return clip.data
+    except Exception as e:
+        print("[EARCON] EARCON_WAV 사용 불가, 기본 소리로:", e)
+        return None
@@ -0,0 +1,170 @@
+# emit_bridge.py
+# 워커 스레드 → SocketIO(eventlet hub) emit 다리
+# - 서버는 async_mode="eventlet" 인데 monkey_patch 는 안 함 → 워커(STT/TTS/백엔드)는 진짜 OS 스레드라
+#   subprocess/requests 로 막혀도 hub 는 안 막힘. 대신 워커가 socketio.emit 을 직접 부르면
+#   hub 소켓을 다른 OS 스레드에서 건드려 emit 이 늦거나 hub 가 멈춤
+# - 워커는 큐에 넣고 pipe 에 1바이트 써서 hub 를 깨움 → hub 의 green thread 가 꺼내서 emit (hub 안에서만 emit)
+#   pipe 쓰기는 이미 깨워 둔 상태면 생략 (몰려와도 깨우기 한 번)
+# - 큐에 넣은 뒤 실제 emit 까지 걸린 시간은 deadline.stats "emit" 으로 (/debug/latency)
+#   python emit_bridge.py --bench → 턴이 subprocess / HTTP 로 막혀 있는 동안에도 emit 지연이 평소와 같은지
+import os, sys, time, select, threading
+from collections import deque
+
+import deadline
+
+
+class EmitBridge:
+    """emit(event, payload) 를 hub 쪽 한 스레드에서만 부르게 함. wait_readable(fd) 는 hub 에 맞는 대기 함수"""
+
+    def __init__(self, emit, wait_readable=None):
+        self._emit = emit
+        self._wait = wait_readable or (lambda fd: select.select([fd], [], []))
+        self._q: deque = deque()
+        self._r, self._w = os.pipe()
+        os.set_blocking(self._r, False)
+        os.set_blocking(self._w, False)
+        self._armed = False
+        self._closed = False
+        self.counts = {"sent": 0, "wakeups": 0, "errors": 0}
+
+    def send(self, event: str, payload: dict | None = None) -> None:
+        """아무 스레드에서나 (막히지 않음)"""
+        self._q.append((event, payload, time.perf_counter()))
+        if not self._armed:
+            self._armed = True
+            try:
+                os.write(self._w, b"\0")
+            except BlockingIOError:
+                pass              # pipe 가 찼으면 이미 깨울 바이트가 있음
+
+    def pump(self) -> None:
+        """hub 쪽에서 돌림 (socketio.start_background_task)"""
+        while not self._closed:
+            self._wait(self._r)
+            try:
+                while os.read(self._r, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+            self.counts["wakeups"] += 1
+            self._armed = False   # 꺼내기 전에 풀어야 그 사이 들어온 것이 다음 깨우기로 옴
+            while self._q:
+                event, payload, t = self._q.popleft()
+                try:
+                    self._emit(event, payload)
+                    self.counts["sent"] += 1
+                except Exception as e:
+                    self.counts["errors"] += 1
+                    print(f"[EMIT] {event} 실패: {e}")
+                deadline.stats.record("emit", (time.perf_counter() - t) * 1000)
+
+    def close(self) -> None:
+        self._closed = True
+        try:
+            os.write(self._w, b"\0")
+        except BlockingIOError:
+            pass
+
+    def pending(self) -> int:
+        return len(self._q)
+
+
+def for_socketio(socketio) -> EmitBridge:
+    """socketio 의 async_mode 에 맞춰 다리를 만들고 hub 쪽 pump 시작"""
+    wait = None
+    if getattr(socketio, "async_mode", None) == "eventlet":
+        from eventlet.hubs import trampoline
+        wait = lambda fd: trampoline(fd, read=True)
+    bridge = EmitBridge(socketio.emit, wait)
+    socketio.start_background_task(bridge.pump)
+    return bridge
+
+
+# ===== 벤치마크 =====
+def _blocking_http(seconds: float):
+    """응답을 seconds 만큼 늦게 주는 로컬 HTTP 서버에 한 번 요청 (백엔드 대기 흉내)"""
+    import urllib.request
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class Slow(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(seconds)
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *a):
+            pass
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Slow)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    try:
+        urllib.request.urlopen(f"http://127.0.0.1:{srv.server_address[1]}/", timeout=seconds + 5).read()
+    finally:
+        srv.shutdown()
+
+
+def bench(phase_sec: float = 1.0, interval: float = 0.01) -> dict:
+    """idle / subprocess 로 막힌 턴 / HTTP 로 막힌 턴 동안 10ms 마다 emit → 큐에서 emit 까지 지연"""
+    import subprocess
+    lags: dict[str, list] = {}
+    phase = ["idle"]
+
+    def emit(event, payload):
+        if payload:
+            lags.setdefault(payload["phase"], []).append((time.perf_counter() - payload["t"]) * 1000)
+
+    try:
+        import eventlet
+        from eventlet.hubs import trampoline
+        hub = "eventlet"
+        bridge = EmitBridge(emit, lambda fd: trampoline(fd, read=True))
+        eventlet.spawn(bridge.pump)
+        idle = eventlet.sleep
+    except ImportError:
+        hub = "thread"
+        bridge = EmitBridge(emit)
+        threading.Thread(target=bridge.pump, daemon=True).start()
+        idle = time.sleep
+
+    done = threading.Event()
+
+    def sender():
+        while not done.is_set():
+            bridge.send("tick", {"phase": phase[0], "t": time.perf_counter()})
+            time.sleep(interval)
+
+    def turns():
+        time.sleep(phase_sec)
+        phase[0] = "subprocess"
+        subprocess.call(["sleep", str(phase_sec)])
+        phase[0] = "http"
+        _blocking_http(phase_sec)
+        phase[0] = "after"
+        time.sleep(phase_sec / 2)
+        done.set()
+
+    threading.Thread(target=sender, daemon=True).start()
+    threading.Thread(target=turns, daemon=True).start()
+    while not done.is_set():
+        idle(0.05)     # eventlet 이면 여기서 hub 가 돎
+    bridge.close()
+
+    res = {"hub": hub, "wakeups": bridge.counts["wakeups"], "sent": bridge.counts["sent"]}
+    for name, xs in lags.items():
+        xs.sort()
+        res[name] = {"n": len(xs), "p50": round(xs[len(xs) // 2], 2), "p95": round(xs[int(len(xs) * 0.95)], 2),
+                     "max": round(xs[-1], 2)}
+    return res
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--bench"]:
+        r = bench()
+        print(f"[EMIT BENCH] hub={r.pop('hub')} sent={r.pop('sent')} wakeups={r.pop('wakeups')}")
+        for name, v in r.items():
+            print(f"[EMIT BENCH] {name:>10}: {v}")
+        flat = all(r[k]["p95"] <= r["idle"]["p95"] + 5 for k in ("subprocess", "http") if k in r)
+        print(f"[EMIT BENCH] flat while blocked: {flat}")
+    else:
+        print("usage: python emit_bridge.py --bench")
@@ -0,0 +1,35 @@
+# http_client.py
+# 공용 requests.Session (keep-alive 커넥션 풀)
+# - 매 턴 TCP/TLS 핸드셰이크를 다시 하지 않도록 백엔드/Clova 호출이 같은 풀을 씀
+# - requests 는 첫 사용 때 import (시작 시간 단축)
+import threading
+
+_session = None
+_lock = threading.Lock()
+
+
+def session():
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16)
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+                _session = s
+    return _session
+
+
+def warm(urls: list[str], timeout: float = 3.0) -> None:
+    """커넥션을 미리 열어 둠 (응답 코드는 상관없음)"""
+    for url in urls:
+        if not url:
+            continue
+        try:
+            session().head(url, timeout=timeout)
+            print(f"[HTTP WARM] {url}")
+        except Exception as e:
+            print(f"[HTTP WARM] {url} 실패: {e}")
@@ -0,0 +1,176 @@
+# intents.py
+# 종료 키워드 / 예·아니오 판정을 모드별 어휘로 컴파일한 정규식 하나로 (발화당 한 번 훑기)
+# - 어휘 표기: "응" = 낱말 전체, "맞아*" = 낱말 앞부분, "*종료*" = 어디든
+#   (substring 검사는 "싫음" 의 "음", "그럼 안 돼" 의 "그럼" 을 긍정으로 잡았음)
+# - 부정: 앞에 "안/못", 뒤에 "-지 않/마/말" 이 붙으면 yes → no, no → yes ("안 싫어"), stop → 무시 ("그만하지 마")
+#   yes 낱말 뒤에 "안/못 돼·되" 가 오면 그것도 부정 ("그럼 안 돼" → no). 부정이 두 번이면 원래 뜻 ("안 맞지 않아" → yes)
+# - 여러 의도가 같이 나오면 priority 순 (확인 질문은 no 가 yes 보다 먼저)
+#   python intents.py --bench   → 라벨 붙은 말뭉치로 기존 substring 방식과 정확도/속도 비교
+import re, sys, time
+
+# 낱말 글자 = \w (한글 음절/자모, 영문, 숫자). [가-힣ㄱ-ㅎ...] 같은 큰 유니코드 범위 클래스는 어휘마다 컴파일 비용이 커서
+# (CONFIRM 하나에 ~50ms, IGNORECASE 면 몇 배) 범주 \w 로
+_WORD = r"\w"
+_NEG_BEFORE = re.compile(r"(?:^|\s)(?:안|못)\s*$")
+_NEG_AFTER = re.compile(_WORD + r"*?지\s*(?:않|마|말)")
+_NEG_TAIL = re.compile(_WORD + r"*\s+(?:안|못)\s*(?:돼|되)")
+NEGATABLE = {"yes": "no", "no": "yes", "stop": None}
+
+
+def _pattern(phrase: str) -> str:
+    head, tail = phrase.startswith("*"), phrase.endswith("*")
+    body = re.escape(phrase.strip("*")).replace(r"\ ", r"\s*")
+    return ("" if head else f"(?<!{_WORD})") + body + ("" if tail or head else f"(?!{_WORD})")
+
+
+class Match:
+    def __init__(self, intent: str | None, phrase: str | None = None, negated: bool = False):
+        self.intent = intent
+        self.phrase = phrase
+        self.negated = negated
+
+    def __repr__(self) -> str:
+        return f"Match({self.intent!r}, {self.phrase!r}, negated={self.negated})"
+
+
+class IntentMatcher:
+    """vocab: {intent: [어휘...]}. 어휘는 긴 것부터 한 정규식 alternation 으로 묶어 둠"""
+
+    def __init__(self, vocab: dict[str, list[str]], priority: list[str] | None = None):
+        self.priority = priority or list(vocab)
+        entries = sorted(((len(p.strip("*")), intent, p) for intent, ps in vocab.items() for p in ps), reverse=True)
+        self._intents = [intent for _, intent, _ in entries]
+        # IGNORECASE 는 컴파일이 느림 → 어휘는 소문자로 컴파일하고 입력을 match() 에서 한 번 소문자로
+        self._re = re.compile("|".join(f"(?P<g{i}>{_pattern(p.lower())})" for i, (_, _, p) in enumerate(entries)))
+
+    def match(self, text: str) -> Match:
+        hits: dict[str, Match] = {}
+        text = (text or "").lower()
+        for m in self._re.finditer(text):
+            intent = self._intents[int(m.lastgroup[1:])]
+            negated = intent in NEGATABLE and bool(
+                bool(_NEG_BEFORE.search(text, 0, m.start())) ^ bool(_NEG_AFTER.match(text, m.start()))
+                ^ (intent == "yes" and bool(_NEG_TAIL.match(text, m.end()))))
+            if negated:
+                intent = NEGATABLE[intent]
+                if intent is None:
+                    continue
+            hits.setdefault(intent, Match(intent, m.group(), negated))
+        for intent in self.priority:
+            if intent in hits:
+                return hits[intent]
+        return Match(None)
+
+    def __call__(self, text: str) -> str | None:
+        return self.match(text).intent
+
+
+# ===== 모드별 어휘 =====
+STOP_QUIZ = IntentMatcher({"stop": ["그만", "그만하*", "그만해*", "그만할*", "그만둘*", "끝내*", "끝낼*", "*종료*", "stop*"]})
+STOP_CONVERSATION = IntentMatcher({"stop": ["그만", "그만하*", "그만해*", "그만할*", "그만둘*", "끝내*", "끝낼*", "*종료*", "stop*", "quit*"]})
+STOP_ROLEPLAY = IntentMatcher({"stop": ["그만하고 싶*", "역할놀이 그만*", "역할놀이 끝*"]})   # 역할 대사 속 "그만" 은 무시
+CONFIRM = IntentMatcher({
+    "yes": ["네", "네에*", "네네*", "넹*", "예", "예예*", "예스", "응*", "으응", "웅*", "음", "맞아*", "맞지*", "맞습니다", "맞음", "맞죠", "그래*",
+            "그럼", "그렇지*", "좋아*", "좋지*", "좋습니다", "좋죠", "옳소", "옳습니다", "오케이", "ok"],
+    "no": ["아니*", "아냐*", "싫어*", "싫지*", "싫음", "틀려*", "틀렸*", "노", "다시 할*", "다시 해*", "다시 정*",
+           "다시 고를*", "다시 골라*", "바꿀*", "바꿔*"],   # "다시 말해줄래?" 는 되묻기 (아니오 아님)
+}, priority=["no", "yes"])
+
+
+# ===== 벤치마크 =====
+# (matcher, 발화, 정답) — STT 로그에서 자주 나온 모양
+CORPUS = [
+    ("confirm", "응", "yes"), ("confirm", "응응", "yes"), ("confirm", "네", "yes"), ("confirm", "네.", "yes"),
+    ("confirm", "맞아요", "yes"), ("confirm", "맞아 맞아", "yes"), ("confirm", "그래", "yes"),
+    ("confirm", "좋아", "yes"), ("confirm", "웅", "yes"), ("confirm", "예", "yes"), ("confirm", "오케이", "yes"),
+    ("confirm", "아니야", "no"), ("confirm", "아니", "no"), ("confirm", "아냐 싫어", "no"), ("confirm", "싫음", "no"),
+    ("confirm", "안 맞아", "no"), ("confirm", "맞지 않아", "no"), ("confirm", "아니 그럼 안 돼", "no"),
+    ("confirm", "응 아니야 바꿀래", "no"), ("confirm", "좋지 않아", "no"), ("confirm", "다시 할래", "no"),
+    ("confirm", "안 좋아", "no"), ("confirm", "틀렸어", "no"), ("confirm", "맞지", "yes"),
+    ("confirm", "그럼 안 돼", "no"), ("confirm", "그래 안돼", "no"), ("confirm", "안 싫어", "yes"),
+    ("confirm", "싫지 않아", "yes"), ("confirm", "안 맞지 않아", "yes"),
+    ("confirm", "처음부터 할래", None), ("confirm", "다음에", None), ("confirm", "그네 타고 싶어", None),
+    ("confirm", "네가 해", None), ("confirm", "반응이 없네", None), ("confirm", "음식 먹고 싶어", None),
+    ("quiz", "그만", "stop"), ("quiz", "이제 그만할래", "stop"), ("quiz", "퀴즈 종료", "stop"),
+    ("quiz", "끝내자", "stop"), ("quiz", "그만하지 마", None), ("quiz", "사과", None), ("quiz", "그만큼 커", None),
+    ("quiz", "끝까지 할래", None), ("quiz", "호랑이", None), ("quiz", "안 그만해", None),
+    ("conversation", "오늘 재밌었어", None), ("conversation", "그만 얘기할래", "stop"), ("conversation", "quit", "stop"),
+    ("conversation", "끝내고 싶어", "stop"), ("conversation", "종료해줘", "stop"),
+    ("roleplay", "엄마 그만 때려", None), ("roleplay", "그만하고 싶어", "stop"), ("roleplay", "그만하고싶어", "stop"),
+    ("roleplay", "역할놀이 그만할래", "stop"), ("roleplay", "이제 그만 울어", None),
+    # 예전 held-out (어휘를 고치면서 봤으므로 이제 말뭉치)
+    ("confirm", "네네", "yes"), ("confirm", "예예", "yes"), ("confirm", "네네네", "yes"), ("confirm", "넹", "yes"),
+    ("confirm", "웅웅", "yes"), ("confirm", "응 맞아", "yes"), ("confirm", "그래 좋아", "yes"),
+    ("confirm", "다시 말해줄래? 응", "yes"), ("confirm", "맞아 그거야", "yes"), ("confirm", "어 맞아", "yes"),
+    ("confirm", "좋아요", "yes"), ("confirm", "그렇지요", "yes"), ("confirm", "맞아맞아", "yes"),
+    ("confirm", "아니요", "no"), ("confirm", "아니 반대야", "no"), ("confirm", "싫어요", "no"),
+    ("confirm", "그거 아니야", "no"), ("confirm", "다시 정할래", "no"), ("confirm", "역할 바꿔줘", "no"),
+    ("confirm", "안 좋아요", "no"), ("confirm", "맞지 않아요", "no"), ("confirm", "틀려", "no"),
+    ("confirm", "다시 말해줄래", None), ("confirm", "뭐라고?", None), ("confirm", "네모 그릴래", None),
+    ("confirm", "예쁘다", None), ("confirm", "음악 틀어줘", None), ("confirm", "노래 불러줘", None),
+    ("quiz", "그만할래요", "stop"), ("quiz", "이제 끝낼래", "stop"), ("quiz", "퀴즈 그만", "stop"),
+    ("quiz", "그만하지 말자", None), ("quiz", "그만두지 마", None), ("quiz", "종이", None),
+    ("conversation", "대화 종료", "stop"), ("conversation", "이제 그만 얘기하자", "stop"),
+    ("conversation", "그만큼 좋아", None), ("roleplay", "그만하고 싶어요", "stop"), ("roleplay", "그만 먹어", None),
+]
+# 어휘를 고칠 때 보지 않은 모양 (어휘를 만든 사람이 아닌 쪽이 아이 발화 모양으로 따로 적음) → 말뭉치에 맞춘 정확도인지 확인용
+# 여기서 틀린 것을 보고 어휘를 고쳤다면 그 줄은 CORPUS 로 옮기고 새로 안 본 모양을 채울 것 (그래야 계속 held-out)
+HELDOUT = [
+    ("confirm", "어", "yes"), ("confirm", "응 그거", "yes"), ("confirm", "그래그래", "yes"),
+    ("confirm", "맞아 맞아 완전 맞아", "yes"), ("confirm", "좋아 그렇게 하자", "yes"), ("confirm", "알았어", "yes"),
+    ("confirm", "당연하지", "yes"), ("confirm", "그렇게 해", "yes"), ("confirm", "그래도 돼", "yes"),
+    ("confirm", "좋은 생각이야", "yes"), ("confirm", "아니아니", "no"), ("confirm", "노노", "no"),
+    ("confirm", "아닌데", "no"), ("confirm", "별로야", "no"), ("confirm", "하기 싫어", "no"),
+    ("confirm", "그거 말고", "no"), ("confirm", "다른 거 할래", "no"), ("confirm", "안 돼", "no"),
+    ("confirm", "몰라", None), ("confirm", "잘 모르겠어", None), ("confirm", "네모난 거", None),
+    ("confirm", "응가 마려워", None), ("confirm", "엄마한테 물어볼래", None),
+    ("quiz", "그만 할래", "stop"), ("quiz", "이제 안 할래", "stop"), ("quiz", "재미없어 그만", "stop"),
+    ("quiz", "끝", "stop"), ("quiz", "한 문제 더", None), ("quiz", "그만두고 싶어", "stop"),
+    ("conversation", "이제 끝이야", "stop"), ("conversation", "대화 그만하자", "stop"),
+    ("conversation", "오늘은 여기까지", "stop"), ("conversation", "그만 웃겨", None),
+    ("roleplay", "그만하고 싶어졌어", "stop"), ("roleplay", "역할놀이 그만", "stop"), ("roleplay", "나 그만할래", "stop"),
+    ("roleplay", "선생님 그만 하세요", None),
+]
+MATCHERS = {"confirm": CONFIRM, "quiz": STOP_QUIZ, "conversation": STOP_CONVERSATION, "roleplay": STOP_ROLEPLAY}
+
+# 이전 코드의 substring 검사 (비교용)
+_LEGACY_POS = ["네", "네.", "네에", "네에에", "예", "예스", "응", "응.", "응응", "음", "으응", "웅", "웅웅", "맞아", "맞아요",
+               "맞습니다", "맞음", "그래", "그래요", "그럼", "그렇지", "좋아", "좋습니다", "좋죠", "옳소", "옳습니다"]
+_LEGACY_NEG = ["아니", "아니야", "아냐", "싫어"]
+_LEGACY_STOP = {"quiz": ["그만", "끝내", "종료", "퀴즈 종료", "stop"],
+                "conversation": ["그만", "끝내", "종료", "stop", "quit"], "roleplay": ["그만하고 싶어"]}
+
+
+def _legacy(kind: str, text: str) -> str | None:
+    if kind == "confirm":
+        if any(p in text for p in _LEGACY_POS):
+            return "yes"
+        return "no" if any(n in text for n in _LEGACY_NEG) else None
+    return "stop" if any(k in text for k in _LEGACY_STOP[kind]) else None
+
+
+def bench(rounds: int = 2000) -> dict:
+    res = {}
+    for name, fn in (("legacy", _legacy), ("matcher", lambda kind, text: MATCHERS[kind](text))):
+        wrong = [(k, t, want, got) for k, t, want in CORPUS if (got := fn(k, t)) != want]
+        held = [(k, t, want, got) for k, t, want in HELDOUT if (got := fn(k, t)) != want]
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            for k, t, _ in CORPUS:
+                fn(k, t)
+        us = (time.perf_counter() - t0) / (rounds * len(CORPUS)) * 1e6
+        res[name] = {"accuracy": round(1 - len(wrong) / len(CORPUS), 3), "us_per_utt": round(us, 2), "wrong": wrong,
+                     "heldout": round(1 - len(held) / len(HELDOUT), 3), "heldout_wrong": held}
+    return res
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--bench"]:
+        r = bench()
+        print(f"[INTENT BENCH] corpus={len(CORPUS)} heldout={len(HELDOUT)}")
+        for name, v in r.items():
+            print(f"[INTENT BENCH] {name:>7}: accuracy={v['accuracy']} heldout={v['heldout']} {v['us_per_utt']}us/utt")
+            for k, t, want, got in v["wrong"] + v["heldout_wrong"]:
+                print(f"    {k:<12} {t!r}: want={want} got={got}")
+    else:
+        print("usage: python intents.py --bench")
@@ -0,0 +1,146 @@
+# memwatch.py
+# 며칠씩 켜 두는 pi_controller 의 메모리 관찰 + soak 테스트
+# - RSS(/proc/self/status) 는 항상, 할당 위치는 tracemalloc 을 켰을 때만 (MEMORY_TRACE=1 또는 /debug/memory?trace=start)
+#   tracemalloc 은 켤 때 스냅샷을 기준으로 잡아 두고 → "켠 뒤로 가장 많이 늘어난 할당 위치" top N
+# - tracemalloc 은 할당마다 비용이 있어서 기본은 꺼 둠
+#   python memwatch.py --soak [--turns 3000] [--max-growth-mb 8] [--trace]
+#     → stub 제공자 + 스텁 백엔드로 대화/퀴즈/역할놀이 턴을 수천 번 돌리고, 워밍업 뒤 RSS 가 문턱 넘게 늘면 실패(exit 1)
+import os, gc, sys, time, tracemalloc
+
+TRACE_FRAMES = int(os.getenv("MEMORY_TRACE_FRAMES", "1"))
+_IGNORE = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+           tracemalloc.Filter(False, "<unknown>")]
+
+
+def rss_kb() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss     # /proc 이 없으면 최대값이라도
+
+
+class MemoryWatch:
+    def __init__(self):
+        self.t0 = time.time()
+        self.start_rss = rss_kb()
+        self.baseline: tracemalloc.Snapshot | None = None
+
+    def start_tracing(self, frames: int = TRACE_FRAMES) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.baseline = tracemalloc.take_snapshot().filter_traces(_IGNORE)
+
+    def stop_tracing(self) -> None:
+        tracemalloc.stop()
+        self.baseline = None
+
+    def report(self, top: int = 15) -> dict:
+        rss = rss_kb()
+        out = {
+            "uptime_sec": round(time.time() - self.t0),
+            "rss_kb": rss,
+            "rss_growth_kb": rss - self.start_rss,
+            "gc": {"counts": gc.get_count(), "objects": len(gc.get_objects()), "garbage": len(gc.garbage)},
+            "tracing": tracemalloc.is_tracing(),
+        }
+        if not tracemalloc.is_tracing():
+            return out
+        snap = tracemalloc.take_snapshot().filter_traces(_IGNORE)
+        cur, peak = tracemalloc.get_traced_memory()
+        out["traced_kb"] = {"current": cur // 1024, "peak": peak // 1024}
+        out["top_sites"] = [{"site": str(s.traceback), "kb": round(s.size / 1024, 1), "count": s.count}
+                            for s in snap.statistics("lineno")[:top]]
+        if self.baseline is not None:
+            out["top_growth"] = [{"site": str(d.traceback), "kb_diff": round(d.size_diff / 1024, 1), "count_diff": d.count_diff}
+                                 for d in snap.compare_to(self.baseline, "lineno")[:top] if d.size_diff > 0]
+        return out
+
+
+# ===== soak 테스트 =====
+_UTTERANCES = ["오늘 유치원에서 그림 그렸어", "사과", "호랑이", "나는 기차가 좋아", "왜 하늘은 파래?", "배고파"]
+
+
+def _chunks(turns_per_chunk: int):
+    """(라우트, body, 이번 묶음에 말할 문장들) 을 돌아가며: 대화 / 초성퀴즈 / 역할놀이(chatroom 있음 → 바로 talk)"""
+    i = 0
+    while True:
+        utts = [_UTTERANCES[(i + k) % len(_UTTERANCES)] for k in range(turns_per_chunk)]
+        yield ("/start/conversation", {"profile_id": 1, "session_id": f"soak-conv-{i}", "access_token": "t"}, utts + ["그만"])
+        yield ("/start/quiz", {"profile_id": 1, "session_id": f"soak-quiz-{i}"}, utts + ["그만"])
+        yield ("/start/roleplay", {"profile_id": 1, "session_id": f"soak-rp-{i}", "chatroom_id": 1,
+                                   "access_token": "t"}, utts + ["그만하고 싶어"])
+        i += 1
+
+
+def soak(turns: int = 3000, max_growth_mb: float = 8.0, turns_per_chunk: int = 50, trace: bool = False) -> dict:
+    from api_load import _stub_backend, _controller
+    srv = _stub_backend(0)
+    pc, _ = _controller(f"http://127.0.0.1:{srv.server_address[1]}")
+    import audio_providers
+    stub = audio_providers.get("stub")
+    client = pc.app.test_client()
+    watch = MemoryWatch()
+    warmup = max(turns // 10, turns_per_chunk * 3)
+    done, base_rss, samples = 0, None, []
+    t0 = time.perf_counter()
+    devnull = open(os.devnull, "w")
+    real_stdout, sys.stdout = sys.stdout, devnull       # 턴마다 찍는 print 는 버림 (워커 스레드 것까지)
+    try:
+        for route, body, utts in _chunks(turns_per_chunk):
+            if done >= turns:
+                break
+            stub.push(*utts)
+            client.post(route, json=body)
+            worker = pc.sessions.default.worker
+            if worker:
+                worker.join(timeout=120)
+            pc.stop_worker()
+            done += len(utts)
+            stub.spoken.clear()
+            if base_rss is None and done >= warmup:
+                gc.collect()
+                base_rss = rss_kb()
+                if trace:
+                    watch.start_tracing(10)
+            if base_rss is not None:
+                samples.append((done, rss_kb()))
+    finally:
+        sys.stdout = real_stdout
+        devnull.close()
+        srv.shutdown()
+    gc.collect()
+    end_rss = rss_kb()
+    growth_mb = (end_rss - (base_rss or end_rss)) / 1024
+    res = {
+        "turns": done, "warmup_turns": warmup, "sec": round(time.perf_counter() - t0, 1),
+        "rss_mb": {"start": round(watch.start_rss / 1024, 1), "after_warmup": round((base_rss or 0) / 1024, 1),
+                   "end": round(end_rss / 1024, 1)},
+        "growth_mb": round(growth_mb, 2), "max_growth_mb": max_growth_mb,
+        "curve": samples[:: max(1, len(samples) // 10)],
+        "ok": growth_mb <= max_growth_mb,
+    }
+    if trace:
+        res["top_growth"] = watch.report(10).get("top_growth", [])
+    return res
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ["--soak"]:
+        opt = lambda name, default: type(default)(args[args.index(name) + 1]) if name in args else default
+        r = soak(opt("--turns", 3000), opt("--max-growth-mb", 8.0), trace="--trace" in args)
+        print(f"[SOAK] turns={r['turns']} (warmup {r['warmup_turns']}) in {r['sec']}s rss={r['rss_mb']}")
+        print(f"[SOAK] curve (turns, rss_kb)={r['curve']}")
+        for g in r.get("top_growth", []):
+            print(f"[SOAK]   +{g['kb_diff']}KB ({g['count_diff']:+}) {g['site']}")
+        print(f"[SOAK] growth={r['growth_mb']}MB (max {r['max_growth_mb']}MB) → {'PASS' if r['ok'] else 'FAIL'}")
+        sys.exit(0 if r["ok"] else 1)
+    else:
+        w = MemoryWatch()
+        print(w.report())
+        print("usage: python memwatch.py --soak [--turns 3000] [--max-growth-mb 8] [--trace]")
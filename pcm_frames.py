@@ -0,0 +1,194 @@
+# pcm_frames.py
+# 48kHz 스테레오 S16 프레임을 복사 없이 처리: downmix → 16kHz resample, 프레임 RMS(VAD)
+# - 링 버퍼 슬롯의 memoryview 를 그대로 받아 numpy view (없으면 memoryview.cast("h")) 로 계산
+# - 필터 이력/출력 버퍼는 미리 잡아 두고 재사용 → 프레임마다 할당 없음
+#   python pcm_frames.py --bench [초]  → naive(bytes 슬라이스 + 이어붙이기) 대비 CPU/할당 비교
+import sys, math, time, operator
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+IN_RATE = 48000
+OUT_RATE = 16000
+CHANNELS = 2
+FACTOR = IN_RATE // OUT_RATE
+FRAME_MS = 20
+FRAME_SAMPLES = IN_RATE * FRAME_MS // 1000          # 채널당 960
+FRAME_BYTES = FRAME_SAMPLES * CHANNELS * 2
+TAPS = 24                                            # anti-alias FIR (numpy 경로)
+
+
+def samples(view):
+    """bytes/memoryview → int16 샘플 view (복사 없음)"""
+    if np is not None:
+        return np.frombuffer(view, dtype="<i2")
+    return memoryview(view).cast("B").cast("h")
+
+
+def frame_rms(view, stride: int = 4) -> float:
+    """프레임 RMS. numpy 가 없으면 stride 로 솎아서 계산 (스테레오면 짝수 stride 가 한 채널)"""
+    s = samples(view)
+    if np is not None:
+        if not len(s):
+            return 0.0
+        x = s[::stride].astype(np.float32)
+        return float(np.sqrt(np.dot(x, x) / len(x)))
+    s = s[::stride]   # strided memoryview (복사 없음)
+    n = len(s)
+    return math.sqrt(sum(map(operator.mul, s, s)) / n) if n else 0.0
+
+
+def _lowpass(taps: int = TAPS):
+    """cutoff = OUT_RATE/2 근처 windowed-sinc (Hamming)"""
+    fc = 0.45 / FACTOR
+    m = taps - 1
+    h = [(2 * fc if i == m / 2 else math.sin(2 * math.pi * fc * (i - m / 2)) / (math.pi * (i - m / 2)))
+         * (0.54 - 0.46 * math.cos(2 * math.pi * i / m)) for i in range(taps)]
+    total = sum(h)
+    return [x / total for x in h]
+
+
+class MonoDecimator:
+    """스테레오 48k 프레임 → 모노 16k. weights: 채널 가중치 (채널 선택/빔포밍에서 바꿈)
+
+    process() 가 돌려주는 memoryview 는 다음 process() 때 덮어써짐 (바로 쓰거나 복사할 것)
+    """
+
+    def __init__(self, frame_samples: int = FRAME_SAMPLES, weights=(0.5, 0.5)):
+        if frame_samples % FACTOR:
+            raise ValueError(f"frame_samples 는 {FACTOR} 의 배수여야 함")
+        self.n = frame_samples
+        self.n_out = frame_samples // FACTOR
+        self.weights = weights
+        if np is not None:
+            self._h = np.array(_lowpass(), dtype=np.float32)
+            self._hist = TAPS - 1
+            self._buf = np.zeros(self._hist + self.n, dtype=np.float32)   # [이전 프레임 꼬리 | 이번 모노]
+            self._tmp = np.empty(self.n, dtype=np.float32)
+            self._y = np.empty(self.n_out, dtype=np.float32)
+            self._out = np.empty(self.n_out, dtype="<i2")
+            item = self._buf.itemsize
+            self._win = np.lib.stride_tricks.as_strided(
+                self._buf, shape=(self.n_out, TAPS), strides=(FACTOR * item, item), writeable=False)
+        else:
+            self._out = array("h", bytes(2 * self.n_out))
+
+    def reset(self) -> None:
+        if np is not None:
+            self._buf[:] = 0
+
+    def process(self, frame) -> memoryview:
+        if np is not None:
+            return self._process_np(frame)
+        return self._process_py(frame)
+
+    def _process_np(self, frame) -> memoryview:
+        x = np.frombuffer(frame, dtype="<i2").reshape(-1, CHANNELS)
+        mono = self._buf[self._hist:]
+        np.multiply(x[:, 0], self.weights[0], out=mono, casting="unsafe")
+        np.multiply(x[:, 1], self.weights[1], out=self._tmp, casting="unsafe")
+        np.add(mono, self._tmp, out=mono)
+        np.dot(self._win, self._h, out=self._y)
+        np.clip(self._y, -32768, 32767, out=self._y)
+        self._out[:] = self._y
+        self._buf[:self._hist] = self._buf[-self._hist:]
+        return memoryview(self._out).cast("B")
+
+    def _process_py(self, frame) -> memoryview:
+        # numpy 없을 때: 3샘플 평균(box) decimation. 입력은 strided memoryview 로만 읽고 출력 array 재사용
+        s = samples(frame)
+        wl, wr = self.weights[0] / FACTOR, self.weights[1] / FACTOR
+        step = FACTOR * CHANNELS
+        lo, hi = -32768, 32767
+        self._out[:] = array("h", [
+            min(hi, max(lo, int(wl * (a + b + c) + wr * (d + e + f))))
+            for a, b, c, d, e, f in zip(s[0::step], s[2::step], s[4::step], s[1::step], s[3::step], s[5::step])
+        ])
+        return memoryview(self._out).cast("B")
+
+
+def to_mono16k(pcm, weights=(0.5, 0.5)) -> bytes:
+    """스테레오 48k PCM 전체 → 모노 16k PCM. 출력 버퍼는 한 번만 할당"""
+    view = memoryview(pcm).cast("B")
+    frames = len(view) // FRAME_BYTES
+    dec = MonoDecimator(weights=weights)
+    step = dec.n_out * 2
+    out = bytearray(frames * step)
+    for i in range(frames):
+        out[i * step:(i + 1) * step] = dec.process(view[i * FRAME_BYTES:(i + 1) * FRAME_BYTES])
+    return bytes(out)
+
+
+# ===== 벤치마크 =====
+def _synth(seconds: float) -> bytes:
+    n = int(seconds * IN_RATE)
+    a = array("h", bytes(4 * n))
+    for i in range(n):
+        v = int(6000 * math.sin(2 * math.pi * 440 * i / IN_RATE))
+        a[2 * i] = v
+        a[2 * i + 1] = v // 2
+    return a.tobytes()
+
+
+def _naive(stream: bytes) -> bytes:
+    """프레임마다 bytes 슬라이스 → array → 리스트 downmix/resample → bytes 이어붙이기"""
+    out = b""
+    pending = b""
+    for off in range(0, len(stream), FRAME_BYTES):
+        pending += stream[off:off + FRAME_BYTES]
+        frame, pending = pending[:FRAME_BYTES], pending[FRAME_BYTES:]
+        a = array("h")
+        a.frombytes(frame)
+        mono = [(a[i] + a[i + 1]) // 2 for i in range(0, len(a), 2)]
+        _ = math.sqrt(sum(x * x for x in mono) / len(mono))
+        out += array("h", [sum(mono[i:i + FACTOR]) // FACTOR for i in range(0, len(mono), FACTOR)]).tobytes()
+    return out
+
+
+def _pooled(view: memoryview) -> bytearray:
+    """링 버퍼 슬롯(memoryview)을 그대로 읽고, 결과는 미리 잡은 bytearray 에"""
+    dec = MonoDecimator()
+    frames = len(view) // FRAME_BYTES
+    step = dec.n_out * 2
+    out = bytearray(frames * step)
+    for i in range(frames):
+        f = view[i * FRAME_BYTES:(i + 1) * FRAME_BYTES]
+        frame_rms(f)
+        out[i * step:(i + 1) * step] = dec.process(f)
+    return out
+
+
+def bench(seconds: float = 10.0) -> dict:
+    import tracemalloc
+    stream = _synth(seconds)
+    ring = memoryview(bytearray(stream))   # 링 버퍼 흉내 (측정 밖에서 준비)
+    res = {"numpy": np is not None, "audio_sec": seconds}
+    for name, fn, arg in (("naive", _naive, stream), ("pooled", _pooled, ring)):
+        c0 = time.process_time()
+        fn(arg)
+        cpu = time.process_time() - c0
+        # 메모리는 따로 한 번 더 (tracemalloc 이 CPU 측정을 왜곡하지 않게)
+        tracemalloc.start()
+        fn(arg)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        res[name] = {
+            "cpu_ms": round(cpu * 1000, 1),
+            "realtime_pct": round(cpu / seconds * 100, 2),   # 오디오 1초당 CPU 사용 비율 (Pi 는 대략 5~10배)
+            "peak_kb": round(peak / 1024, 1),
+        }
+    return res
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "--bench":
+        r = bench(float(sys.argv[2]) if len(sys.argv) > 2 else 10.0)
+        print(f"[BENCH] numpy={r['numpy']} audio={r['audio_sec']}s")
+        for k in ("naive", "pooled"):
+            v = r[k]
+            print(f"[BENCH] {k:>6}: cpu={v['cpu_ms']}ms ({v['realtime_pct']}% of realtime) peak={v['peak_kb']}KB")
+    else:
+        print("usage: python pcm_frames.py --bench [seconds]")
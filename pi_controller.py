@@ -2,20 +2,33 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import annotations
+import startup   # 가장 먼저: 부팅 후 ready 까지 시간 측정
+import memwatch
 from flask import Flask, request, jsonify
-from threading import Thread, Event
-import os, traceback, logging, requests, importlib, types, re
+import os, sys, time, traceback, logging, re, threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import http_client
+import deadline
 from dotenv import load_dotenv
 #from ws_event import create_socketio, notify
 from session_store import current_mode, current_session, current_roles
-from clova_roleplay import parse_roles_basic, call_start, call_talk, call_end
+import session_manager
+from session_manager import SessionManager, DEFAULT_DEVICE
+from session_journal import SessionJournal
+import audio_providers
+import emit_bridge
+import session_trace
+import profiler
+from capture_stats import AdaptiveWindows
+from telemetry import TelemetryUploader
+from roleplay_start import RoleplayStarter
+from alias_index import normalize_gguro
+from turn_machine import Runner, Mode, State, END, BACKEND, say, emit, call
+from quiz_bank import QuizBank, LocalQuiz, ResultOutbox, PHRASES as QUIZ_PHRASES, FALLBACK_NOTICE, RESULTS_PATH
 from flask_socketio import SocketIO
 
 app = Flask(__name__)
 
-stop_event = Event()
-worker_thread = None
-
 socketio: SocketIO | None = None
 # ===== SocketIO 초기화 =====
 def create_socketio(app):
@@ -31,12 +44,15 @@ def create_socketio(app):
     return socketio
 
 socketio = create_socketio(app)
+emits = emit_bridge.for_socketio(socketio)   # 워커 스레드 emit 은 hub 로 넘겨서
 
 def notify(event: str, data: dict = None):
     payload = data or {}
+    sess = session_manager.current()
+    if sess and sess.device_id != DEFAULT_DEVICE:
+        payload = {**payload, "device_id": sess.device_id}
     print(f"[SOCKET EMIT] event={event}, data={payload}")
-    if socketio:
-        socketio.emit(event, payload)
+    emits.send(event, payload)
 
 
 # ===== 로깅/배너 =====
@@ -45,19 +61,33 @@ app.logger.setLevel(logging.INFO)
 VERSION = "pi_controller v2025-08-27"
 print(f">>> {VERSION} :: __file__={__file__} :: cwd={os.getcwd()}")
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env")) 
+startup.mark("imports")
+
+# 메모리 관찰 (/debug/memory). MEMORY_TRACE=1 이면 지금부터 할당 위치 추적 (할당마다 비용 있음)
+memory = memwatch.MemoryWatch()
+if os.getenv("MEMORY_TRACE") == "1":
+    memory.start_tracing()
 
 # ===== 백엔드 설정 =====
 BACKEND_BASE = os.getenv("BACKEND_BASE") or os.getenv("SERVER_URL") or "http://127.0.0.1:8080"
-BACKEND_TIMEOUT = int(os.getenv("BACKEND_TIMEOUT", "30"))
+BACKEND_TIMEOUT = deadline.BACKEND_TIMEOUT
 
 # ===== 상태 =====
-worker_thread: Thread | None = None
-stop_event = Event()
+# 세션 저널 (재시작 시 이어하기). JOURNAL_PATH=off 면 사용 안 함
+JOURNAL_PATH = os.getenv("JOURNAL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "session_journal.log"))
+journal = SessionJournal(JOURNAL_PATH) if JOURNAL_PATH != "off" else None
+
+# 장치(device_id)별 세션. 기존 /start/* 라우트는 sessions.default 를 사용
+sessions = SessionManager(journal=journal, on_exit=lambda sess: _turn_end())
 volume_percent = 60
 
-# ===== TTS/STT 자동 감지 =====
-_TTS_FUNC = None
-_STT_FUNC = None
+# profile_id × mode 별 녹음 창 학습 (CAPTURE_STATS_PATH=off 면 저장 안 함)
+CAPTURE_STATS_PATH = os.getenv("CAPTURE_STATS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "capture_stats.json"))
+capture_windows = AdaptiveWindows(CAPTURE_STATS_PATH if CAPTURE_STATS_PATH != "off" else None)
+
+# ===== TTS/STT 제공자 (audio_providers, 시작 시 고정) =====
+_TTS: audio_providers.AudioProvider | None = None
+_STT: audio_providers.AudioProvider | None = None
 _TTS_SRC = None
 _STT_SRC = None
 
@@ -99,68 +129,195 @@ def clean_role(role: str) -> str:
 
     return role
 
-def _import_attr(module_name: str, cand_names: list[str]):
-    try:
-        mod = importlib.import_module(module_name)
-    except Exception:
-        return None, None
-    for name in cand_names:
-        if hasattr(mod, name) and isinstance(getattr(mod, name), (types.FunctionType, types.BuiltinFunctionType)):
-            return getattr(mod, name), f"{module_name}.{name}"
-    return None, None
+_resolve_lock = threading.Lock()
 
 def _resolve_tts_stt():
-    global _TTS_FUNC, _STT_FUNC, _TTS_SRC, _STT_SRC
-    if _TTS_FUNC and _STT_FUNC:
-        return
-
-    tts_candidates = [
-        ("clova_conversation", ["tts_say", "speak", "tts", "say", "play_tts"]),
-        ("clova_tts",         ["speak", "tts_say", "say", "tts"]),
-    ]
-    stt_candidates = [
-        ("clova_conversation", ["stt_once", "listen_once", "stt", "record_and_transcribe", "asr_once"]),
-        ("clova_stt",          ["stt_once", "listen_once", "stt"]),
-    ]
-
-    for mod, names in tts_candidates:
-        func, src = _import_attr(mod, names)
-        if func:
-            _TTS_FUNC, _TTS_SRC = func, src
-            break
-
-    for mod, names in stt_candidates:
-        func, src = _import_attr(mod, names)
-        if func:
-            _STT_FUNC, _STT_SRC = func, src
-            break
-
-    if not _TTS_FUNC or not _STT_FUNC:
-        tried = {
-            "tts_tried": [f"{m}.{n}" for m, ns in tts_candidates for n in ns],
-            "stt_tried": [f"{m}.{n}" for m, ns in stt_candidates for n in ns],
-        }
-        raise RuntimeError("TTS/STT 함수 탐색 실패. 후보 중 하나씩 제공해 주세요.\n" + str(tried))
+    """시작할 때 한 번: TTS_PROVIDER / STT_PROVIDER (기본 cached:clova / clova) 고정"""
+    global _TTS, _STT, _TTS_SRC, _STT_SRC
+    with _resolve_lock:
+        if _TTS and _STT:
+            return
+        tts, stt = audio_providers.resolve(
+            os.getenv("TTS_PROVIDER", "cached:clova"),
+            os.getenv("STT_PROVIDER", "clova"),
+        )
+        _TTS_SRC, _STT_SRC = tts.name, stt.name
+        _TTS, _STT = tts, stt
     app.logger.info(f"[audio] TTS={_TTS_SRC}, STT={_STT_SRC}")
 
 def tts_say(text: str) -> None:
-    _resolve_tts_stt()
-    try:
-        _TTS_FUNC(text)
-    except TypeError:
-        _TTS_FUNC(text=text)
+    if _TTS is None:   # 백그라운드 워밍업보다 첫 턴이 먼저 온 경우
+        _resolve_tts_stt()
+    sess = session_manager.current()
+    t = time.perf_counter()
+    _TTS.say(text, out_dev=sess and sess.out_dev, tag=sess and sess.tag)
+    ms = round((time.perf_counter() - t) * 1000)
+    rec = _turn()
+    if rec is not None:
+        rec["replies"].append(text)
+        rec["tts_ms"] += ms
+    if tracer:
+        clip = _TTS.peek(text) if isinstance(_TTS, audio_providers.CachedProvider) else None
+        tracer.say(sess, text, ms, clip)
+
+def _capture_key(sess) -> tuple[int, str | None]:
+    """녹음 창 학습 키: (profile_id, mode)"""
+    sess = sess or sessions.default
+    profile_id = sess.session.get("profile_id") or sess.roles.get("profile_id") or get_profile_id()
+    return profile_id, sess.mode
+
+def stt_once(seconds: float | None = None) -> str:
+    """seconds 를 안 주면 profile/mode 별로 학습된 녹음 창과 hangover 사용"""
+    if _STT is None:
+        _resolve_tts_stt()
+    sess = session_manager.current()
+    tag = sess and sess.tag
+    profile_id, mode = _capture_key(sess)
+    window, hangover = capture_windows.window(profile_id, mode)
+    _stop_earcon()   # 답 없이 바로 다음 질문으로 온 경우 earcon 이 녹음에 섞이지 않게
+    _turn_end()      # 이전 턴(답 말하기까지) 마감
+    # 턴 시작: 녹음 창 + 처리 예산(STT → 백엔드 → TTS)
+    deadline.begin((seconds or window) + TURN_BUDGET_SEC)
+    t = time.perf_counter()
+    text = _STT.listen(seconds or window, in_dev=sess and sess.in_dev, tag=tag, hangover=hangover,
+                       out_dev=sess and sess.out_dev)
+    listen_ms = round((time.perf_counter() - t) * 1000)
+    m = _STT.last_capture(tag)
+    if m:
+        capture_windows.observe(profile_id, mode, m["onset"], m["speech"], m["window"])
+    _turn_begin(sess, profile_id, mode, text, listen_ms, m)
+    if tracer:
+        tracer.listen(sess, text, listen_ms, m, _STT.last_audio(tag))
+    return text
+
+# ===== 턴 기록 (telemetry) =====
+# 턴 = stt_once 한 번 ~ 다음 stt_once 직전 (백엔드 응답, 답 TTS 포함)
+TELEMETRY = os.getenv("TELEMETRY", "1") == "1"
+TELEMETRY_PATH = os.getenv("TELEMETRY_PATH", "/api/telemetry/turns")
+_turn_local = threading.local()
+
+def _telemetry_send(body: bytes, count: int) -> None:
+    headers = {**_auth_headers(), "Content-Encoding": "gzip", "Content-Type": "application/x-ndjson"}
+    r = http_client.session().post(f"{BACKEND_BASE}{TELEMETRY_PATH}", data=body, headers=headers,
+                                   timeout=BACKEND_TIMEOUT)
+    r.raise_for_status()
+
+TELEMETRY_SPOOL = os.getenv("TELEMETRY_SPOOL", os.path.join(os.path.dirname(os.path.abspath(__file__)), "telemetry_spool"))
+telemetry = TelemetryUploader(TELEMETRY_SPOOL, _telemetry_send) if TELEMETRY else None
+
+# 세션 녹화 (TRACE_DIR 를 설정했을 때만, 재생은 python session_trace.py replay)
+TRACE_DIR = os.getenv("TRACE_DIR", "")
+tracer = session_trace.Recorder(TRACE_DIR, [BACKEND_BASE, os.getenv("SERVER_URL")], sessions.default) if TRACE_DIR else None
+
+def _turn() -> dict | None:
+    return getattr(_turn_local, "rec", None)
+
+def _turn_begin(sess, profile_id, mode, text: str, listen_ms: int, capture: dict | None) -> None:
+    if not telemetry:
+        return
+    sess = sess or sessions.default
+    _turn_local.rec = {
+        "ts": time.time(),
+        "device_id": sess.device_id,
+        "session_id": sess.session.get("session_id"),
+        "profile_id": profile_id,
+        "mode": mode,
+        "transcript": text,
+        "normalized": normalize_gguro(text) if text else "",
+        "listen_ms": listen_ms,
+        "capture": capture,
+        "backend_ms": None,
+        "status": None,
+        "filler": False,
+        "replies": [],
+        "tts_ms": 0,
+        "_t0": time.perf_counter(),
+    }
 
-def stt_once(seconds: float = 6.0) -> str:
-    _resolve_tts_stt()
+def _turn_note(**kw) -> None:
+    rec = _turn()
+    if rec is not None:
+        rec.update(kw)
+
+def _turn_end() -> None:
+    rec = _turn()
+    if rec is None:
+        return
+    _turn_local.rec = None
+    rec["turn_ms"] = round((time.perf_counter() - rec.pop("_t0")) * 1000)
+    telemetry.record(rec)
+
+# ===== 턴 예산 / 필러 =====
+TURN_BUDGET_SEC = float(os.getenv("TURN_BUDGET_SEC", "10"))      # 말 끝난 뒤 답을 시작하기까지 목표
+FILLER_MARGIN_SEC = float(os.getenv("FILLER_MARGIN_SEC", "4"))   # 남은 예산이 이만큼이면 필러
+FILLER_TEXT = "잠깐만 기다려줘"
+THINKING_EARCON = os.getenv("THINKING_EARCON", "1") == "1"
+EARCON_TAIL_SEC = float(os.getenv("EARCON_TAIL_SEC", "5"))   # 답 도착 후 TTS 가 안 오면 이만큼 뒤 끔
+# 턴의 백엔드 호출(await_backend) 전용. 미리 합성/퀴즈 prefetch/결과 동기화는 _background_pool 로
+# → 미리 해 두는 일이 몰려도 아이의 턴 요청이 풀 자리를 기다리며 예산을 쓰지 않음
+_backend_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="backend")
+_background_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="background")
+_earcon_local = threading.local()
+
+def _start_earcon():
+    """생각 중 earcon 을 깔아 둠 → 다음 tts_say 가 재생 워커에 들어가는 순간 알아서 멈춤"""
+    if not THINKING_EARCON or _TTS is None:
+        return None
+    sess = session_manager.current()
+    import earcons
+    handle = _TTS.play_background(earcons.thinking(), out_dev=sess and sess.out_dev)
+    _earcon_local.handle = handle
+    return handle
+
+def _stop_earcon() -> None:
+    handle = getattr(_earcon_local, "handle", None)
+    if handle:
+        handle.cancel()
+        _earcon_local.handle = None
+
+def await_backend(fn, *args):
+    """백엔드 호출과 동시에 earcon 을 틀고, 턴 예산이 거의 끝나가면 필러를 한 번 말하고 계속 기다림"""
+    d = deadline.current()
+    t = time.perf_counter()
+    fut = _backend_pool.submit(session_manager.bind(deadline.bind(d, fn)), *args)
+    earcon = _start_earcon()
     try:
-        return _STT_FUNC(seconds=seconds)
-    except TypeError:
-        try:
-            return _STT_FUNC(timeout=seconds)
-        except TypeError:
-            return _STT_FUNC()
+        if d:
+            try:
+                res = fut.result(timeout=max(0.0, d.remaining() - FILLER_MARGIN_SEC))
+            except FutureTimeout:
+                deadline.stats.count("filler_played")
+                _turn_note(filler=True)
+                tts_say(FILLER_TEXT)          # earcon 은 필러에 자리를 내줌
+                earcon = _start_earcon()
+                res = fut.result()
+        else:
+            res = fut.result()
+    except Exception as e:
+        _stop_earcon()
+        _turn_note(backend_ms=round((time.perf_counter() - t) * 1000), status=f"exception:{type(e).__name__}")
+        raise
+    _turn_note(backend_ms=round((time.perf_counter() - t) * 1000),
+               status=res.get("status") if isinstance(res, dict) else None)
+    if earcon:
+        # 보통은 답 TTS 가 끊어 줌. 답을 말하지 않는 분기라면 잠시 뒤 스스로 멈춤
+        threading.Timer(EARCON_TAIL_SEC, earcon.cancel).start()
+    if d and d.expired():
+        deadline.stats.count("turn_deadline_missed")
+    return res
+
+def _precache_filler():
+    if audio_providers.SYNTH in _TTS.capabilities and isinstance(_TTS, audio_providers.CachedProvider):
+        _TTS.synthesize(FILLER_TEXT)
 
 # ===== 백엔드 API =====
+def _backend_post(url: str, payload: dict, headers: dict):
+    """백엔드 POST: 엔드포인트별 지연을 기록. talk/start 는 멱등이 아니라 hedge 도, 턴 deadline 으로 timeout 을 줄이지도 않음
+    (중간에 끊으면 백엔드는 처리했는데 아이는 "통신 문제"를 듣고 세션이 어긋남) → 턴 deadline 은 필러/earcon 시점에만"""
+    name = "backend:" + re.sub(r"/\d+/", "/{id}/", url[len(BACKEND_BASE):] if url.startswith(BACKEND_BASE) else url)
+    return deadline.timed(name, http_client.session().post, url, json=payload, headers=headers,
+                          timeout=BACKEND_TIMEOUT)
+
 def _auth_headers() -> dict:
     h = {"Content-Type": "application/json"}
     token = os.getenv("ACCESS_TOKEN")
@@ -180,7 +337,7 @@ def backend_animal_quiz_talk(session_id: str, profile_id: int, user_input: str,
     if animal_name:
         payload["animal_name"] = animal_name   # 처음 시작일 때만 포함
     try:
-        r = requests.post(url, json=payload, headers=_auth_headers(), timeout=BACKEND_TIMEOUT)
+        r = _backend_post(url, payload, _auth_headers())
         r.raise_for_status()
         return r.json()
     except Exception as e:
@@ -197,22 +354,8 @@ def backend_quiz_talk(session_id: str, profile_id: int, user_input: str, topic:
     }
     if topic:
         payload["topic"] = topic   # 처음 시작일 때만 포함
-def start_worker(target, *args):
-    global worker_thread
-    stop_event.clear()
-    worker_thread = Thread(target=target, args=args, daemon=True)
-    worker_thread.start()
-    print(f"[worker] starting {target.__name__}{args}")
-
-def stop_worker() -> None:
-    global worker_thread, current_mode
-    stop_event.set()
-    if worker_thread and worker_thread.is_alive():
-        worker_thread.join(timeout=1.0)
-    current_mode = None
-    print("[worker] stopped")   
     try:
-        r = requests.post(url, json=payload, headers=_auth_headers(), timeout=BACKEND_TIMEOUT)
+        r = _backend_post(url, payload, _auth_headers())
         r.raise_for_status()
         return r.json()
     except Exception as e:
@@ -230,7 +373,7 @@ def backend_chosung_talk(session_id: str, profile_id: int, user_input: str) -> d
         "profile_id": profile_id,
     }
     try:
-        r = requests.post(url, json=payload, headers=_auth_headers(), timeout=BACKEND_TIMEOUT)
+        r = _backend_post(url, payload, _auth_headers())
         r.raise_for_status()
         return r.json()
     except Exception as e:
@@ -239,37 +382,40 @@ def backend_chosung_talk(session_id: str, profile_id: int, user_input: str) -> d
 
 
 # ---- Roleplay
-def backend_roleplay_start(session_id: str, user_role: str, bot_role: str) -> dict:
+def backend_roleplay_start(session_id: str, profile_id: int, user_role: str, bot_role: str,
+                           access_token: str | None = None) -> dict:
+    """실패하면 예외 (roleplay_starts 가 기다리던 호출자 모두에게 전달)"""
     url = f"{BACKEND_BASE}/api/roleplay/start"
     payload = {
         "session_id": session_id,
-        "profile_id": get_profile_id(),
+        "profile_id": profile_id,
         "user_role": user_role,
         "bot_role": bot_role,
     }
-    try:
-        r = requests.post(url, json=payload, headers=_auth_headers(), timeout=BACKEND_TIMEOUT)
-        r.raise_for_status()
-        return r.json()
-    except Exception as e:
-        app.logger.error(f"[backend_roleplay_start] 실패: {e}\n{traceback.format_exc()}")
-        return {"status": "error", "response": "역할놀이 시작 중 문제가 생겼어요."}
+    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {access_token}"} if access_token else _auth_headers()
+    r = _backend_post(url, payload, headers)
+    r.raise_for_status()
+    return r.json()
 
+# 모든 시작 경로(roleplay_loop / ask_and_confirm_roles / /confirm/roles)가 공유: 같은 세션·역할이면 백엔드 호출 한 번
+roleplay_starts = RoleplayStarter(backend_roleplay_start, wait_timeout=BACKEND_TIMEOUT + 5)
+
+def start_roleplay(user_role: str, bot_role: str, sess=None) -> dict:
+    """세션의 역할놀이 시작 → parse_start 결과. chatroom_id 를 세션에 저장 (실패하면 예외)"""
+    sess = sess or session_manager.current() or sessions.default
+    res = roleplay_starts.start(
+        (sess.device_id, sess.run), sess.session.get("session_id"),
+        sess.roles.get("profile_id") or get_profile_id(), user_role, bot_role, sess.session.get("access_token"),
+    )
+    sess.roles["user_role"], sess.roles["bot_role"] = user_role, bot_role
+    if sess.session.get("chatroom_id") != res["chatroom_id"]:
+        # 합쳐진 호출자들 중 처음 본 쪽만 저널에 남김
+        sess.session["session_id"] = res["session_id"] or sess.session.get("session_id")
+        sess.session["chatroom_id"] = res["chatroom_id"]
+        sess.record("roles", user_role=user_role, bot_role=bot_role)
+        sess.record("chatroom", sync=True, chatroom_id=res["chatroom_id"], session_id=sess.session["session_id"])
+    return res
 
-def backend_roleplay_talk(chatroom_id: int, session_id: str, user_input: str) -> dict:
-    url = f"{BACKEND_BASE}/api/roleplay/{chatroom_id}/talk"
-    payload = {
-        "user_input": user_input,
-        "session_id": session_id,
-        "profile_id": get_profile_id(),
-    }
-    try:
-        r = requests.post(url, json=payload, headers=_auth_headers(), timeout=BACKEND_TIMEOUT)
-        r.raise_for_status()
-        return r.json()
-    except Exception as e:
-        app.logger.error(f"[backend_roleplay_talk] 실패: {e}\n{traceback.format_exc()}")
-        return {"status": "error", "response": "꾸로가 응답하지 못했어요."}
 
 # ---- Conversation (신규: AI 응답)
 
@@ -277,7 +423,7 @@ def backend_conversation_talk(session_id: str, utterance: str, profile_id: int,
     url = f"{BACKEND_BASE}/api/conversation/talk"
     payload = {"user_input": utterance, "session_id": session_id, "profile_id": profile_id}
     headers = {"Authorization": f"Bearer {access_token}"}
-    r = requests.post(url, json=payload, headers=headers, timeout=BACKEND_TIMEOUT)
+    r = _backend_post(url, payload, headers)
     r.raise_for_status()
     return r.json()
 
@@ -286,385 +432,410 @@ def backend_conversation_end(session_id: str, access_token: str) -> None:
     payload = {"session_id": session_id}
     headers = {"Authorization": f"Bearer {access_token}"}
     try:
-        r = requests.post(url, json=payload, headers=headers, timeout=BACKEND_TIMEOUT)
+        r = _backend_post(url, payload, headers)
         if r.status_code >= 400:
             app.logger.warning(f"/api/conversation/end 실패 status={r.status_code} body={r.text}")
     except Exception as e:
         app.logger.warning(f"/api/conversation/end 예외: {e}")
 
 # ===== 워커 =====
-import clova_roleplay as rp
-import traceback
-
-def roleplay_loop(session_id: str, profile_id: int, chatroom_id: int | None = None):
-    """
-    역할놀이 루프
-    - chatroom_id가 없으면: STT로 역할(user_role, bot_role) 수집 후 /api/roleplay/start 호출
-    - chatroom_id가 있으면: 바로 talk 시작
-    """
-    app.logger.info(f"[roleplay_loop] start session_id={session_id}, chatroom_id={chatroom_id}")
-
+def _rp():
+    """clova_roleplay 는 역할놀이에서만 필요 → 첫 사용 때 import (시작 시간 단축)"""
+    import clova_roleplay
+    return clova_roleplay
+
+def _intents():
+    """intents 는 첫 발화 판정 때 import (모드 정의는 import 시점에 만들어지므로 lambda 로 감쌈)"""
+    import intents
+    return intents
+
+# ===== 턴 실행기 (모드 정의는 turn_machine 선언, 실행/중지/계측/멘트 미리 합성은 여기 하나) =====
+turns = Runner(
+    say=lambda text: tts_say(text),
+    listen=lambda: stt_once(),
+    notify=lambda event, data: notify(event, data),
+    stopped=lambda: _stopped(),
+    await_backend=lambda fn, *args: await_backend(fn, *args),
+    prefetch=lambda texts: _background_pool.submit(_presynth, texts),
+    log=app.logger,
+)
+
+def _run_mode(mode: Mode, **ctx):
+    app.logger.info(f"[{mode.name}] start session_id={ctx.get('session_id')}, profile_id={ctx.get('profile_id')}")
+    sess = session_manager.current() or sessions.default
+    if tracer:
+        tracer.start(sess, mode.name, ctx, BACKEND_BASE)
     try:
-        # (A) chatroom_id가 없으면 역할부터 수집
-        if not chatroom_id:
-            rp.say("역할놀이를 시작하자! 예: 나는 아기고 꾸로는 엄마야. 이렇게 말해줘!")
-            notify("ask_roles")
-
-            while True:
-                notify("listening")  # 🎤 아이 말 차례
-                user_text = rp.stt_once()
-                if not user_text:
-                    continue
-                
-                user_text = normalize_gguro(user_text)
-
-                app.logger.info(f"[STT 결과] {user_text}")
-                notify("user_text", {"text": user_text})
-
-                # 역할 파싱
-                ur, br = rp.parse_roles_basic(user_text)
-                if ur and br:
-                    current_roles["user_role"] = ur
-                    current_roles["bot_role"] = br
-                    current_roles["profile_id"] = profile_id
-                    notify("confirm_roles", {"user_role": ur, "bot_role": br})
-
-                    # 백엔드 start 호출
-                    try:
-                        res = rp.call_start(ur, br, session_id)
-                        chatroom_id = res.get("chatroom_id")
-                        current_session["chatroom_id"] = chatroom_id
-                        reply = res.get("response", "역할놀이가 시작되었어!")
-                        rp.say(reply)
-                        notify("reply", {"text": reply})
-                    except Exception as e:
-                        app.logger.error(f"[START ERROR] {e}\n{traceback.format_exc()}")
-                        rp.say("역할놀이를 시작할 수 없어. 다시 시도해줄래?")
-                        notify("error", {"message": "start_failed"})
-                        return
-                    break
-                else:
-                    rp.say("조금 더 또렷하게 말해줘! 예: 나는 학생이고 꾸로는 선생님이야.")
-                    notify("error", {"message": "role_parse_failed"})
-
-        else:
-            # (B) chatroom_id가 이미 있으면 바로 시작
-            rp.say("역할놀이 준비 완료! 시작해보자!")
-            notify("ready")
-
-        # ===== 메인 대화 루프 =====
-        while True:
-            notify("listening")
-            user_text = rp.stt_once()
-            if not user_text:
-                continue
-
-            app.logger.info(f"[STT 결과] {user_text}")
-            notify("user_text", {"text": user_text})
-
-            # 종료 키워드
-            if rp.STOP_KEYWORD in user_text:
-                rp.say("오늘 역할놀이 즐거웠어! 정리하고 마칠게!")
-                notify("ended")
-                try:
-                    rp.call_end(session_id)
-                except Exception as e:
-                    app.logger.error(f"[END ERROR] {e}")
-                break
-
-            try:
-                notify("thinking")
-                srv = rp.call_talk(chatroom_id, user_text, session_id)
-                app.logger.info(f"[TALK RESPONSE RAW] {srv}")
-
-                reply = srv.get("response")
-                status = srv.get("status", "continue")
-
-                if reply:
-                    rp.say(reply)
-                    notify("reply", {"text": reply})
-
-                if status == "end":
-                    rp.say("여기까지 할게! 고마워!")
-                    notify("ended")
-                    try:
-                        rp.call_end(session_id)
-                    except Exception as e:
-                        app.logger.error(f"[END ERROR] {e}")
-                    break
-
-            except Exception as e:
-                app.logger.error(f"[TALK ERROR] {e}\n{traceback.format_exc()}")
-                rp.say("지금은 연결이 불안정해요. 잠시 후 다시 해보자!")
-                notify("error", {"message": "talk_failed"})
-
-    except KeyboardInterrupt:
-        app.logger.info("[roleplay_loop] interrupted by user")
-    except Exception as e:
-        app.logger.error(f"[roleplay_loop] error: {e}\n{traceback.format_exc()}")
-        notify("error", {"message": str(e)})
+        return turns.run(mode, **ctx)
     finally:
-        app.logger.info("[roleplay_loop] stop")
+        if tracer:
+            tracer.end(sess)
+        app.logger.info(f"[{mode.name}] stop")
 
-def conversation_loop(session_id: str, profile_id: int, access_token: str):
+# ===== 역할놀이 =====
+def _rp_end(ctx) -> None:
     try:
-        # 1. 첫 안내 멘트
-        msg = "일상 대화를 시작할게요. 언제든지 '그만'이라고 말하면 종료할 수 있어요."
-        notify("ready", {"text": msg})
-        tts_say(msg)
-
-        # 2. 안내 멘트 끝 → 사용자 발화 대기
-        notify("listening", {"text": msg})
-
-        while True:
-            # 🎤 사용자 발화
-            user_text = stt_once().strip()
-            if not user_text:
-                continue
-
-            notify("user_input", {"text": user_text})
-
-            # 종료 처리
-            if any(k in user_text for k in ["그만", "끝내", "종료", "stop", "quit"]):
-                end_msg = "대화를 종료할게요."
-                tts_say(end_msg)
-                notify("ended", {"text": end_msg})
-                backend_conversation_end(session_id, access_token)
-                break
+        _rp().call_end(ctx.session_id, ctx.profile_id, ctx.access_token)
+    except Exception as e:
+        app.logger.error(f"[END ERROR] {e}")
+
+def _rp_roles(ctx, text: str) -> str | None:
+    """역할 파싱 → 백엔드 start (/confirm/roles 와 겹치면 한 번만) → talk"""
+    ur, br = _rp().parse_roles_basic(text)
+    if not (ur and br):
+        tts_say("조금 더 또렷하게 말해줘! 예: 나는 학생이고 꾸로는 선생님이야.")
+        notify("error", {"message": "role_parse_failed"})
+        return None
+    (session_manager.current() or sessions.default).roles["profile_id"] = ctx.profile_id
+    notify("confirm_roles", {"user_role": ur, "bot_role": br})
+    try:
+        res = start_roleplay(ur, br)
+    except Exception as e:
+        app.logger.error(f"[START ERROR] {e}\n{traceback.format_exc()}")
+        tts_say("역할놀이를 시작할 수 없어. 다시 시도해줄래?")
+        notify("error", {"message": "start_failed"})
+        return END
+    ctx.chatroom_id = res["chatroom_id"]
+    reply = res["response"] or "역할놀이가 시작되었어!"
+    tts_say(reply)
+    notify("reply", {"text": reply})
+    return "talk"
+
+def _rp_reply(ctx, srv: dict) -> str | None:
+    app.logger.info(f"[TALK RESPONSE RAW] {srv}")
+    reply = srv.get("response")
+    if reply:
+        tts_say(reply)
+        notify("reply", {"text": reply})
+    if srv.get("status", "continue") == "end":
+        tts_say("여기까지 할게! 고마워!")
+        notify("ended")
+        _rp_end(ctx)
+        return END
+    return None
+
+ROLEPLAY = Mode(
+    "roleplay",
+    # chatroom_id 가 없으면 역할부터 수집, 있으면 (이어하기) 바로 talk
+    start=lambda ctx: "ready" if ctx.chatroom_id else "ask_roles",
+    states=[
+        State("ask_roles",
+              enter=[say("역할놀이를 시작하자! 예: 나는 아기고 꾸로는 엄마야. 이렇게 말해줘!"), emit("ask_roles")],
+              before_listen=[emit("listening")], prepare=lambda t: t and normalize_gguro(t), text_event="user_text",
+              stoppable=False, handle=_rp_roles),
+        State("ready", enter=[say("역할놀이 준비 완료! 시작해보자!"), emit("ready")], listen=False, next="talk"),
+        State("talk", before_listen=[emit("listening")], text_event="user_text", handle=BACKEND,
+              on_error=[say("지금은 연결이 불안정해요. 잠시 후 다시 해보자!"), emit("error", {"message": "talk_failed"})]),
+    ],
+    stop=lambda text: _intents().STOP_ROLEPLAY(text),
+    on_stop=[say("오늘 역할놀이 즐거웠어! 정리하고 마칠게!"), emit("ended"), call(_rp_end)],
+    backend=lambda ctx, text: _rp().call_talk(ctx.chatroom_id, text, ctx.session_id, ctx.profile_id, ctx.access_token),
+    thinking=True, on_reply=_rp_reply,
+    on_fatal=[emit("error", lambda ctx: {"message": str(ctx.error)})],
+)
 
-            try:
-                # 3. 응답 대기 (thinking 뷰)
-                notify("thinking")
+def roleplay_loop(session_id: str, profile_id: int, chatroom_id: int | None = None):
+    """역할놀이: chatroom_id 가 없으면 STT 로 역할 수집 후 /api/roleplay/start, 있으면 바로 talk"""
+    sess = session_manager.current() or sessions.default
+    _run_mode(ROLEPLAY, session_id=session_id, profile_id=profile_id, chatroom_id=chatroom_id,
+              access_token=sess.session.get("access_token"))
+
+# ===== 일상 대화 =====
+CONVERSATION_GREETING = "일상 대화를 시작할게요. 언제든지 '그만'이라고 말하면 종료할 수 있어요."
+CONVERSATION_ERROR = "죄송해요. 잠시 통신 문제가 있었어요."
+
+def _conversation_reply(ctx, reply: dict) -> None:
+    resp_text = reply.get("response") or reply.get("reply") or ""
+    if resp_text:
+        tts_say(resp_text)
+        notify("listening", {"text": resp_text})   # 응답 끝나면 listening 뷰로
+    return None
+
+CONVERSATION = Mode(
+    "conversation",
+    start="greet",
+    states=[
+        State("greet", listen=False, next="talk", enter=[
+            emit("ready", {"text": CONVERSATION_GREETING}), say(CONVERSATION_GREETING),
+            emit("listening", {"text": CONVERSATION_GREETING}),
+        ]),
+        State("talk", prepare=str.strip, text_event="user_input", handle=BACKEND, on_error=[
+            say(CONVERSATION_ERROR), emit("error", lambda ctx: {"message": str(ctx.error), "text": CONVERSATION_ERROR}),
+        ]),
+    ],
+    stop=lambda text: _intents().STOP_CONVERSATION(text),
+    on_stop=[say("대화를 종료할게요."), emit("ended", {"text": "대화를 종료할게요."}),
+             call(lambda ctx: backend_conversation_end(ctx.session_id, ctx.access_token))],
+    backend=lambda ctx, text: backend_conversation_talk(ctx.session_id, text, ctx.profile_id, ctx.access_token),
+    thinking=True, on_reply=_conversation_reply,
+)
 
-                # 4. 꾸로 답변 생성
-                reply = backend_conversation_talk(session_id, user_text, profile_id, access_token)
-                resp_text = reply.get("response") or reply.get("reply") or ""
+def conversation_loop(session_id: str, profile_id: int, access_token: str):
+    _run_mode(CONVERSATION, session_id=session_id, profile_id=profile_id, access_token=access_token)
 
-                if resp_text:
-                    tts_say(resp_text)
+# ===== 퀴즈 오프라인 모드 =====
+# QUIZ_LOCAL: fallback(백엔드 채점, 백엔드 실패/타임아웃 때만 받아 둔 문제로 기기 채점) | always | off
+#   auto 는 예전 값 → fallback 과 같음 (받아 둔 문제가 있다고 기기 채점으로 먼저 가지 않음)
+QUIZ_LOCAL = os.getenv("QUIZ_LOCAL", "fallback")
+quiz_bank = QuizBank(os.getenv("QUIZ_BANK_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "quiz_bank.json")))
+quiz_outbox = ResultOutbox(os.getenv("QUIZ_OUTBOX_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "quiz_outbox.jsonl")))
 
-                    # 응답 끝나면 listening 뷰로
-                    notify("listening", {"text": resp_text})
+def _backend_fetch(path: str, payload: dict) -> dict:
+    r = _backend_post(f"{BACKEND_BASE}{path}", payload, _auth_headers())
+    r.raise_for_status()
+    return r.json()
 
+def _presynth(texts) -> None:
+    """다음에 말할 문장을 TTS 캐시에 미리 (캐시 제공자일 때만)"""
+    if isinstance(_TTS, audio_providers.CachedProvider):
+        for t in texts:
+            try:
+                _TTS.synthesize(t)
             except Exception as e:
-                err_msg = "죄송해요. 잠시 통신 문제가 있었어요."
-                tts_say(err_msg)
-                notify("error", {"message": str(e), "text": err_msg})
-                continue
+                app.logger.warning(f"[presynth] {e}")
 
-    finally:
-        app.logger.info("[conversation_loop] stop")
-
-
-# ===== 초성 루프 =====
-def quiz_loop(session_id: str, profile_id: int):
-    app.logger.info(f"[quiz_loop] start session_id={session_id}, profile_id={profile_id}")
+def sync_quiz_results() -> int:
     try:
-        # (1) 첫 문제 요청 (빈 입력)
-        res = backend_chosung_talk(session_id, profile_id, "")
-        msg = res.get("message", "")
-        if msg:
-            tts_say(msg)
-
-        # (2) 루프 돌면서 유저 답변 듣기
-        while not stop_event.is_set():
-            user_text = stt_once().strip()
-            if not user_text:
-                continue
-
-            # 종료 키워드 처리
-            if any(k in user_text for k in ["그만", "끝내", "종료", "퀴즈 종료", "stop"]):
-                tts_say("퀴즈를 종료할게요.")
-                break
-
-            res = backend_chosung_talk(session_id, profile_id, user_text)
-            status = res.get("status")
-            msg = res.get("message", "")
-
-            if msg:
-                tts_say(msg)
-
-            if status == "end":
-                break
-
+        return quiz_outbox.flush(lambda records: _backend_fetch(RESULTS_PATH, {"results": records}))
     except Exception as e:
-        app.logger.error(f"[quiz_loop] error: {e}\n{traceback.format_exc()}")
-        tts_say("퀴즈 중 오류가 발생했어요.")
-    finally:
-        app.logger.info("[quiz_loop] stop")
+        app.logger.warning(f"[quiz sync] 실패, 다음에 다시: {e}")
+        return 0
+
+class QuizRunner:
+    """퀴즈 한 세션: 백엔드 talk 로 first()/talk() 응답, 백엔드가 실패하면 기기 채점(LocalQuiz)으로 이어감"""
+
+    def __init__(self, kind: str, topic: str | None, session_id: str, profile_id: int, online_talk):
+        self.kind, self.topic = kind, topic
+        self.session_id, self.profile_id = session_id, profile_id
+        self.online_talk = online_talk          # (user_input, first) -> dict
+        self.local: LocalQuiz | None = None
+        if QUIZ_LOCAL == "always":
+            self.local = self._new_local()
+        if not quiz_bank.fresh(kind, topic) and QUIZ_LOCAL != "off":
+            _background_pool.submit(self._prefetch)
+
+    def _new_local(self) -> LocalQuiz | None:
+        qs = quiz_bank.questions(self.kind, self.topic)
+        return LocalQuiz(self.kind, self.topic, qs, self.session_id, self.profile_id) if qs else None
+
+    def _prefetch(self) -> None:
+        try:
+            if quiz_bank.prefetch(self.kind, self.topic, self.profile_id, _backend_fetch):
+                _presynth(QUIZ_PHRASES)
+        except Exception as e:
+            app.logger.warning(f"[quiz prefetch] {self.kind}:{self.topic} 실패: {e}")
+
+    def _fallback(self, res: dict, first: bool) -> dict:
+        if res.get("status") != "error" or self.local or QUIZ_LOCAL == "off":
+            return res
+        self.local = self._new_local()
+        if not self.local:
+            return res
+        app.logger.warning(f"[quiz] 백엔드 실패 → 기기 채점으로 전환 ({self.kind}:{self.topic})")
+        return self.local.start(None if first else FALLBACK_NOTICE)
+
+    def _local_reply(self, res: dict) -> dict:
+        _background_pool.submit(_presynth, self.local.upcoming())
+        return res
+
+    def first(self) -> dict:
+        if self.local:
+            return self._local_reply(self.local.start())
+        return self._fallback(self.online_talk("", True), first=True)
+
+    def talk(self, user_text: str) -> dict:
+        if self.local:
+            _turn_note(status=None, backend_ms=0, quiz_source="local")
+            res = self.local.answer(user_text)
+            _turn_note(status=res["status"])
+            return self._local_reply(res)
+        return self._fallback(await_backend(self.online_talk, user_text, False), first=False)
+
+    def close(self) -> None:
+        if self.local and self.local.results:
+            quiz_outbox.extend(self.local.results)
+            _background_pool.submit(sync_quiz_results)
+
+def _say_quiz(res: dict) -> None:
+    """기기 채점 응답은 문장별로 (고정 멘트/문제가 각각 캐시에 적중)"""
+    for part in res.get("speak") or [res.get("message", "")]:
+        if part:
+            tts_say(part)
+
+# ===== 퀴즈 (초성 / 바른생활 / 동물) =====
+def _quiz_mode(name: str, kind: str, talk, retry: str | None, stop_text: str, error_text: str) -> Mode:
+    """talk(ctx, text, first) -> 백엔드 응답. 온라인/기기 채점 선택은 QuizRunner 가 (Runner 는 그대로 호출)"""
+    def setup(ctx):
+        ctx.quiz = QuizRunner(kind, ctx.topic, ctx.session_id, ctx.profile_id,
+                              lambda text, first: talk(ctx, text, first))
+
+    def teardown(ctx):
+        if getattr(ctx, "quiz", None):
+            ctx.quiz.close()
+
+    def on_reply(ctx, res: dict) -> str | None:
+        _say_quiz(res)
+        return END if res.get("status") == "end" else None
+
+    return Mode(
+        name,
+        start="first",
+        states=[
+            State("first", listen=False, next="answer", enter=[call(lambda ctx: _say_quiz(ctx.quiz.first()))]),
+            State("answer", prepare=str.strip, on_empty=[say(retry)] if retry else (), handle=BACKEND),
+        ],
+        stop=lambda text: _intents().STOP_QUIZ(text), on_stop=[say(stop_text)],
+        backend=lambda ctx, text: ctx.quiz.talk(text), awaited=False,   # QuizRunner.talk 가 온라인일 때만 await_backend
+        on_reply=on_reply, on_fatal=[say(error_text)], setup=setup, teardown=teardown,
+    )
 
-# ===== 바른생활 퀴즈 루프 =====
-def safety_quiz_loop(session_id: str, profile_id: int, topic: str):
-    app.logger.info(f"[safety_quiz_loop] start session_id={session_id}, profile_id={profile_id}, topic={topic}")
-    try:
-        # (1) 첫 요청
-        res = backend_quiz_talk(session_id, profile_id, "", topic)
-        msg = res.get("message", "")
-        if msg:
-            tts_say(msg)
-
-        # (2) 반복
-        while not stop_event.is_set():
-            user_text = stt_once().strip()
-            if not user_text:
-                tts_say("잘 못 들었어. 다시 한 번 말해줄래?")
-                continue
-
-            # 종료 키워드
-            if any(k in user_text for k in ["그만", "끝내", "종료", "퀴즈 종료", "stop"]):
-                tts_say("퀴즈를 종료할게요.")
-                break
-
-            res = backend_quiz_talk(session_id, profile_id, user_text)
-            status = res.get("status")
-            msg = res.get("message", "")
-
-            if msg:
-                tts_say(msg)
-
-            if status == "end":
-                break
+CHOSUNG_QUIZ = _quiz_mode(
+    "chosung_quiz", "chosung", lambda ctx, text, first: backend_chosung_talk(ctx.session_id, ctx.profile_id, text),
+    retry=None, stop_text="퀴즈를 종료할게요.", error_text="퀴즈 중 오류가 발생했어요.")
+SAFETY_QUIZ = _quiz_mode(
+    "safety_quiz", "quiz",
+    lambda ctx, text, first: backend_quiz_talk(ctx.session_id, ctx.profile_id, text, ctx.topic if first else None),
+    retry="잘 못 들었어. 다시 한 번 말해줄래?", stop_text="퀴즈를 종료할게요.", error_text="퀴즈 중 오류가 발생했어요.")
+ANIMAL_QUIZ = _quiz_mode(
+    "animal_quiz", "animal_quiz",
+    lambda ctx, text, first: backend_animal_quiz_talk(ctx.session_id, ctx.profile_id, text, ctx.topic if first else None),
+    retry="잘 못 들었어. 다시 한 번 말해줄래?", stop_text="동물 퀴즈를 종료할게요.", error_text="동물 퀴즈 중 오류가 발생했어요.")
 
-    except Exception as e:
-        app.logger.error(f"[safety_quiz_loop] error: {e}\n{traceback.format_exc()}")
-        tts_say("퀴즈 중 오류가 발생했어요.")
-    finally:
-        app.logger.info("[safety_quiz_loop] stop")
+def quiz_loop(session_id: str, profile_id: int):
+    _run_mode(CHOSUNG_QUIZ, session_id=session_id, profile_id=profile_id, topic=None)
 
+def safety_quiz_loop(session_id: str, profile_id: int, topic: str):
+    _run_mode(SAFETY_QUIZ, session_id=session_id, profile_id=profile_id, topic=topic)
 
-# ===== 동물 퀴즈 루프 =====
 def animal_quiz_loop(session_id: str, profile_id: int, animal_name: str):
-    app.logger.info(f"[animal_quiz_loop] start session_id={session_id}, profile_id={profile_id}, animal={animal_name}")
-    try:
-        # (1) 첫 요청
-        res = backend_animal_quiz_talk(session_id, profile_id, "", animal_name)
-        msg = res.get("message", "")
-        if msg:
-            tts_say(msg)
-
-        # (2) 반복
-        while not stop_event.is_set():
-            user_text = stt_once().strip()
-            if not user_text:
-                tts_say("잘 못 들었어. 다시 한 번 말해줄래?")
-                continue
-
-            # 종료 키워드
-            if any(k in user_text for k in ["그만", "끝내", "종료", "퀴즈 종료", "stop"]):
-                tts_say("동물 퀴즈를 종료할게요.")
-                break
-
-            res = backend_animal_quiz_talk(session_id, profile_id, user_text)
-            status = res.get("status")
-            msg = res.get("message", "")
-
-            if msg:
-                tts_say(msg)
-
-            if status == "end":
-                break
-
-    except Exception as e:
-        app.logger.error(f"[animal_quiz_loop] error: {e}\n{traceback.format_exc()}")
-        tts_say("동물 퀴즈 중 오류가 발생했어요.")
-    finally:
-        app.logger.info("[animal_quiz_loop] stop")
-
+    _run_mode(ANIMAL_QUIZ, session_id=session_id, profile_id=profile_id, topic=animal_name)
 
 
 def start_worker(target, *args) -> None:
-    global worker_thread
-    stop_event.clear()
-    worker_thread = Thread(target=target, args=args, daemon=True)
-    worker_thread.start()
-    print(f"[worker] starting {target.__name__}{args}")
+    """기존 단일 세션 라우트용: default 장치 세션에서 워커 실행"""
+    sessions.default.start(target, *args, mode=current_mode)
 
 def stop_worker() -> None:
-    global worker_thread, current_mode
-    stop_event.set()
-    if worker_thread and worker_thread.is_alive():
-        worker_thread.join(timeout=1.0)
+    global current_mode
+    sessions.default.stop_event.set()
+    interrupt_speech(sessions.default)   # say() 에서 막혀 있는 워커가 join 전에 풀리도록 먼저 끊음
+    sessions.default.stop()
     current_mode = None
-    print("[worker] stopped")
-
-def ask_and_confirm_roles() -> tuple[str, str]:
-    global current_roles
-
-    # 안내 멘트
-    tts_say("역할놀이를 시작하자! 예: 나는 엄마고, 꾸로는 아이야. 이렇게 말해줘!")
-    notify("ask_roles")   # 📺 UI: 역할 지정 요청
-
-    user_role, bot_role = None, None
-    while not (user_role and bot_role):
-        notify("listening")  # 🎤 아이 말하는 중
-        text = stt_once().strip()
-        if not text:
-            tts_say("잘 못 들었어. 다시 한 번 말해줄래?")
-            notify("error", {"message": "no_input"})
-            continue
-
-        # 꾸로 보정
-        text = normalize_gguro(text)
-
-        ur, br = parse_roles_basic(text)
-        if ur and br:
-            user_role, bot_role = ur, br
-            notify("confirm_roles", {"user_role": user_role, "bot_role": bot_role})
-            break
-        else:
-            tts_say("조금 더 또렷하게 말해줘! 예: 나는 학생이고 꾸로는 선생님이야.")
-            notify("error", {"message": "role_parse_failed"})
-            continue
-
-    # 역할 확인
-    tts_say(f"네 역할은 {user_role}, 꾸로의 역할은 {bot_role} 맞아? 맞으면 응!, 아니면 아니야라고 말해줘.")
-    notify("confirm_roles", {"user_role": user_role, "bot_role": bot_role})
-
-    confirm = stt_once().strip()
-
-    positives = [
-        "네", "네.", "네에", "네에에", "예", "예스",
-        "응", "응.", "응응", "음", "으응", "웅", "웅웅",
-        "맞아", "맞아요", "맞습니다", "맞음",
-        "그래", "그래요", "그럼", "그렇지",
-        "좋아", "좋습니다", "좋죠",
-        "옳소", "옳습니다",
-    ]
-    negatives = ["아니", "아니야", "아냐", "싫어"]
 
-    if confirm:
-        if any(p in confirm for p in positives):
-            notify("roles_confirmed", {"user_role": user_role, "bot_role": bot_role})
-
-            # ✅ 전역 저장
-            current_roles["user_role"] = user_role
-            current_roles["bot_role"] = bot_role
-
-            # ✅ 백엔드 알리기
-            notify_backend_roleplay_start()
-
-            return user_role, bot_role
-
-        if any(n in confirm for n in negatives):
-            notify("roles_rejected")
-            tts_say("그럼 다시 설정할게!")
-            return ask_and_confirm_roles()
-    else:
-        # 짧아서 인식 안 된 경우 → 긍정으로 간주
-        notify("roles_auto_confirmed", {"user_role": user_role, "bot_role": bot_role})
-
-        current_roles["user_role"] = user_role
-        current_roles["bot_role"] = bot_role
-        notify_backend_roleplay_start()
-
-        return user_role, bot_role
-
-    # 애매하면 다시 시도
+def interrupt_speech(sess) -> None:
+    """장치에서 재생 중인 TTS 끊기"""
+    if _TTS:
+        _TTS.interrupt(sess.out_dev)
+
+def _journal(event: str, **data) -> None:
+    """현재 세션(워커 밖이면 default)의 상태 전이를 저널에 기록"""
+    (session_manager.current() or sessions.default).record(event, **data)
+
+def _stopped() -> bool:
+    """현재 워커 스레드의 세션이 중지 요청을 받았는지"""
+    ev = session_manager.current_stop_event() or sessions.default.stop_event
+    return ev.is_set()
+
+# ===== 역할 확인 (물어보기 → 확인, 거절/애매하면 처음부터 다시) =====
+def _roles_parsed(ctx, text: str) -> str | None:
+    ur, br = _rp().parse_roles_basic(text)
+    if not (ur and br):
+        tts_say("조금 더 또렷하게 말해줘! 예: 나는 학생이고 꾸로는 선생님이야.")
+        notify("error", {"message": "role_parse_failed"})
+        return None
+    ctx.user_role, ctx.bot_role = ur, br
+    notify("confirm_roles", {"user_role": ur, "bot_role": br})
+    return "confirm"
+
+def _roles_accept(ctx) -> None:
+    roles = (session_manager.current() or sessions.default).roles
+    roles["user_role"], roles["bot_role"] = ctx.user_role, ctx.bot_role
+    notify_backend_roleplay_start()
+    ctx.confirmed = True
+
+def _roles_answer(ctx, text: str) -> str:
+    roles = {"user_role": ctx.user_role, "bot_role": ctx.bot_role}
+    answer = _intents().CONFIRM(text)   # "아니 그럼 안 돼" 같은 부정이 긍정보다 먼저
+    if answer == "yes":
+        notify("roles_confirmed", roles)
+        _roles_accept(ctx)
+        return END
+    if answer == "no":
+        notify("roles_rejected")
+        tts_say("그럼 다시 설정할게!")
+        return "ask"
     tts_say("잘 못 들었어. 다시 말해줄래?")
     notify("error", {"message": "confirm_failed"})
-    return ask_and_confirm_roles()
+    return "ask"
+
+CONFIRM_ROLES = Mode(
+    "confirm_roles",
+    start="ask",
+    states=[
+        State("ask", enter=[say("역할놀이를 시작하자! 예: 나는 엄마고, 꾸로는 아이야. 이렇게 말해줘!"), emit("ask_roles")],
+              before_listen=[emit("listening")], prepare=lambda t: t.strip() and normalize_gguro(t.strip()),
+              on_empty=[say("잘 못 들었어. 다시 한 번 말해줄래?"), emit("error", {"message": "no_input"})],
+              stoppable=False, handle=_roles_parsed),
+        State("confirm", prepare=str.strip, stoppable=False, handle=_roles_answer, enter=[
+            say(lambda ctx: f"네 역할은 {ctx.user_role}, 꾸로의 역할은 {ctx.bot_role} 맞아? 맞으면 응!, 아니면 아니야라고 말해줘."),
+            emit("confirm_roles", lambda ctx: {"user_role": ctx.user_role, "bot_role": ctx.bot_role}),
+        ],
+              # 짧아서 인식 안 된 경우 → 긍정으로 간주
+              on_empty=[emit("roles_auto_confirmed", lambda ctx: {"user_role": ctx.user_role, "bot_role": ctx.bot_role}),
+                        call(_roles_accept)], empty_next=END),
+    ],
+)
+
+def ask_and_confirm_roles() -> tuple[str, str]:
+    ctx = turns.run(CONFIRM_ROLES, user_role=None, bot_role=None, confirmed=False)
+    return (ctx.user_role, ctx.bot_role) if ctx.confirmed else (None, None)
 
 # ===== 라우트 =====
+# 기본 장치 상태 전환(stop_worker → current_mode → current_session → start_worker)은 _control_lock 안에서 한 번에:
+# 동시 요청(태블릿 여러 대, 재시도)이나 호출어 스레드가 그 사이에 끼어들면 다른 요청의 세션 값으로 워커가 돌거나
+# /state 가 섞인 값을 봄. 백엔드 호출(start/end)은 락 밖에서
+# 라우트 핸들러는 eventlet hub 의 green thread (monkey_patch 안 함) → 백엔드 HTTP, join, 락 대기를 핸들러에서 그대로 부르면
+# 그동안 hub 전체(emit, 다른 요청)가 멈춤. 그래서 막히는 일은 전부 _off_hub 로 OS 스레드에서, 상태 전환도 통째로 거기서
+# (락을 쥔 채 hub 에서 양보하면 같은 OS 스레드의 다른 핸들러가 RLock 에 그냥 들어옴)
+# 확인: python api_load.py — 운영과 같은 socketio.run(eventlet) 서버에 진짜 HTTP 로 동시 요청, emit 지연과 섞인 /state 검사
+_control_lock = threading.RLock()
+_hub_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hubcall")
+
+def _off_hub(fn, *args, timeout: float | None = None, **kw):
+    """fn 을 OS 스레드에서 돌리고, 끝날 때까지 socketio.sleep 으로 hub 에 양보하며 기다림 (timeout 초 넘으면 FutureTimeout)"""
+    fut = _hub_pool.submit(fn, *args, **kw)
+    end = None if timeout is None else time.monotonic() + timeout
+    while not fut.done():
+        if end is not None and time.monotonic() >= end:
+            raise FutureTimeout(f"{getattr(fn, '__name__', fn)} {timeout}s 초과")
+        socketio.sleep(0.005)
+    return fut.result()
+
+def _switch(mode: str, session: dict, target, *args, roles: dict | None = None, ready: dict | None = None) -> None:
+    """기본 장치 상태 전환 한 번에 (OS 스레드에서: 라우트는 _off_hub 로, 호출어 스레드는 직접)"""
+    global current_mode
+    _release_worker()
+    with _control_lock:
+        stop_worker()
+        current_mode = mode
+        current_session.clear()
+        current_session.update(session)
+        if roles is not None:
+            current_roles.clear()
+            current_roles.update(roles)
+        if ready:
+            notify("ready", ready)
+        start_worker(target, *args)
+
+def _release_worker() -> None:
+    """락 밖에서 먼저: 기본 장치 워커를 멈추고 끝나길 기다림 (상태는 안 바꿈) → 락 안 stop_worker 의 join 은 보통 바로 끝남"""
+    sess = sessions.default
+    sess.stop_event.set()
+    interrupt_speech(sess)
+    worker = sess.worker
+    if worker and worker.is_alive() and worker is not threading.current_thread():
+        worker.join(timeout=1.0)
+
 @app.route("/start/roleplay", methods=["POST"])
 def http_start_roleplay():
     body = request.get_json(silent=True) or {}
@@ -689,24 +860,10 @@ def http_start_roleplay():
     if not session_id:
         session_id = f"{profile_id}_역할놀이"
 
-    # 세션 저장
-    current_session.clear()
-    current_session.update({
-        "session_id": session_id,
-        "chatroom_id": 0,   # 아직 없음
-        "access_token": access_token,
-    })
-
-    current_roles.clear()
-    current_roles.update({
-        "user_role": None,
-        "bot_role": None,
-        "profile_id": profile_id,
-    })
-
-    # 워커 실행 (STT/TTS 루프 → 역할 수집)
-    stop_worker()
-    start_worker(roleplay_loop, session_id, profile_id, chatroom_id)
+    # 워커 실행 (STT/TTS 루프 → 역할 수집). chatroom_id 는 아직 없음
+    _off_hub(_switch, "roleplay", {"session_id": session_id, "chatroom_id": 0, "access_token": access_token},
+             roleplay_loop, session_id, profile_id, chatroom_id,
+             roles={"user_role": None, "bot_role": None, "profile_id": profile_id})
 
     return jsonify({
         "ok": True,
@@ -727,63 +884,30 @@ def http_confirm_roles():
     if not user_role or not bot_role:
         return jsonify({"ok": False, "error": "roles are required"}), 400
 
-    current_roles["user_role"] = user_role
-    current_roles["bot_role"] = bot_role
-
-    # ✅ 백엔드에 start 호출
+    # ✅ 백엔드에 start 호출 (워커가 같은 역할로 이미 시작했으면 그 chatroom_id 를 같이 받음). 네트워크라 락 밖, hub 밖
     try:
-        headers = {"Authorization": f"Bearer {current_session['access_token']}"}
-        start_res = requests.post(
-            f"{BACKEND_BASE}/api/roleplay/start",
-            headers=headers,
-            json={
-                "session_id": current_session["session_id"],
-                "profile_id": current_roles["profile_id"],
-                "user_role": user_role,
-                "bot_role": bot_role,
-            },
-            timeout=10,
-        )
-        start_res.raise_for_status()
-        result = start_res.json()
-        chatroom_id = result.get("chatroom_id")
-        current_session["chatroom_id"] = chatroom_id
+        res = _off_hub(start_roleplay, user_role, bot_role, sessions.default)
     except Exception as e:
         app.logger.error(f"[confirm_roles] backend start 실패: {e}\n{traceback.format_exc()}")
         return jsonify({"ok": False, "error": "backend_roleplay_start_failed"}), 500
 
     return jsonify({
         "ok": True,
-        "chatroom_id": current_session["chatroom_id"],
+        "chatroom_id": res["chatroom_id"],
         "user_role": user_role,
         "bot_role": bot_role,
     })
 
 
 def notify_backend_roleplay_start():
-    global current_session, current_roles
+    roles = (session_manager.current() or sessions.default).roles
 
-    if not current_roles["user_role"] or not current_roles["bot_role"]:
+    if not roles["user_role"] or not roles["bot_role"]:
         app.logger.warning("[notify_backend_roleplay_start] 역할 미정 → 호출 안 함")
         return False
 
     try:
-        headers = {"Authorization": f"Bearer {current_session['access_token']}"}
-        start_res = requests.post(
-            f"{BACKEND_BASE}/api/roleplay/start",
-            headers=headers,
-            json={
-                "session_id": current_session["session_id"],
-                "user_role": current_roles["user_role"],
-                "bot_role": current_roles["bot_role"],
-                "profile_id": current_roles["profile_id"],
-            },
-            timeout=BACKEND_TIMEOUT,
-        )
-        start_res.raise_for_status()
-        result = start_res.json().get("result", {})
-        current_session["session_id"] = result.get("session_id") or current_session["session_id"]
-        current_session["chatroom_id"] = result.get("chatroom_id") or result.get("chatRoomId")
+        start_roleplay(roles["user_role"], roles["bot_role"])
         app.logger.info("[notify_backend_roleplay_start] backend 시작 성공")
         return True
     except Exception as e:
@@ -793,7 +917,6 @@ def notify_backend_roleplay_start():
 
 @app.route("/start/safety-quiz", methods=["POST"])
 def http_start_safety_quiz():
-    global current_mode, current_session
     body = request.get_json(silent=True) or {}
 
     profile_id = int(body.get("profile_id") or 0) or get_profile_id()
@@ -806,11 +929,8 @@ def http_start_safety_quiz():
     if not session_id:
         session_id = f"{profile_id}_quiz"
 
-    stop_worker()
-    current_mode = "safety_quiz"
-    current_session = {"session_id": session_id, "chatroom_id": None}
-
-    start_worker(safety_quiz_loop, session_id, profile_id, topic)
+    _off_hub(_switch, "safety_quiz", {"session_id": session_id, "chatroom_id": None, "profile_id": profile_id},
+             safety_quiz_loop, session_id, profile_id, topic)
 
     return jsonify({
         "ok": True,
@@ -824,7 +944,6 @@ def http_start_safety_quiz():
 # ===== Flask 라우트 =====
 @app.route("/start/quiz", methods=["POST"])
 def http_start_quiz():
-    global current_mode, current_session
     body = request.get_json(silent=True) or {}
 
     profile_id = int(body.get("profile_id") or 0) or get_profile_id()
@@ -836,11 +955,8 @@ def http_start_quiz():
     if not session_id:
         session_id = f"{profile_id}_초성퀴즈"
 
-    stop_worker()
-    current_mode = "quiz"
-    current_session = {"session_id": session_id, "chatroom_id": None}
-
-    start_worker(quiz_loop, session_id, profile_id)
+    _off_hub(_switch, "quiz", {"session_id": session_id, "chatroom_id": None, "profile_id": profile_id},
+             quiz_loop, session_id, profile_id)
 
     return jsonify({
         "ok": True,
@@ -852,7 +968,6 @@ def http_start_quiz():
 
 @app.route("/start/animal-quiz", methods=["POST"])
 def http_start_animal_quiz():
-    global current_mode, current_session
     body = request.get_json(silent=True) or {}
 
     profile_id = int(body.get("profile_id") or 0) or get_profile_id()
@@ -865,11 +980,8 @@ def http_start_animal_quiz():
     if not session_id:
         session_id = f"{profile_id}_animal_quiz"
 
-    stop_worker()
-    current_mode = "animal_quiz"
-    current_session = {"session_id": session_id, "chatroom_id": None}
-
-    start_worker(animal_quiz_loop, session_id, profile_id, animal_name)
+    _off_hub(_switch, "animal_quiz", {"session_id": session_id, "chatroom_id": None, "profile_id": profile_id},
+             animal_quiz_loop, session_id, profile_id, animal_name)
 
     return jsonify({
         "ok": True,
@@ -881,11 +993,8 @@ def http_start_animal_quiz():
 
 @app.route("/start/conversation", methods=["POST"])
 def http_start_conversation():
-    global current_mode, current_session
     body = request.get_json(silent=True) or {}
 
-    stop_worker()
-
     session_id = (body.get("session_id") or "").strip()
 
     profile_id = body.get("profile_id")
@@ -897,8 +1006,8 @@ def http_start_conversation():
     chatroom_id = None
 
     if not session_id and profile_id:
-        try:
-            data = backend_conversation_start(int(profile_id))
+        try:   # 백엔드 호출은 락 밖, hub 밖 (그동안 이전 워커는 계속 돎)
+            data = _off_hub(backend_conversation_start, int(profile_id))
             session_id = str(data.get("session_id") or "").strip()
             chatroom_id = data.get("chatroom_id")  # 없을 수도 있음
             if not session_id:
@@ -912,22 +1021,17 @@ def http_start_conversation():
     if not session_id:
         session_id = "conv_session"  # 데모 세션
 
-    current_mode = "conversation"
-    current_session = {
+    _off_hub(_switch, "conversation", {
         "session_id": session_id,
         "chatroom_id": chatroom_id,
         "profile_id": profile_id,
         "access_token": access_token,   # ✅ 추가
-    }
-
-    notify("ready", {"text": "대화 세션이 준비됐어요. 곧 안내 멘트가 나와요!"})
-
-    # 워커 시작
-    start_worker(conversation_loop, session_id, profile_id, access_token)
+    }, conversation_loop, session_id, profile_id, access_token,
+        ready={"text": "대화 세션이 준비됐어요. 곧 안내 멘트가 나와요!"})
 
     return jsonify({
         "ok": True,
-        "mode": current_mode,
+        "mode": "conversation",
         "session_id": session_id,
         "chatroom_id": chatroom_id,
         "profile_id": profile_id
@@ -935,32 +1039,46 @@ def http_start_conversation():
 
 
 
+def _stop_default() -> tuple:
+    """기본 장치 워커 멈춤 (OS 스레드에서) → (session_id, access_token, 멈춘 뒤 mode)"""
+    _release_worker()
+    with _control_lock:
+        stop_worker()
+        return current_session.get("session_id"), current_session.get("access_token"), current_mode
+
 @app.route("/stop", methods=["POST"])
 def http_stop():
-    stop_worker()
+    session_id, access_token, mode = _off_hub(_stop_default)
     try:
-        if current_session.get("session_id"):
-            backend_conversation_end(current_session["session_id"])
+        if session_id:
+            _off_hub(backend_conversation_end, session_id, access_token)   # 락 밖
     except Exception as e:
         app.logger.warning(f"[stop] /api/conversation/end 호출 중 예외: {e}")
-    return jsonify({"ok": True, "mode": current_mode})
+    return jsonify({"ok": True, "mode": mode})
 
 
+def _state() -> dict:
+    with _control_lock:
+        return {
+            "mode": current_mode,
+            "running": sessions.default.running,
+            "volume": volume_percent,
+            "roles": dict(current_roles),
+            "session": dict(current_session),
+        }
+
 @app.route("/state", methods=["GET"])
 def http_state():
-    return jsonify({
-        "mode": current_mode,
-        "running": bool(worker_thread and worker_thread.is_alive()),
-        "volume": volume_percent,
-        "roles": current_roles,
-        "session": current_session
-    })
+    # 전환 중(다른 OS 스레드가 락을 쥠)이면 락 대기가 hub 를 막지 않게
+    return jsonify(_off_hub(_state))
 
 @app.route("/volume", methods=["POST"])
 def http_volume():
     body = request.get_json(silent=True) or {}
     global volume_percent
-    volume_percent = max(0, min(100, int(body.get("percent", 60))))
+    volume_percent = max(0, min(100, int(body.get("percent", 60))))   # 세션 상태와 무관 → 락 없이
+    import playback
+    playback.set_volume(volume_percent)   # 재생 워커에 소프트웨어 게인으로 적용
     return jsonify({"ok": True, "volume": volume_percent})
 
 @app.route("/debug/ping")
@@ -974,8 +1092,95 @@ def debug_ping():
         "mode": current_mode,
         "tts_src": _TTS_SRC,
         "stt_src": _STT_SRC,
+        "startup": startup.report(),
     })
 
+@app.route("/debug/latency")
+def debug_latency():
+    return jsonify({"ok": True, "turn_budget_sec": TURN_BUDGET_SEC, "roleplay_start": roleplay_starts.stats(),
+                    **deadline.stats.snapshot()})
+
+@app.route("/debug/capture-stats")
+def debug_capture_stats():
+    counts = deadline.stats.snapshot()["counts"]
+    n = counts.get("capture.utterances", 0)
+    preroll = {"utterances": n, "onset_in_preroll": counts.get("capture.onset_in_preroll", 0)}
+    if n:
+        preroll["rate"] = round(preroll["onset_in_preroll"] / n, 3)
+    beam = {k.split(".", 1)[1]: v for k, v in counts.items() if k.startswith("beam.")}
+    return jsonify({"ok": True, "stats": capture_windows.stats(), "preroll": preroll, "beam": beam})
+
+@app.route("/debug/wake")
+def debug_wake():
+    """호출어 감지 스레드 CPU% / 덩어리·감지 수 / 마지막 점수·지연"""
+    if not wake_detector:
+        return jsonify({"ok": False, "error": "wake word off (WAKE_WORD=0, 템플릿 없음 또는 numpy 없음)"}), 404
+    return jsonify({"ok": True, "mode": WAKE_MODE or None, **wake_detector.stats()})
+
+@app.route("/debug/profile")
+def debug_profile():
+    """?seconds=N(기본 5, 최대 60)&hz=100&idle=0&format=json → 모든 스레드 스택 샘플링
+    기본은 collapsed stack 텍스트 (flamegraph.pl / speedscope), idle=0 이면 대기 중 샘플 뺌"""
+    try:
+        seconds = float(request.args.get("seconds", 5))
+        hz = float(request.args.get("hz", 100))
+    except ValueError:
+        return jsonify({"ok": False, "error": "seconds/hz 는 숫자"}), 400
+    s = profiler.profile(seconds, hz, request.args.get("idle", "1") != "0", sleep=socketio.sleep)
+    if s is None:
+        return jsonify({"ok": False, "error": "이미 프로파일링 중"}), 409
+    if request.args.get("format") == "json":
+        return jsonify({"ok": True, "seconds": min(seconds, profiler.MAX_SECONDS), "hz": s.hz, "samples": s.samples,
+                        "sampler_cpu_sec": round(s.cost, 3), "top": s.top()})
+    return s.collapsed(), 200, {"Content-Type": "text/plain; charset=utf-8"}
+
+def _memory_containers() -> dict:
+    """오래 켜 두면 커질 수 있는 것들의 크기"""
+    ws = sys.modules.get("websocket_server")
+    cached = isinstance(_TTS, audio_providers.CachedProvider)
+    return {
+        "threads": threading.active_count(),
+        "sessions": len(sessions.all()),
+        "tts_cache_kb": round(_TTS.size / 1024) if cached else None,
+        "roleplay_start": roleplay_starts.stats(),
+        "emit_pending": emits.pending(),
+        "ws_clients": len(ws.clients) if ws else None,
+        "quiz_outbox": quiz_outbox.pending(),
+        "telemetry": telemetry.stats() if telemetry else None,
+    }
+
+@app.route("/debug/memory")
+def debug_memory():
+    """RSS/gc + (tracemalloc 켜져 있으면) 할당 위치 top N 과 켠 뒤 증가분. ?trace=start|stop&top=15"""
+    try:
+        top = max(1, min(100, int(request.args.get("top", 15))))
+    except ValueError:
+        return jsonify({"ok": False, "error": "top 은 정수"}), 400
+    trace = request.args.get("trace")
+    if trace == "start":
+        memory.start_tracing()
+    elif trace == "stop":
+        memory.stop_tracing()
+    return jsonify({"ok": True, **memory.report(top), "containers": _memory_containers()})
+
+@app.route("/debug/telemetry", methods=["GET", "POST"])
+def debug_telemetry():
+    """GET: 큐/spool/업로드 통계, POST: 지금 바로 spool + 업로드"""
+    if not telemetry:
+        return jsonify({"ok": False, "error": "TELEMETRY=0"}), 404
+    if request.method == "POST":
+        _off_hub(telemetry.flush)
+    return jsonify({"ok": True, **telemetry.stats()})
+
+@app.route("/debug/quiz-bank")
+def debug_quiz_bank():
+    return jsonify({"ok": True, "mode": QUIZ_LOCAL, "bank": quiz_bank.stats(), "outbox_pending": quiz_outbox.pending()})
+
+@app.route("/quiz/sync", methods=["POST"])
+def http_quiz_sync():
+    """기기에서 채점한 결과를 지금 바로 올리기"""
+    return jsonify({"ok": True, "sent": _off_hub(sync_quiz_results), "pending": quiz_outbox.pending()})
+
 @app.route("/set-profile", methods=["POST"])
 def http_set_profile():
     body = request.get_json(silent=True) or {}
@@ -985,55 +1190,224 @@ def http_set_profile():
     set_profile_id(pid)
     return jsonify({"ok": True, "profile_id": get_profile_id()})
 
-import re
-
-def normalize_gguro(text: str) -> str:
-    """STT 결과에서 '꾸로'/'꾸로는'을 강력 보정"""
-    out = text
-
-    # --- 직접적으로 들린 단어들 교정 ---
-    replacements = {
-        "구로": "꾸로",
-        "쿠로": "꾸로",
-        "고로": "꾸로",
-        "꾸루": "꾸로",
-        "꾸르": "꾸로",
-        "프로": "꾸로",
-        "프로는": "꾸로는",
-        "쿠루": "꾸로",
-        "구루": "꾸로",
-        "코로나": "꾸로",
-        "코 로 나": "꾸로",
-        "코로나는": "꾸로는",
-        "코로는": "꾸로는",
-        "그 러는": "꾸로는",
-        "고르는": "꾸로는",
-        "구르는": "꾸로는",
-        "쿠르는": "꾸로는",
-        "부르는": "꾸로는",
-    }
-    for k, v in replacements.items():
-        out = out.replace(k, v)
 
-    # --- 정규식 기반 교정 ---
-    out = re.sub(r"곧\s*그\s*러는", "꾸로는", out)
-    out = re.sub(r"고\s*그\s*러는", "꾸로는", out)
-    out = re.sub(r"꾸\s*론은", "꾸로는", out)
-    out = re.sub(r"꾸\s*로\s*는", "꾸로는", out)
-    out = re.sub(r"(고|구|쿠)\s*르는", "꾸로는", out)
-    out = re.sub(r"(고|구|쿠)\s*부르는", "꾸로는", out)
+# ===== 장치별 세션 라우트 =====
+@app.route("/sessions", methods=["GET"])
+def http_sessions():
+    return jsonify({"ok": True, "sessions": sessions.states()})
 
-    # 자모 분리
-    out = re.sub(r"ㄲ\s*ㅜ\s*ㄹ\s*ㅗ", "꾸로", out)
-    out = re.sub(r"ㄲㅜ\s*로", "꾸로", out)
+@app.route("/sessions", methods=["POST"])
+def http_create_session():
+    body = request.get_json(silent=True) or {}
+    device_id = (body.get("device_id") or "").strip()
+    if not device_id:
+        return jsonify({"ok": False, "error": "device_id는 필수입니다."}), 400
+    sess = sessions.create(device_id, body.get("in_dev"), body.get("out_dev"))
+    return jsonify({"ok": True, "session": sess.state()}), 201
+
+@app.route("/sessions/<device_id>", methods=["DELETE"])
+def http_delete_session(device_id: str):
+    return jsonify({"ok": _off_hub(sessions.remove, device_id)})
+
+@app.route("/sessions/<device_id>/start/<mode>", methods=["POST"])
+def http_session_start(device_id: str, mode: str):
+    if device_id == DEFAULT_DEVICE:
+        # 기본 장치는 _control_lock/current_mode 를 거치는 /start/<mode> 로만
+        return jsonify({"ok": False, "error": "기본 장치는 /start/<mode> 를 사용하세요."}), 400
+    sess = sessions.get(device_id)
+    if not sess:
+        return jsonify({"ok": False, "error": f"등록되지 않은 device_id: {device_id}"}), 404
+    body = request.get_json(silent=True) or {}
+
+    profile_id = int(body.get("profile_id") or 0) or get_profile_id()
+    session_id = (body.get("session_id") or "").strip() or f"{device_id}_{profile_id}_{mode}"
+    extra = {}
+
+    if mode == "quiz":
+        target, args = quiz_loop, (session_id, profile_id)
+    elif mode == "safety-quiz":
+        topic = (body.get("topic") or "").strip()
+        if not topic:
+            return jsonify({"ok": False, "error": "topic은 필수입니다."}), 400
+        target, args, extra = safety_quiz_loop, (session_id, profile_id, topic), {"topic": topic}
+    elif mode == "animal-quiz":
+        animal_name = (body.get("animal_name") or "").strip()
+        if not animal_name:
+            return jsonify({"ok": False, "error": "animal_name은 필수입니다."}), 400
+        target, args, extra = animal_quiz_loop, (session_id, profile_id, animal_name), {"animal_name": animal_name}
+    elif mode == "conversation":
+        auth_header = request.headers.get("Authorization", "")
+        access_token = auth_header.split(" ", 1)[1] if auth_header.startswith("Bearer ") else body.get("access_token")
+        target, args = conversation_loop, (session_id, profile_id, access_token)
+        extra = {"access_token": access_token}
+    elif mode == "roleplay":
+        auth_header = request.headers.get("Authorization", "")
+        access_token = auth_header.split(" ", 1)[1] if auth_header.startswith("Bearer ") else body.get("access_token")
+        if not access_token:
+            return jsonify({"ok": False, "error": "access_token is required"}), 401
+        chatroom_id = int(body.get("chatroom_id") or 0)
+        target, args = roleplay_loop, (session_id, profile_id, chatroom_id)
+        extra = {"access_token": access_token, "chatroom_id": chatroom_id}
+    else:
+        return jsonify({"ok": False, "error": f"지원하지 않는 mode: {mode}"}), 404
+
+    def swap(s):
+        s.session.clear()
+        s.session.update({"session_id": session_id, "chatroom_id": None, **extra})
+        if mode == "roleplay":
+            s.roles.update({"user_role": None, "bot_role": None})
+        s.roles.update({"profile_id": profile_id})
 
-    # 불필요한 공백 제거
-    out = re.sub(r"\s+", " ", out).strip()
+    # 이전 워커를 먼저 깨워서(listen/발화 끊기) join 이 짧게 → 멈춘 뒤에 세션 교체 → 새 워커
+    def restart():
+        sess.stop_event.set()
+        interrupt_speech(sess)
+        sess.start(target, *args, mode=mode.replace("-", "_"), prepare=swap)
+
+    _off_hub(restart)
+
+    return jsonify({
+        "ok": True,
+        "device_id": device_id,
+        "mode": sess.mode,
+        "session_id": session_id,
+        "profile_id": profile_id,
+    }), 202
 
-    return out
+@app.route("/sessions/<device_id>/stop", methods=["POST"])
+def http_session_stop(device_id: str):
+    sess = sessions.get(device_id)
+    if not sess:
+        return jsonify({"ok": False, "error": f"등록되지 않은 device_id: {device_id}"}), 404
+    def stop():
+        sess.stop_event.set()
+        interrupt_speech(sess)
+        sess.stop()
+
+    _off_hub(stop)
+    return jsonify({"ok": True, "device_id": device_id})
+
+@app.route("/sessions/<device_id>/state", methods=["GET"])
+def http_session_state(device_id: str):
+    sess = sessions.get(device_id)
+    if not sess:
+        return jsonify({"ok": False, "error": f"등록되지 않은 device_id: {device_id}"}), 404
+    return jsonify({**sess.state(), "volume": volume_percent})
+
+# ===== 재시작 이어하기 =====
+def resume_sessions() -> None:
+    """저널에서 끝나지 않은 세션을 찾아 같은 장치/세션/chatroom_id 로 워커를 다시 띄움"""
+    global current_mode
+    live = SessionJournal.replay(JOURNAL_PATH)
+    journal.compact(live)
+    journal.open()
+
+    loops = {f.__name__: f for f in (roleplay_loop, conversation_loop, quiz_loop, safety_quiz_loop, animal_quiz_loop)}
+    for device_id, st in live.items():
+        target = loops.get(st["target"])
+        if not target:
+            continue
+        sess = sessions.create(device_id, st.get("in_dev"), st.get("out_dev"))
+        sess.session.clear()
+        sess.session.update(st["session"])
+        sess.roles.clear()
+        sess.roles.update(st["roles"])
+        args = list(st["args"])
+        if target is roleplay_loop and sess.session.get("chatroom_id"):
+            # chatroom_id 가 있으면 역할 수집을 건너뛰고 바로 talk 로
+            args[2] = sess.session["chatroom_id"]
+        if device_id == DEFAULT_DEVICE:
+            current_mode = st["mode"]
+        app.logger.info(f"[resume] device={device_id} {st['target']}{tuple(args)}")
+        sess.start(target, *args, mode=st["mode"])
+
+# ===== 호출어 "꾸로" (iPad 없이 목소리로 시작) =====
+# WAKE_MODE: quiz | "" 이면 wake 알림만
+#   대화/역할놀이는 iPad 가 주는 access_token 과 백엔드 세션 시작이 있어야 해서 호출어로는 안 띄움 (wake 알림만)
+WAKE_MODE = os.getenv("WAKE_MODE", "quiz")
+if WAKE_MODE not in ("quiz", ""):
+    print(f"[wake] WAKE_MODE={WAKE_MODE} 은 지원 안 함 (quiz 만) → wake 알림만")
+    WAKE_MODE = ""
+wake_detector: wakeword.WakeDetector | None = None
+
+def _wake_paused() -> bool:
+    """세션이 돌고 있거나 스피커에서 소리가 나는 중에는 듣지 않음 (대화 속 "꾸로" / 자기 TTS 에 반응 안 하게)"""
+    if any(s.running for s in sessions.all()):
+        return True
+    import playback
+    if not playback.enabled():
+        return False
+    import clova_conversation
+    out = playback.worker_for(sessions.default.out_dev or clova_conversation.OUT_DEV)
+    return out.reference.level(time.perf_counter()) > 0
+
+def _start_by_wake(info: dict) -> None:
+    """감지 스레드에서 불림: wake 알림 + WAKE_MODE 를 기본 장치에서 시작 (라우트와 같은 세션 준비)"""
+    profile_id = get_profile_id()
+    deadline.stats.count("wake.detected")
+    app.logger.info(f"[wake] {info} → mode={WAKE_MODE or None}")
+    notify("wake", {**info, "mode": WAKE_MODE or None, "profile_id": profile_id})
+    if WAKE_MODE != "quiz":
+        return
+    session_id = f"{profile_id}_초성퀴즈"
+    # 라우트와 같은 상태 전환 (감지 스레드는 OS 스레드라 직접)
+    _switch(WAKE_MODE, {"session_id": session_id, "chatroom_id": None, "profile_id": profile_id},
+            quiz_loop, session_id, profile_id)
+
+def _start_wake():
+    """템플릿/numpy 가 있고 실제 마이크(clova STT + 캡처 링)일 때만 감지 스레드 시작"""
+    global wake_detector
+    import wakeword, audio_capture
+    if wake_detector or not (wakeword.enabled() and audio_capture.enabled() and "clova" in (_STT_SRC or "")):
+        return
+    import clova_conversation
+    ring = audio_capture.ring_for(sessions.default.in_dev or clova_conversation.IN_DEV)
+    wake_detector = wakeword.WakeDetector(ring, wakeword.Templates.load(), _start_by_wake, _wake_paused).start()
+    app.logger.info(f"[wake] listening (templates={len(wake_detector.templates.feats)}, mode={WAKE_MODE or None})")
+
+# ===== 시작 워밍업 =====
+def _warm_audio():
+    # cached:clova 와 clova 처럼 같은 제공자를 감싼 경우 한 번만
+    provs = {id(p): p for p in (getattr(_TTS, "inner", _TTS), getattr(_STT, "inner", _STT))}
+    for sess in sessions.all():
+        for prov in provs.values():
+            prov.warm(sess.in_dev, sess.out_dev)
+
+def _warm_earcon():
+    import earcons
+    return earcons.thinking()
+
+def startup_steps() -> list:
+    return [
+        ("providers", _resolve_tts_stt),
+        ("roleplay_module", _rp),
+        ("intents", _intents),
+        ("http", lambda: http_client.warm([BACKEND_BASE])),
+        ("trace", lambda: tracer and tracer.install(http_client.session())),
+        ("filler", _precache_filler),
+        ("earcon", _warm_earcon),
+        ("quiz_sync", sync_quiz_results),
+        ("telemetry", lambda: telemetry and telemetry.start()),
+        ("audio_devices", _warm_audio),
+        ("wake", _start_wake),
+    ]
 
+startup.mark("module_loaded")
 
 if __name__ == "__main__":
     print(f">>> pi_controller v2025-08-27 :: __file__={__file__} :: cwd={os.getcwd()}")
+    if os.getenv("FAST_STARTUP", "1") == "1":
+        # 서버는 바로 띄우고, 제공자/장치/커넥션은 백그라운드에서 준비 → /debug/ping 의 startup.ready
+        startup.warm_up_in_background(startup_steps())
+    else:
+        for name, fn in startup_steps():
+            fn()
+            startup.mark(name)
+        startup.set_ready()
     # allow_unsafe_werkzeug ❌ 제거
+    if journal:
+        if os.getenv("RESUME_SESSIONS", "1") == "1":
+            resume_sessions()
+        else:
+            journal.open()
     socketio.run(app, host="0.0.0.0", port=8787)
@@ -0,0 +1,371 @@
+# playback.py
+# 장치마다 aplay 하나를 계속 띄워 두고(ALSA 장치 open 유지) PCM 을 큐로 흘려보내는 재생 워커
+# - mp3 는 mpg123 로 디코드만 해서(-s, 장치 open 없음) 같은 파이프로 재생
+# - stop()/flush() 로 재생 중인 문장을 끊을 수 있음 (실시간 속도로만 써서 파이프에 쌓이지 않게)
+# - /volume 이 불린 뒤로만 그 값을 소프트웨어 게인으로 적용 (그 전에는 원래대로 full scale)
+# - background 항목(생각 중 earcon 등)은 반복 재생되다가 일반 항목이 들어오면 알아서 비켜줌
+# - 실제로 내보낸 PCM 을 재생 시각과 함께 남겨 둠 (reference) → 녹음 쪽 에코 제거(aec) 참조 신호
+#   python playback.py --bench some.mp3 [횟수]  → 발화당 시작 지연 비교 (mpg123 매번 vs 워커)
+import os, sys, time, math, queue, bisect, warnings, threading, subprocess
+from array import array
+
+np = False                    # numpy 는 audioop 가 없을 때만 필요 → scale_pcm 이 처음 쓸 때 import (시작 시간)
+try:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        import audioop            # 3.13 에서 빠짐 → 그때는 numpy
+except ImportError:
+    audioop = None
+
+RATE = 24000          # 재생 샘플레이트 (mono, S16_LE)
+CHUNK_MS = 20
+LEAD_SEC = 0.15       # 실시간보다 이만큼만 앞서서 씀 → stop 시 남는 소리 ≤ LEAD_SEC
+BYTES_PER_SEC = RATE * 2
+REF_SEC = 15          # reference 로 남겨 두는 길이
+
+
+def _numpy():
+    global np
+    if np is False:
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+    return np
+
+
+def scale_pcm(pcm: bytes, gain: float) -> bytes:
+    """S16_LE PCM 에 게인 적용 (클리핑 포함). 재생 청크마다 불리므로 numpy / audioop 로 한 번에"""
+    if gain >= 0.999:
+        return pcm
+    pcm = pcm[: len(pcm) - (len(pcm) % 2)]
+    if audioop is not None:
+        return audioop.mul(pcm, 2, gain)      # 20ms 청크: ~3.5us (numpy ~12us, 파이썬 루프 ~400us)
+    if _numpy() is not None:
+        x = np.frombuffer(pcm, dtype="<i2").astype(np.float32)
+        return np.clip(x * gain, -32768, 32767).astype("<i2").tobytes()
+    a = array("h")
+    a.frombytes(pcm)
+    return array("h", [max(-32768, min(32767, int(x * gain))) for x in a]).tobytes()
+
+
+class Reference:
+    """스피커로 나간 PCM (게인 적용 후) 과 그 청크가 재생되는 시각 (time.perf_counter 기준)"""
+
+    def __init__(self, seconds: float = REF_SEC):
+        self.max_chunks = int(seconds * 1000 / CHUNK_MS)
+        self._lock = threading.Lock()
+        self._t: list[float] = []
+        self._pcm: list[bytes] = []
+        self._rms: list[float] = []
+
+    def add(self, t: float, pcm: bytes) -> None:
+        a = array("h")
+        a.frombytes(pcm[: len(pcm) - (len(pcm) % 2)])
+        level = math.sqrt(sum(x * x for x in a[::4]) / max(1, len(a[::4])))
+        with self._lock:
+            self._t.append(t)
+            self._pcm.append(pcm)
+            self._rms.append(level)
+            if len(self._t) > self.max_chunks:
+                del self._t[0], self._pcm[0], self._rms[0]
+
+    def level(self, t: float) -> float:
+        """t 에 재생 중이던 청크의 RMS (무음/재생 없음이면 0)"""
+        with self._lock:
+            i = bisect.bisect_right(self._t, t) - 1
+            if i < 0 or t - self._t[i] > len(self._pcm[i]) / BYTES_PER_SEC:
+                return 0.0
+            return self._rms[i]
+
+    def slice(self, t0: float, t1: float) -> bytes:
+        """[t0, t1) 동안 스피커로 나간 소리 (RATE mono, 재생 없던 곳은 0)"""
+        out = bytearray(max(0, int((t1 - t0) * RATE)) * 2)
+        with self._lock:
+            i = max(0, bisect.bisect_right(self._t, t0) - 1)
+            chunks = list(zip(self._t[i:], self._pcm[i:]))
+        for t, pcm in chunks:
+            if t >= t1:
+                break
+            off = int(round((t - t0) * RATE)) * 2
+            a, b = max(0, off), min(len(out), off + len(pcm))
+            if b > a:
+                out[a:b] = pcm[a - off:b - off]
+        return bytes(out)
+
+
+class _Item:
+    __slots__ = ("kind", "data", "gen", "done", "queued_at", "first_write_at", "background", "cancelled")
+
+    def __init__(self, kind: str, data: bytes, gen: int, background: bool = False):
+        self.kind = kind
+        self.data = data
+        self.gen = gen
+        self.background = background
+        self.cancelled = False
+        self.done = threading.Event()
+        self.queued_at = time.perf_counter()
+        self.first_write_at: float | None = None
+
+    def cancel(self) -> None:
+        """이 항목만 끊음 (큐의 다른 항목은 그대로)"""
+        self.cancelled = True
+
+    @property
+    def start_latency_ms(self) -> float | None:
+        if self.first_write_at is None:
+            return None
+        return (self.first_write_at - self.queued_at) * 1000
+
+
+class PlaybackWorker:
+    def __init__(self, device: str, volume_percent: int | None = None):
+        self.device = device
+        self.gain = 1.0 if volume_percent is None else volume_percent / 100   # /volume 전에는 full scale
+        self._q: "queue.Queue[_Item | None]" = queue.Queue()
+        self._gen = 0
+        self._backgrounds: list[_Item] = []
+        self.reference = Reference()
+        self._proc: subprocess.Popen | None = None
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._loop, name=f"playback-{device}", daemon=True)
+        self._thread.start()
+
+    # ---------- 공개 API ----------
+    def play_pcm(self, pcm: bytes, wait: bool = True) -> _Item:
+        return self._submit("pcm", pcm, wait)
+
+    def play_background(self, pcm: bytes) -> _Item:
+        """다른 소리가 들어오거나 cancel() 될 때까지 반복 재생 (기다리지 않음)"""
+        return self._submit("pcm", pcm, False, background=True)
+
+    def play_mp3(self, mp3: bytes, wait: bool = True) -> _Item:
+        return self._submit("mp3", mp3, wait)
+
+    def set_volume(self, percent: int) -> None:
+        self.gain = max(0, min(100, percent)) / 100
+
+    def stop(self) -> None:
+        """큐를 비우고 재생 중인 항목도 끊음"""
+        with self._lock:
+            self._gen += 1
+        while True:
+            try:
+                item = self._q.get_nowait()
+            except queue.Empty:
+                break
+            if item:
+                item.done.set()
+
+    flush = stop
+
+    def close(self) -> None:
+        self.stop()
+        self._q.put(None)
+        self._thread.join(timeout=1.0)
+        self._close_proc()
+
+    # ---------- 내부 ----------
+    def _submit(self, kind: str, data: bytes, wait: bool, background: bool = False) -> _Item:
+        with self._lock:
+            item = _Item(kind, data, self._gen, background)
+            if background:
+                self._backgrounds.append(item)
+            else:
+                # 진짜 발화가 오면 earcon 은 지금 청크에서 멈추고 비켜줌
+                for bg in self._backgrounds:
+                    bg.cancelled = True
+                self._backgrounds.clear()
+        self._q.put(item)
+        if wait:
+            item.done.wait()
+        return item
+
+    def _cancelled(self, item: _Item) -> bool:
+        return item.cancelled or item.gen != self._gen
+
+    def _ensure_proc(self) -> subprocess.Popen:
+        if self._proc is None or self._proc.poll() is not None:
+            self._proc = subprocess.Popen(
+                ["aplay", "-D", self.device, "-q", "-t", "raw", "-f", "S16_LE", "-r", str(RATE), "-c", "1"],
+                stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            print(f"[PLAYBACK] aplay opened on {self.device}")
+        return self._proc
+
+    def _close_proc(self) -> None:
+        if self._proc:
+            try:
+                self._proc.stdin.close()
+                self._proc.wait(timeout=1.0)
+            except Exception:
+                self._proc.kill()
+            self._proc = None
+
+    def _loop(self) -> None:
+        while True:
+            item = self._q.get()
+            if item is None:
+                return
+            try:
+                if item.background:
+                    while not self._cancelled(item):
+                        self._play_stream(item, [item.data])
+                elif not self._cancelled(item):
+                    if item.kind == "mp3":
+                        self._play_stream(item, self._decode_mp3(item))
+                    else:
+                        self._play_stream(item, [item.data])
+            except Exception as e:
+                print("[PLAYBACK ERROR]", e)
+                self._close_proc()
+            finally:
+                with self._lock:
+                    if item in self._backgrounds:
+                        self._backgrounds.remove(item)
+                item.done.set()
+
+    def _decode_mp3(self, item: _Item):
+        """mpg123 로 디코드만 (장치 open 없음). 앞부분부터 바로 흘려보냄"""
+        dec = subprocess.Popen(
+            ["mpg123", "-q", "-s", "-m", "-r", str(RATE), "-e", "s16", "-"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        )
+        feeder = threading.Thread(target=self._feed, args=(dec, item.data), daemon=True)
+        feeder.start()
+        try:
+            while not self._cancelled(item):
+                buf = dec.stdout.read(BYTES_PER_SEC * CHUNK_MS // 1000 * 4)
+                if not buf:
+                    break
+                yield buf
+        finally:
+            dec.kill()
+            dec.wait()
+
+    @staticmethod
+    def _feed(dec: subprocess.Popen, data: bytes) -> None:
+        try:
+            dec.stdin.write(data)
+            dec.stdin.close()
+        except Exception:
+            pass
+
+    def _play_stream(self, item: _Item, chunks) -> None:
+        proc = self._ensure_proc()
+        chunk_bytes = BYTES_PER_SEC * CHUNK_MS // 1000
+        started = None
+        written = 0
+
+        def write(frame) -> None:
+            nonlocal started, written
+            if started is None:
+                started = item.first_write_at = time.perf_counter()
+            else:
+                # 실시간보다 LEAD_SEC 이상 앞서지 않게
+                ahead = written / BYTES_PER_SEC - (time.perf_counter() - started)
+                if ahead > LEAD_SEC:
+                    time.sleep(ahead - LEAD_SEC)
+            out = bytes(scale_pcm(frame, self.gain))
+            proc.stdin.write(out)
+            proc.stdin.flush()
+            self.reference.add(started + written / BYTES_PER_SEC, out)
+            written += len(frame)
+
+        pending = b""
+        for buf in chunks:
+            pending = pending + buf if pending else buf
+            view, off = memoryview(pending), 0
+            while len(pending) - off >= chunk_bytes:
+                if self._cancelled(item):
+                    return
+                write(view[off:off + chunk_bytes])
+                off += chunk_bytes
+            pending = bytes(view[off:])
+        if pending and not self._cancelled(item):
+            write(pending)
+
+        # 실제로 다 나올 때까지 기다렸다가 done (다음 턴 녹음과 겹치지 않게)
+        while started is not None and not self._cancelled(item):
+            left = written / BYTES_PER_SEC - (time.perf_counter() - started)
+            if left <= 0:
+                break
+            time.sleep(min(left, CHUNK_MS / 1000))
+
+
+# ===== 장치별 워커 =====
+_workers: dict[str, PlaybackWorker] = {}
+_workers_lock = threading.Lock()
+_volume: int | None = None     # /volume 이 한 번도 안 불렸으면 게인 없음
+
+
+def enabled() -> bool:
+    return os.getenv("PLAYBACK_DAEMON", "1") == "1"
+
+
+def worker_for(device: str) -> PlaybackWorker:
+    with _workers_lock:
+        w = _workers.get(device)
+        if w is None:
+            w = _workers[device] = PlaybackWorker(device, _volume)
+        return w
+
+
+def set_volume(percent: int) -> None:
+    global _volume
+    _volume = percent
+    with _workers_lock:
+        for w in _workers.values():
+            w.set_volume(percent)
+
+
+def stop(device: str) -> None:
+    with _workers_lock:
+        w = _workers.get(device)
+    if w:
+        w.stop()
+
+
+def stop_all() -> None:
+    with _workers_lock:
+        targets = list(_workers.values())
+    for w in targets:
+        w.stop()
+
+
+# ===== 벤치마크 =====
+def bench(mp3_path: str, device: str, n: int = 5) -> dict:
+    with open(mp3_path, "rb") as f:
+        mp3 = f.read()
+
+    # before: 발화마다 shell + mpg123 + ALSA open. 첫 프레임(-n 1)까지 걸린 시간
+    before = []
+    for _ in range(n):
+        t = time.perf_counter()
+        subprocess.call(f"mpg123 -q -a {device} -n 1 {mp3_path} >/dev/null 2>&1", shell=True)
+        before.append((time.perf_counter() - t) * 1000)
+
+    # after: 열려 있는 워커 큐에 넣고 첫 PCM 이 장치 파이프에 써질 때까지
+    w = PlaybackWorker(device)
+    w.play_pcm(b"\0" * 960)   # 장치 open 은 한 번만 (워밍업)
+    after = []
+    for _ in range(n):
+        item = w.play_mp3(mp3, wait=False)
+        while item.first_write_at is None and not item.done.is_set():
+            time.sleep(0.001)
+        after.append(item.start_latency_ms or 0.0)
+        w.stop()
+        item.done.wait()
+    w.close()
+
+    med = lambda xs: sorted(xs)[len(xs) // 2]
+    return {"before_ms": round(med(before), 1), "after_ms": round(med(after), 1), "n": n}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == "--bench":
+        dev = os.getenv("SPEAKER_OUT", "plughw:3,0")
+        res = bench(sys.argv[2], dev, int(sys.argv[3]) if len(sys.argv) > 3 else 5)
+        print(f"[BENCH] start latency median: mpg123-per-utterance={res['before_ms']}ms worker={res['after_ms']}ms (n={res['n']})")
+    else:
+        print("usage: python playback.py --bench file.mp3 [n]")
@@ -0,0 +1,147 @@
+# profiler.py
+# 현장에서 "느리다" 할 때 쓰는 샘플링 프로파일러 (/debug/profile?seconds=N)
+# - 요청이 있을 때만 샘플러 스레드 하나가 hz 로 sys._current_frames() 를 훑음 → 안 쓸 때 비용 0
+# - 모든 OS 스레드(worker-*, backend 풀, capture/playback, emit pump, SocketIO hub)의 스택을
+#   "스레드;바깥 함수;...;안쪽 함수 횟수" 한 줄씩 (collapsed stack, flamegraph.pl / speedscope 에 그대로)
+# - 스레드 이름의 숫자는 묶음 (backend_3 → backend_N) 해서 풀 스레드를 한 덩어리로
+# - idle=False: 대기(wait/select/sleep/readinto...)에 걸린 샘플은 뺌 → CPU 쓰는 곳만
+#   python profiler.py --bench → 바쁜 스레드 옆에서 샘플링할 때 처리량 손실(%)
+import os, re, sys, time, threading
+from collections import Counter
+
+MAX_SECONDS = 60
+MAX_HZ = 1000
+IDLE_LEAVES = {"wait", "select", "sleep", "readinto", "read", "recv", "recv_into", "accept", "poll", "get", "join",
+               "_wait_for", "trampoline", "switch", "acquire", "epoll", "readline", "serve_forever"}
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _thread_name(name: str) -> str:
+    return re.sub(r"\d+", "N", name)
+
+
+class Sampler:
+    def __init__(self, hz: float = 100, idle: bool = True):
+        self.hz = min(max(hz, 1.0), MAX_HZ)
+        self.idle = idle
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.cost = 0.0          # 샘플러 스레드가 쓴 CPU 초
+        self._done = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _sample(self, own: int) -> None:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            leaf = frame.f_code.co_name
+            if not self.idle and leaf in IDLE_LEAVES:
+                continue
+            parts = []
+            while frame is not None:
+                parts.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            parts.append(_thread_name(names.get(ident, f"thread-{ident}")))
+            self.stacks[";".join(reversed(parts))] += 1
+        self.samples += 1
+
+    def _loop(self, seconds: float) -> None:
+        own = threading.get_ident()
+        period = 1.0 / self.hz
+        c0 = time.thread_time()
+        end = time.perf_counter() + seconds
+        nxt = time.perf_counter()
+        while not self._done.is_set() and nxt < end:
+            self._sample(own)
+            nxt += period
+            self._done.wait(max(0.0, nxt - time.perf_counter()))
+        self.cost = time.thread_time() - c0
+        self._done.set()
+
+    def start(self, seconds: float) -> "Sampler":
+        self._thread = threading.Thread(target=self._loop, args=(min(seconds, MAX_SECONDS),), name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._done.set()
+        if self._thread:
+            self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+    def top(self, n: int = 20) -> list[dict]:
+        """안쪽 함수(leaf) 별 샘플 비율"""
+        leaves: Counter = Counter()
+        for stack, c in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += c
+        total = sum(leaves.values()) or 1
+        return [{"frame": f, "samples": c, "pct": round(c / total * 100, 1)} for f, c in leaves.most_common(n)]
+
+
+_busy = threading.Lock()
+
+
+def profile(seconds: float, hz: float = 100, idle: bool = True, sleep=time.sleep) -> Sampler | None:
+    """seconds 동안 샘플링. 이미 돌고 있으면 None. sleep: 기다리는 쪽이 hub 면 socketio.sleep (hub 를 막지 않게)"""
+    if not _busy.acquire(blocking=False):
+        return None
+    try:
+        s = Sampler(hz, idle).start(seconds)
+        while not s._done.is_set():
+            sleep(0.05)
+        s.stop()
+        return s
+    finally:
+        _busy.release()
+
+
+# ===== 벤치마크 =====
+def _spin(stop: threading.Event, out: list) -> None:
+    n = 0
+    while not stop.is_set():
+        sum(i * i for i in range(200))
+        n += 1
+    out.append(n)
+
+
+def bench(seconds: float = 1.0, hz: float = 100, rounds: int = 3) -> dict:
+    """바쁜 워커 스레드 하나의 처리량: 샘플링 없이 / hz 로 샘플링하면서 번갈아 rounds 번 (중앙값)"""
+    rates: dict[str, list] = {"off": [], "on": []}
+    res = {}
+    for _ in range(rounds):
+        for name in ("off", "on"):
+            stop, out = threading.Event(), []
+            th = threading.Thread(target=_spin, args=(stop, out), name="worker-bench")
+            th.start()
+            s = Sampler(hz).start(seconds) if name == "on" else None
+            time.sleep(seconds)
+            stop.set()
+            th.join()
+            if s:
+                s.stop()
+                res["samples"] = s.samples
+                res["sampler_cpu_pct"] = round(s.cost / seconds * 100, 2)
+                s.stacks = Counter({k: v for k, v in s.stacks.items() if k.startswith("worker-bench")})
+                res["top"] = s.top(3)
+            rates[name].append(out[0] / seconds)
+    res["off"], res["on"] = (sorted(v)[len(v) // 2] for v in (rates["off"], rates["on"]))
+    res["overhead_pct"] = round((1 - res["on"] / res["off"]) * 100, 2)
+    return res
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--bench"]:
+        hz = float(sys.argv[2]) if len(sys.argv) > 2 else 100
+        r = bench(hz=hz)
+        print(f"[PROFILE BENCH] hz={hz} samples={r['samples']} sampler CPU={r['sampler_cpu_pct']}% "
+              f"worker throughput loss={r['overhead_pct']}% ({r['off']:.0f} → {r['on']:.0f} loops/s)")
+        for t in r["top"]:
+            print(f"[PROFILE BENCH]   {t['pct']:>5}% {t['frame']}")
+    else:
+        print("usage: python profiler.py --bench [hz]")
@@ -0,0 +1,214 @@
+# quiz_bank.py
+# 퀴즈 오프라인 모드
+# - 종류(chosung/quiz/animal_quiz) × 주제(동물)별 문제 묶음을 미리 받아 두고(prefetch),
+#   백엔드 talk 가 실패/타임아웃이면 기기에서 채점 → 네트워크가 끊겨도 세션이 이어짐 (평소 채점은 백엔드)
+# - 백엔드 엔드포인트 (기존 API 에 없던 것, 경로는 env 로 바꿀 수 있음)
+#   POST BATCH_PATH   {"kind", "topic", "profile_id", "count"} → {"questions": [{"question", "answers", ...}]}
+#   POST RESULTS_PATH {"results": [채점 기록...]} → 2xx 면 outbox 에서 지움
+# - 채점 결과는 outbox 파일에 쌓아 두었다가 한꺼번에 올림 (bulk sync)
+import os, re, json, time, random, threading
+
+BATCH_PATH = os.getenv("QUIZ_BATCH_PATH", "/api/quiz/batch")        # 문제 묶음 받기
+RESULTS_PATH = os.getenv("QUIZ_RESULTS_PATH", "/api/quiz/results")  # 결과 한꺼번에 올리기
+BATCH_SIZE = int(os.getenv("QUIZ_BATCH_SIZE", "20"))
+TTL_SEC = float(os.getenv("QUIZ_BANK_TTL_HOURS", "24")) * 3600
+QUESTIONS_PER_SESSION = int(os.getenv("QUIZ_LOCAL_QUESTIONS", "5"))
+MAX_TRIES = 2
+
+# 고정 멘트 (TTS 캐시에 미리 올려 둠)
+CORRECT = "정답이야!"
+RETRY = "아쉽다! 다시 한 번 생각해 볼까?"
+FALLBACK_NOTICE = "인터넷이 잠깐 끊겼어. 꾸로가 준비한 문제로 계속할게!"
+PHRASES = (CORRECT, RETRY, FALLBACK_NOTICE)
+
+_ENDINGS = re.compile(r"(입니다|이에요|예요|이요|이야|요|야)$")
+_NEGATED = re.compile(r"(?:은|는|이|가|도)?(?:아니|아냐|아닌|아녀|말고)")   # 정답 바로 뒤 ("사과 아니야", "사과는 아닌 것 같아")
+
+
+def normalize_answer(text: str) -> str:
+    """공백/문장부호/끝말(요, 이야 …) 제거"""
+    t = re.sub(r"[^0-9a-z가-힣ㄱ-ㅎ]", "", (text or "").lower())
+    return _ENDINGS.sub("", t) or t
+
+
+def _was(word: str) -> str:
+    """받침 있으면 '이었어', 없으면 '였어' (귤이었어 / 사과였어)"""
+    last = word[-1:] or " "
+    has_final = "가" <= last <= "힣" and (ord(last) - 0xAC00) % 28 != 0
+    return f"{word}이었어" if has_final else f"{word}였어"
+
+
+def is_correct(text: str, answers: list[str]) -> bool:
+    said = normalize_answer(text)
+    if not said:
+        return False
+    for a in answers:
+        a = normalize_answer(a)
+        # "사과 사과!" 처럼 정답을 포함해도 인정. 한 글자 정답은 "개구리"의 "개" 같은 오답을 막으려 완전 일치만
+        if a and said == a:
+            return True
+        if len(a) >= 2 and any(not _NEGATED.match(said, m.end()) for m in re.finditer(re.escape(a), said)):
+            return True   # 뒤에 "아니/아닌/말고" 가 붙지 않은 자리가 하나라도 있으면
+    return False
+
+
+def _valid(q) -> bool:
+    return isinstance(q, dict) and q.get("question") and isinstance(q.get("answers"), list) and q["answers"]
+
+
+# ===== 문제 은행 =====
+class QuizBank:
+    def __init__(self, path: str | None):
+        self.path = path
+        self._lock = threading.Lock()
+        # key -> {"fetched_at": float, "questions": [{"id", "question", "answers", "hint"?}]}
+        self._data: dict[str, dict] = {}
+        self._load()
+
+    @staticmethod
+    def key(kind: str, topic: str | None) -> str:
+        return f"{kind}:{topic or ''}"
+
+    def questions(self, kind: str, topic: str | None) -> list[dict]:
+        with self._lock:
+            return list(self._data.get(self.key(kind, topic), {}).get("questions", ()))
+
+    def fresh(self, kind: str, topic: str | None) -> bool:
+        with self._lock:
+            d = self._data.get(self.key(kind, topic))
+        return bool(d and d["questions"] and time.time() - d["fetched_at"] < TTL_SEC)
+
+    def store(self, kind: str, topic: str | None, questions: list[dict]) -> int:
+        qs = [q for q in questions if _valid(q)]
+        if not qs:
+            return 0
+        with self._lock:
+            self._data[self.key(kind, topic)] = {"fetched_at": time.time(), "questions": qs}
+        self._save()
+        return len(qs)
+
+    def prefetch(self, kind: str, topic: str | None, profile_id, fetch) -> int:
+        """fetch(path, payload) -> dict 로 문제 묶음을 받아 저장. 받은 문제 수"""
+        res = fetch(BATCH_PATH, {"kind": kind, "topic": topic, "profile_id": profile_id, "count": BATCH_SIZE})
+        n = self.store(kind, topic, (res or {}).get("questions") or [])
+        print(f"[QUIZ BANK] prefetch {self.key(kind, topic)}: {n}문제")
+        return n
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {k: {"questions": len(d["questions"]), "age_sec": round(time.time() - d["fetched_at"])}
+                    for k, d in self._data.items()}
+
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._data = json.load(f)
+        except Exception as e:
+            print("[QUIZ BANK] load 실패:", e)
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            raw = json.dumps(self._data, ensure_ascii=False)
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(raw)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print("[QUIZ BANK] save 실패:", e)
+
+
+# ===== 기기 채점 =====
+class LocalQuiz:
+    """백엔드 talk 응답과 같은 모양({"status", "message"})을 돌려줌. speak: 나눠 말할 문장들 (캐시 적중용)"""
+
+    def __init__(self, kind: str, topic: str | None, questions: list[dict], session_id: str, profile_id,
+                 n: int = QUESTIONS_PER_SESSION):
+        self.kind, self.topic = kind, topic
+        self.session_id, self.profile_id = session_id, profile_id
+        self.items = random.sample(questions, min(n, len(questions)))
+        self.i = 0
+        self.tries = 0
+        self.score = 0
+        self.results: list[dict] = []
+
+    def _reply(self, *parts: str, status: str = "continue") -> dict:
+        parts = [p for p in parts if p]
+        return {"status": status, "message": " ".join(parts), "speak": parts, "source": "local"}
+
+    def _question(self) -> str:
+        return self.items[self.i]["question"]
+
+    def start(self, notice: str | None = None) -> dict:
+        if not self.items:
+            return self._reply("준비된 문제가 없어.", status="end")
+        return self._reply(notice, "퀴즈를 시작할게!", self._question())
+
+    def answer(self, text: str) -> dict:
+        q = self.items[self.i]
+        self.tries += 1
+        ok = is_correct(text, q["answers"])
+        if not ok and self.tries < MAX_TRIES:
+            return self._reply(RETRY, q.get("hint"))
+        self.score += ok
+        self.results.append({
+            "kind": self.kind, "topic": self.topic, "session_id": self.session_id, "profile_id": self.profile_id,
+            "question_id": q.get("id"), "user_input": text, "correct": ok, "tries": self.tries, "ts": time.time(),
+        })
+        head = CORRECT if ok else f"정답은 {_was(q['answers'][0])}."
+        self.i, self.tries = self.i + 1, 0
+        if self.i >= len(self.items):
+            return self._reply(head, f"퀴즈 끝! {len(self.items)}문제 중에 {self.score}문제 맞혔어. 잘했어!", status="end")
+        return self._reply(head, self._question())
+
+    def upcoming(self) -> list[str]:
+        """다음에 말할 문장들 (아이가 답하는 동안 미리 합성)"""
+        nxt = self.items[self.i + 1]["question"] if self.i + 1 < len(self.items) else None
+        hint = self.items[self.i].get("hint") if self.i < len(self.items) else None
+        return [t for t in (nxt, hint) if t]
+
+
+# ===== 결과 outbox =====
+class ResultOutbox:
+    """JSON lines 로 쌓고 flush() 때 한 번에 전송. 전송 중 실패하면 .sending 이 남아 다음 flush 에서 다시 보냄"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._sending = path + ".sending"
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def extend(self, records: list[dict]) -> None:
+        if not records:
+            return
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            for r in records:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+    def pending(self) -> int:
+        n = 0
+        for p in (self._sending, self.path):
+            if os.path.exists(p):
+                with open(p, encoding="utf-8") as f:
+                    n += sum(1 for line in f if line.strip())
+        return n
+
+    def flush(self, send) -> int:
+        """send(records) 가 예외 없이 끝나면 보낸 것으로 봄. 보낸 개수"""
+        with self._flush_lock:
+            with self._lock:
+                if not os.path.exists(self._sending):
+                    if not os.path.exists(self.path):
+                        return 0
+                    os.replace(self.path, self._sending)
+            with open(self._sending, encoding="utf-8") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+            if records:
+                send(records)
+            os.remove(self._sending)
+            print(f"[QUIZ SYNC] {len(records)}건 전송")
+            return len(records)
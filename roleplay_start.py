@@ -0,0 +1,102 @@
+# roleplay_start.py
+# /api/roleplay/start 는 여기 한 곳에서만 부름
+# - roleplay_loop / ask_and_confirm_roles / /confirm/roles 가 같은 세션·역할로 동시에(또는 연달아) 시작해도 백엔드 호출은 한 번
+#   먼저 온 호출자가 요청하고, 나머지는 그 결과(또는 같은 예외)를 기다렸다 받음
+# - 받은 chatroom_id 는 (장치, 워커 run, session_id, 역할) 별로 캐시 → 같은 run 안 중복 시작은 왕복 없이 바로
+# - 응답 모양이 제각각이라 ({"chatroom_id"}, {"result": {"chatRoomId"}} ...) parse_start 하나로 읽음
+import threading
+from collections import OrderedDict
+
+CACHE_MAX = 64
+
+
+def _as_id(v):
+    if isinstance(v, str) and v.strip().isdigit():
+        return int(v)
+    return v or None
+
+
+def parse_start(res: dict) -> dict:
+    """start 응답 → {"chatroom_id", "session_id", "response"} (없는 값은 None)"""
+    res = res if isinstance(res, dict) else {}
+    inner = res.get("result") if isinstance(res.get("result"), dict) else {}
+    def pick(*names):
+        for src in (inner, res):
+            for n in names:
+                if src.get(n) not in (None, ""):
+                    return src[n]
+        return None
+    return {
+        "chatroom_id": _as_id(pick("chatroom_id", "chatRoomId", "chatroomId")),
+        "session_id": pick("session_id", "sessionId"),
+        "response": pick("response", "message"),
+    }
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: dict | None = None
+        self.error: BaseException | None = None
+
+
+class RoleplayStarter:
+    """post(session_id, profile_id, user_role, bot_role, access_token) -> 응답 dict 를 single-flight 로 감쌈
+    wait_timeout: 먼저 온 호출자의 결과를 기다리는 최대 초 (넘으면 TimeoutError, 먼저 온 호출은 계속 진행)"""
+
+    def __init__(self, post, wait_timeout: float | None = None):
+        self._post = post
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._inflight: dict[tuple, _Flight] = {}
+        self._cache: OrderedDict[tuple, dict] = OrderedDict()
+        self.counts = {"calls": 0, "joined": 0, "cached": 0, "failed": 0}
+
+    def start(self, scope: tuple, session_id: str, profile_id, user_role: str, bot_role: str,
+              access_token: str | None = None) -> dict:
+        """scope: (device_id, run) — 워커가 새로 뜨면 같은 session_id 라도 새로 시작. 실패하면 예외 (캐시 안 함)"""
+        key = (*scope, session_id, user_role, bot_role)
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None:
+                self.counts["cached"] += 1
+                return hit
+            flight = self._inflight.get(key)
+            owner = flight is None
+            if owner:
+                flight = self._inflight[key] = _Flight()
+                self.counts["calls"] += 1
+            else:
+                self.counts["joined"] += 1
+
+        if not owner:
+            if not flight.done.wait(self.wait_timeout):
+                self.counts["failed"] += 1
+                raise TimeoutError(f"roleplay start 대기 {self.wait_timeout}s 초과: {session_id}")
+            if flight.error:
+                raise flight.error
+            return flight.result
+
+        try:
+            res = parse_start(self._post(session_id, profile_id, user_role, bot_role, access_token))
+            if not res["chatroom_id"]:
+                raise ValueError(f"start 응답에 chatroom_id 없음: {res}")
+            flight.result = res
+        except BaseException as e:
+            flight.error = e
+        with self._lock:
+            self._inflight.pop(key, None)
+            if flight.result:
+                self._cache[key] = flight.result
+                while len(self._cache) > CACHE_MAX:
+                    self._cache.popitem(last=False)
+            else:
+                self.counts["failed"] += 1
+        flight.done.set()
+        if flight.error:
+            raise flight.error
+        return flight.result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.counts, "inflight": len(self._inflight), "cache": len(self._cache)}
@@ -0,0 +1,121 @@
+# session_journal.py
+# 세션 상태 전이를 append-only 로그(JSON lines)로 남겨서, 컨트롤러가 재시작돼도 이어서 진행
+import os, json, time, threading
+
+# 한 줄 = 한 전이
+# {"ts": ..., "device": "default", "run": 3, "event": "start", ...}
+#   start    : mode, target(루프 함수 이름), args, session, roles
+#   roles    : user_role, bot_role
+#   chatroom : chatroom_id (+ session_id)
+#   stopped  : stop 요청 (워커가 아직 안 끝났어도 이 뒤로는 이어하지 않음)
+#   end      : 워커 종료 (정상 종료/stop 모두)
+
+
+class SessionJournal:
+    def __init__(self, path: str, flush_interval: float = 0.2, max_batch: int = 32):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._pending = 0
+        self._closed = False
+        self._fh = None
+        self._flusher = None
+
+    # ---------- 쓰기 ----------
+    def open(self) -> "SessionJournal":
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)   # access_token 포함 → 본인만 읽기
+        self._fh = os.fdopen(fd, "a", encoding="utf-8")
+        self._flusher = threading.Thread(target=self._flush_loop, name="journal-flush", daemon=True)
+        self._flusher.start()
+        return self
+
+    def append(self, device_id: str, run: int, event: str, sync: bool = False, **data) -> None:
+        rec = {"ts": round(time.time(), 3), "device": device_id, "run": run, "event": event, **data}
+        line = json.dumps(rec, ensure_ascii=False, default=str) + "\n"
+        with self._cond:
+            if self._closed or not self._fh:
+                return
+            self._fh.write(line)
+            self._pending += 1
+            if sync:
+                self._sync_locked()
+            elif self._pending >= self.max_batch:
+                self._cond.notify()
+
+    def _sync_locked(self) -> None:
+        if not self._pending:
+            return
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._pending = 0
+
+    def _flush_loop(self) -> None:
+        # fsync 를 묶어서: flush_interval 마다 또는 max_batch 가 차면 한 번
+        with self._cond:
+            while not self._closed:
+                self._cond.wait(self.flush_interval)
+                try:
+                    self._sync_locked()
+                except Exception as e:
+                    print("[JOURNAL ERROR]", e)
+
+    def close(self) -> None:
+        with self._cond:
+            if self._fh:
+                self._sync_locked()
+                self._fh.close()
+            self._closed = True
+            self._fh = None
+            self._cond.notify()
+
+    # ---------- 읽기 ----------
+    @staticmethod
+    def replay(path: str) -> dict[str, dict]:
+        """로그를 처음부터 재생해서 끝나지 않은 세션(device_id -> 상태)만 반환"""
+        live: dict[str, dict] = {}
+        if not os.path.exists(path):
+            return live
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue   # 크래시로 잘린 마지막 줄
+                dev, run, ev = rec.get("device"), rec.get("run"), rec.get("event")
+                st = live.get(dev)
+                if ev == "start":
+                    live[dev] = {
+                        "run": run,
+                        "mode": rec.get("mode"),
+                        "target": rec.get("target"),
+                        "args": rec.get("args") or [],
+                        "in_dev": rec.get("in_dev"),
+                        "out_dev": rec.get("out_dev"),
+                        "session": rec.get("session") or {},
+                        "roles": rec.get("roles") or {},
+                    }
+                elif not st or st["run"] != run:
+                    continue   # 이미 교체된 이전 워커의 늦은 기록
+                elif ev == "roles":
+                    st["roles"].update({k: rec.get(k) for k in ("user_role", "bot_role")})
+                elif ev == "chatroom":
+                    st["session"]["chatroom_id"] = rec.get("chatroom_id")
+                    if rec.get("session_id"):
+                        st["session"]["session_id"] = rec["session_id"]
+                elif ev in ("end", "stopped"):
+                    live.pop(dev, None)
+        return live
+
+    def compact(self, live: dict[str, dict]) -> None:
+        """살아있는 세션만 start 한 줄씩으로 다시 써서 로그가 무한히 자라지 않게 함 (open 전에 호출)"""
+        tmp = self.path + ".tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_TRUNC | os.O_CREAT, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for dev, st in live.items():
+                rec = {"ts": round(time.time(), 3), "device": dev, "event": "start", **st}
+                f.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
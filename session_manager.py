@@ -0,0 +1,179 @@
+# session_manager.py
+# 오디오 장치(=아이 한 명)마다 워커/취소/장치/상태를 따로 갖는 세션 관리자
+import threading, itertools
+from threading import Thread, Event, Lock
+
+from session_store import current_session, current_roles
+
+DEFAULT_DEVICE = "default"
+
+_local = threading.local()
+_run_ids = itertools.count(1)
+
+
+class DeviceSession:
+    """장치 하나에 대응하는 세션 (워커 스레드, stop_event, 입출력 장치, 세션/역할 상태)"""
+
+    def __init__(self, device_id: str, in_dev: str | None = None, out_dev: str | None = None,
+                 session: dict | None = None, roles: dict | None = None):
+        self.device_id = device_id
+        self.in_dev = in_dev
+        self.out_dev = out_dev
+        self.mode: str | None = None
+        self.session = session if session is not None else {"session_id": None, "chatroom_id": None, "access_token": None}
+        self.roles = roles if roles is not None else {"user_role": None, "bot_role": None, "profile_id": None}
+        self.stop_event = Event()
+        self.worker: Thread | None = None
+        self.run = 0
+        self.journal = None   # SessionJournal (선택)
+        self.on_exit = None   # 워커가 끝날 때 워커 스레드에서 on_exit(session) (선택)
+        self._lock = Lock()
+
+    @property
+    def running(self) -> bool:
+        return bool(self.worker and self.worker.is_alive())
+
+    @property
+    def tag(self) -> str | None:
+        """임시 파일 등 장치별로 나눠야 하는 자원에 붙일 태그 (기본 장치는 None)"""
+        return None if self.device_id == DEFAULT_DEVICE else self.device_id
+
+    def record(self, event: str, run: int | None = None, **data) -> None:
+        """상태 전이를 저널에 기록 (저널이 없으면 무시)"""
+        if self.journal:
+            self.journal.append(self.device_id, run or self.run, event, **data)
+
+    def start(self, target, *args, mode: str | None = None, prepare=None) -> None:
+        """prepare(self): 이전 워커를 멈춘(join) 뒤 새 워커 전에 세션/역할 교체 (같은 잠금 안 → 이전 턴이 새 값을 못 봄)"""
+        with self._lock:
+            self._stop_locked()
+            if prepare:
+                prepare(self)
+            # 워커마다 새 Event: join 시간 안에 못 끝난 이전 워커도 자기 Event는 set 상태로 유지
+            stop_event = Event()
+            self.stop_event = stop_event
+            self.mode = mode
+            self.run = next(_run_ids)
+            self.record(
+                "start", sync=True, mode=mode, target=target.__name__, args=list(args),
+                in_dev=self.in_dev, out_dev=self.out_dev,
+                session=dict(self.session), roles=dict(self.roles),
+            )
+            self.worker = Thread(
+                target=self._run, args=(target, stop_event, args, self.run),
+                name=f"worker-{self.device_id}", daemon=True,
+            )
+            self.worker.start()
+        print(f"[worker:{self.device_id}] starting {target.__name__}{args}")
+
+    def stop(self, timeout: float = 1.0) -> None:
+        with self._lock:
+            # 워커가 listen/백엔드에 막혀 늦게 끝나도, 그 사이 전원이 꺼지면 재부팅 때 이어하지 않게 바로 기록
+            if self.run:
+                self.record("stopped", sync=True)
+            self._stop_locked(timeout)
+        print(f"[worker:{self.device_id}] stopped")
+
+    def _stop_locked(self, timeout: float = 1.0) -> None:
+        self.stop_event.set()
+        if self.worker and self.worker.is_alive() and self.worker is not threading.current_thread():
+            self.worker.join(timeout=timeout)
+        self.mode = None
+
+    def _run(self, target, stop_event: Event, args: tuple, run: int) -> None:
+        _local.session = self
+        _local.stop_event = stop_event
+        try:
+            target(*args)
+        finally:
+            if self.on_exit:
+                try:
+                    self.on_exit(self)
+                except Exception as e:
+                    print(f"[worker:{self.device_id}] on_exit error:", e)
+            self.record("end", run=run)
+            _local.session = None
+            _local.stop_event = None
+
+    def state(self) -> dict:
+        return {
+            "device_id": self.device_id,
+            "mode": self.mode,
+            "running": self.running,
+            "in_dev": self.in_dev,
+            "out_dev": self.out_dev,
+            "roles": self.roles,
+            "session": {k: v for k, v in self.session.items() if k != "access_token"},
+        }
+
+
+class SessionManager:
+    """device_id -> DeviceSession"""
+
+    def __init__(self, journal=None, on_exit=None):
+        self._lock = Lock()
+        self.journal = journal
+        self.on_exit = on_exit
+        self._sessions: dict[str, DeviceSession] = {}
+        # 기존 단일 세션 라우트는 session_store 의 전역 dict 를 그대로 공유
+        self.default = self.create(DEFAULT_DEVICE, session=current_session, roles=current_roles)
+
+    def create(self, device_id: str, in_dev: str | None = None, out_dev: str | None = None, **kw) -> DeviceSession:
+        with self._lock:
+            sess = self._sessions.get(device_id)
+            if sess is None:
+                sess = DeviceSession(device_id, in_dev, out_dev, **kw)
+                sess.journal = self.journal
+                sess.on_exit = self.on_exit
+                self._sessions[device_id] = sess
+            else:
+                sess.in_dev = in_dev or sess.in_dev
+                sess.out_dev = out_dev or sess.out_dev
+            return sess
+
+    def get(self, device_id: str) -> DeviceSession | None:
+        with self._lock:
+            return self._sessions.get(device_id)
+
+    def remove(self, device_id: str) -> bool:
+        if device_id == DEFAULT_DEVICE:
+            return False
+        with self._lock:
+            sess = self._sessions.pop(device_id, None)
+        if sess:
+            sess.stop()
+        return sess is not None
+
+    def all(self) -> list[DeviceSession]:
+        with self._lock:
+            return list(self._sessions.values())
+
+    def states(self) -> list[dict]:
+        return [s.state() for s in self.all()]
+
+    def stop_all(self) -> None:
+        for s in self.all():
+            s.stop()
+
+
+def current() -> DeviceSession | None:
+    """현재 스레드를 돌리고 있는 세션 (워커 밖이면 None)"""
+    return getattr(_local, "session", None)
+
+
+def current_stop_event() -> Event | None:
+    return getattr(_local, "stop_event", None)
+
+
+def bind(fn):
+    """지금 스레드의 세션/중지 이벤트를 들고 다른 스레드(백엔드 풀)에서 fn 실행 (notify 의 device_id, trace 용)"""
+    sess, stop_event = current(), current_stop_event()
+
+    def _run(*args, **kw):
+        prev = current(), current_stop_event()
+        _local.session, _local.stop_event = sess, stop_event
+        try:
+            return fn(*args, **kw)
+        finally:
+            _local.session, _local.stop_event = prev
+    return _run
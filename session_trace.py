@@ -0,0 +1,306 @@
+# session_trace.py
+# 실제 세션 녹화(opt-in) + 결정적 재생 → 아이/네트워크 없이 지연 회귀를 재현
+# 녹화: TRACE_DIR 를 설정하면 세션(장치 × 워커 run)마다 {TRACE_DIR}/{장치}-{run}-{session_id}.trace.gz
+#   한 줄 = 한 이벤트 JSON, t = 세션 시작부터 초
+#   start  mode, ctx(토큰 값은 뺌), backend_base
+#   listen text, ms(녹음+STT), capture(onset/speech), audio(STT 로 보낸 wav, base64)
+#   say    text, ms, fmt, audio(캐시에 있던 합성 결과, base64)
+#   http   method, url, request(body), status, response(body), ms  ← requests 응답 hook (백엔드 주소만)
+#   end
+#   TRACE_AUDIO=0 이면 audio 필드 없이 (텍스트/타이밍만)
+# 재생: python session_trace.py replay a.trace.gz [--speed 10] [--out r.json]
+#   pi_controller 의 같은 모드를 replay 제공자(listen → 기록된 STT 텍스트, say → 기록된 TTS 시간만큼 쉼)와
+#   requests 어댑터(백엔드 → 기록된 응답을 기록된 시간만큼 뒤에)로 돌림. --speed 는 이 대기들만 줄임
+#   → 턴마다 원래 처리 시간 / 재생 처리 시간 / 그중 로컬(우리 코드) 시간
+#   기기 채점 퀴즈(QUIZ_LOCAL)는 재생 때 끔 (기록된 백엔드 응답으로만 진행)
+#   python session_trace.py wavs a.trace.gz out/ → listen 오디오를 wav 로 (beamform/wakeword 평가용)
+import os, sys, json, gzip, time, base64, threading
+from collections import deque
+from urllib.parse import urlsplit
+
+import session_manager
+from audio_providers import AudioProvider, AudioClip, TTS, STT
+
+TRACE_AUDIO = os.getenv("TRACE_AUDIO", "1") == "1"
+
+
+def _b64(data: bytes | None) -> str | None:
+    return base64.b64encode(data).decode("ascii") if data and TRACE_AUDIO else None
+
+
+def _text(body) -> str | None:
+    if body is None:
+        return None
+    return body.decode("utf-8", "replace") if isinstance(body, bytes) else str(body)
+
+
+class _Trace:
+    def __init__(self, path: str):
+        self.path = path
+        self.t0 = time.perf_counter()
+        self._f = gzip.open(path, "at", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, kind: str, flush: bool = False, **data) -> None:
+        rec = {"t": round(time.perf_counter() - self.t0, 4), "kind": kind, **data}
+        with self._lock:
+            if self._f.closed:
+                return
+            self._f.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+            if flush:
+                self._f.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._f.close()
+
+
+# ===== 녹화 =====
+class Recorder:
+    """fallback: 워커 밖(라우트, 기본 장치)에서 난 이벤트를 붙일 세션"""
+
+    def __init__(self, directory: str, backend_urls: list[str], fallback=None):
+        self.directory = directory
+        self.backend_urls = tuple(u.rstrip("/") for u in backend_urls if u)
+        self.fallback = fallback
+        self._traces: dict[str, tuple[int, _Trace]] = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def install(self, http_session) -> None:
+        """공용 requests.Session 에 응답 hook (백엔드 POST 가 어디서 불리든 한 곳에서)"""
+        if self._on_response not in http_session.hooks["response"]:
+            http_session.hooks["response"].append(self._on_response)
+
+    def _trace(self, sess=None) -> _Trace | None:
+        sess = sess or session_manager.current() or self.fallback
+        if sess is None:
+            return None
+        with self._lock:
+            cur = self._traces.get(sess.device_id)
+        return cur[1] if cur and cur[0] == sess.run else None
+
+    def start(self, sess, mode: str, ctx: dict, backend_base: str | None = None) -> None:
+        """같은 run 안에서 모드가 이어지면(역할 확인 → 역할놀이) 한 파일에 이어 씀"""
+        with self._lock:
+            cur = self._traces.get(sess.device_id)
+            if not cur or cur[0] != sess.run:
+                if cur:
+                    cur[1].close()
+                sid = str(ctx.get("session_id") or "none").replace("/", "_")
+                path = os.path.join(self.directory, f"{sess.device_id}-{sess.run}-{sid}.trace.gz")
+                cur = self._traces[sess.device_id] = (sess.run, _Trace(path))
+        safe = {k: ("<token>" if "token" in k else v) for k, v in ctx.items()}
+        cur[1].write("start", flush=True, mode=mode, ctx=safe, backend_base=backend_base)
+
+    def listen(self, sess, text: str, ms: int, capture: dict | None, audio: bytes | None) -> None:
+        tr = self._trace(sess)
+        if tr:
+            tr.write("listen", flush=True, text=text, ms=ms, capture=capture, audio=_b64(audio))
+
+    def say(self, sess, text: str, ms: int, clip: AudioClip | None) -> None:
+        tr = self._trace(sess)
+        if tr:
+            tr.write("say", text=text, ms=ms, fmt=clip and clip.fmt, audio=_b64(clip and clip.data))
+
+    def _on_response(self, r, *args, **kw):
+        if not r.url.startswith(self.backend_urls):
+            return r
+        tr = self._trace()
+        if tr:
+            tr.write("http", method=r.request.method, url=r.url, request=_text(r.request.body),
+                     status=r.status_code, response=r.text, ms=round(r.elapsed.total_seconds() * 1000, 1))
+        return r
+
+    def end(self, sess) -> None:
+        with self._lock:
+            cur = self._traces.get(sess.device_id)
+            if not cur or cur[0] != sess.run:
+                return
+            del self._traces[sess.device_id]
+        cur[1].write("end")
+        cur[1].close()
+
+
+def load(path: str) -> list[dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# ===== 재생 =====
+class Player:
+    """기록된 listen/say/http 를 순서대로 돌려줌. 대기 시간은 원래 ms / speed"""
+
+    def __init__(self, events: list[dict], speed: float = 1.0, on_exhausted=None):
+        self.speed = speed
+        self.on_exhausted = on_exhausted
+        self.listens = deque(e for e in events if e["kind"] == "listen")
+        self.says = deque(e for e in events if e["kind"] == "say")
+        self.http: dict[tuple, deque] = {}
+        for e in events:
+            if e["kind"] == "http":
+                self.http.setdefault((e["method"], urlsplit(e["url"]).path), deque()).append(e)
+        self.turns: list[dict] = []        # listen 마다 재생 시각/대기
+        self.mismatch = {"say": 0, "http_missing": 0}
+        self._waited = 0.0
+        self._lock = threading.Lock()
+
+    def _wait(self, ms: float) -> None:
+        sec = ms / 1000 / self.speed
+        with self._lock:
+            self._waited += sec
+        time.sleep(sec)
+
+    def listen(self) -> str:
+        if not self.listens:
+            if self.on_exhausted:
+                self.on_exhausted()
+            return ""
+        e = self.listens.popleft()
+        t = time.perf_counter()
+        self._wait(e["ms"])
+        with self._lock:
+            waited, self._waited = self._waited, 0.0
+        self.turns.append({"start": t, "end": time.perf_counter(), "waited_before": waited - e["ms"] / 1000 / self.speed})
+        return e["text"]
+
+    def say(self, text: str) -> None:
+        e = self.says.popleft() if self.says else None
+        if not e or e["text"] != text:
+            self.mismatch["say"] += 1
+        self._wait(e["ms"] if e else 0)
+
+    def respond(self, method: str, url: str) -> dict:
+        q = self.http.get((method, urlsplit(url).path))   # 주소(BACKEND_BASE/SERVER_URL)는 달라도 경로로
+        if not q:
+            self.mismatch["http_missing"] += 1
+            return {"status": 599, "response": json.dumps({"status": "error", "message": "trace 에 없는 요청"}), "ms": 0}
+        e = q.popleft()
+        self._wait(e["ms"])
+        return e
+
+
+class ReplayProvider(AudioProvider):
+    name = "replay"
+    capabilities = frozenset({TTS, STT})
+
+    def __init__(self, player: Player):
+        self.player = player
+
+    def say(self, text, out_dev=None, tag=None):
+        self.player.say(text)
+
+    def listen(self, seconds, in_dev=None, tag=None, hangover=0.8, out_dev=None):
+        return self.player.listen()
+
+
+def _adapter(player: Player):
+    import requests
+    from requests.adapters import BaseAdapter
+
+    class ReplayAdapter(BaseAdapter):
+        def send(self, request, **kw):
+            e = player.respond(request.method, request.url)
+            resp = requests.models.Response()
+            resp.status_code = e["status"]
+            resp._content = (e.get("response") or "").encode("utf-8")
+            resp.encoding = "utf-8"
+            resp.headers["Content-Type"] = "application/json"
+            resp.url, resp.request = request.url, request
+            return resp
+
+        def close(self):
+            pass
+
+    return ReplayAdapter()
+
+
+def _turn_table(events: list[dict], player: Player) -> list[dict]:
+    """턴 처리 시간 = listen 이 끝난 뒤 다음 listen 이 시작될 때까지 (원래 / 재생 / 재생 중 로컬)"""
+    lis = [e for e in events if e["kind"] == "listen"]
+    rows = []
+    for i in range(min(len(lis), len(player.turns)) - 1):
+        orig = (lis[i + 1]["t"] - lis[i + 1]["ms"] / 1000) - lis[i]["t"]
+        replay = player.turns[i + 1]["start"] - player.turns[i]["end"]
+        waited = player.turns[i + 1]["waited_before"]
+        rows.append({"turn": i + 1, "text": lis[i]["text"], "orig_ms": round(orig * 1000),
+                     "replay_ms": round(replay * 1000), "local_ms": round((replay - waited) * 1000, 1)})
+    return rows
+
+
+def replay(path: str, speed: float = 1.0) -> dict:
+    import tempfile
+    events = load(path)
+    start = next(e for e in events if e["kind"] == "start")
+    tmp = tempfile.mkdtemp(prefix="replay_")
+    os.environ.update({
+        "BACKEND_BASE": start.get("backend_base") or "http://127.0.0.1:8080", "TRACE_DIR": "",
+        "JOURNAL_PATH": "off", "TELEMETRY": "0", "CAPTURE_STATS_PATH": "off", "CAPTURE_RING": "0",
+        "PLAYBACK_DAEMON": "0", "THINKING_EARCON": "0", "WAKE_WORD": "0", "QUIZ_LOCAL": "off",
+        "QUIZ_BANK_PATH": os.path.join(tmp, "quiz_bank.json"), "QUIZ_OUTBOX_PATH": os.path.join(tmp, "outbox.jsonl"),
+    })
+    import pi_controller as pc
+    import http_client
+
+    sess = pc.sessions.default
+    player = Player(events, speed, on_exhausted=lambda: sess.stop_event.set())
+    prov = ReplayProvider(player)
+    pc._TTS, pc._STT, pc._TTS_SRC, pc._STT_SRC = prov, prov, "replay", "replay"
+    adapter = _adapter(player)
+    http_client.session().mount("http://", adapter)
+    http_client.session().mount("https://", adapter)
+
+    modes = {m.name: m for m in (pc.ROLEPLAY, pc.CONVERSATION, pc.CHOSUNG_QUIZ, pc.SAFETY_QUIZ, pc.ANIMAL_QUIZ)}
+    mode = modes[start["mode"]]
+    ctx = {k: ("replay" if v == "<token>" else v) for k, v in start["ctx"].items()}
+    pc.current_session.clear()
+    pc.current_session.update({"session_id": ctx.get("session_id"), "chatroom_id": ctx.get("chatroom_id"),
+                               "profile_id": ctx.get("profile_id"), "access_token": "replay"})
+    t0 = time.perf_counter()
+
+    def run_mode():
+        pc._run_mode(mode, **ctx)
+
+    sess.start(run_mode, mode=start["mode"])
+    sess.worker.join()
+    rows = _turn_table(events, player)
+    return {
+        "trace": os.path.basename(path), "mode": start["mode"], "speed": speed,
+        "wall_sec": round(time.perf_counter() - t0, 2), "turns": rows,
+        "local_ms_total": round(sum(r["local_ms"] for r in rows), 1),
+        "unplayed": {"listen": len(player.listens), "say": len(player.says),
+                     "http": sum(len(q) for q in player.http.values())},
+        "mismatch": player.mismatch,
+    }
+
+
+def export_wavs(path: str, out_dir: str) -> int:
+    os.makedirs(out_dir, exist_ok=True)
+    n = 0
+    for e in load(path):
+        if e["kind"] == "listen" and e.get("audio"):
+            n += 1
+            with open(os.path.join(out_dir, f"{n:03d}-{e['t']:.1f}s.wav"), "wb") as f:
+                f.write(base64.b64decode(e["audio"]))
+            with open(os.path.join(out_dir, f"{n:03d}-{e['t']:.1f}s.txt"), "w", encoding="utf-8") as f:
+                f.write(e["text"])
+    return n
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ["replay"] and len(args) >= 2:
+        speed = float(args[args.index("--speed") + 1]) if "--speed" in args else 1.0
+        r = replay(args[1], speed)
+        print(f"[REPLAY] {r['trace']} mode={r['mode']} speed={r['speed']} wall={r['wall_sec']}s")
+        for row in r["turns"]:
+            print(f"[REPLAY] turn {row['turn']:>3} orig={row['orig_ms']:>6}ms replay={row['replay_ms']:>6}ms "
+                  f"local={row['local_ms']:>7}ms  {row['text'][:30]!r}")
+        print(f"[REPLAY] local total={r['local_ms_total']}ms unplayed={r['unplayed']} mismatch={r['mismatch']}")
+        if "--out" in args:
+            with open(args[args.index("--out") + 1], "w", encoding="utf-8") as f:
+                json.dump(r, f, ensure_ascii=False, indent=2)
+    elif args[:1] == ["wavs"] and len(args) == 3:
+        print(f"[TRACE] {export_wavs(args[1], args[2])} wav 저장")
+    else:
+        print("usage: python session_trace.py replay a.trace.gz [--speed 10] [--out r.json] | wavs a.trace.gz out/")
@@ -0,0 +1,93 @@
+# startup.py
+# 부팅 후 "쓸 수 있을 때까지" 시간 측정 + 백그라운드 워밍업
+#   python startup.py   → pi_controller import 시간 분석 (python -X importtime)
+import os, sys, time, threading, subprocess
+
+
+def _process_start() -> float:
+    """프로세스 시작 시각 (time.time 기준). /proc 에서 못 읽으면 이 모듈 import 시각"""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - (uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except Exception:
+        return time.time()
+
+
+T0 = _process_start()
+_stages: list[tuple[str, float]] = []
+_ready = threading.Event()
+_ready_ms: float | None = None
+
+
+def mark(stage: str) -> None:
+    ms = (time.time() - T0) * 1000
+    _stages.append((stage, round(ms, 1)))
+    print(f"[STARTUP] {stage} +{ms:.0f}ms")
+
+
+def set_ready() -> None:
+    global _ready_ms
+    if not _ready.is_set():
+        mark("ready")
+        _ready_ms = _stages[-1][1]
+        _ready.set()
+
+
+def wait_ready(timeout: float | None = None) -> bool:
+    return _ready.wait(timeout)
+
+
+def report() -> dict:
+    return {
+        "ready": _ready.is_set(),
+        "time_to_ready_ms": _ready_ms,
+        "uptime_ms": round((time.time() - T0) * 1000, 1),
+        "stages": [{"stage": s, "ms": ms} for s, ms in _stages],
+    }
+
+
+def warm_up_in_background(steps: list) -> threading.Thread:
+    """steps: [(이름, 함수)] 를 순서대로 실행하고 끝나면 ready"""
+    def _run():
+        for name, fn in steps:
+            try:
+                fn()
+            except Exception as e:
+                print(f"[STARTUP] {name} 실패: {e}")
+            mark(name)
+        set_ready()
+    t = threading.Thread(target=_run, name="startup-warmup", daemon=True)
+    t.start()
+    return t
+
+
+# ===== import 시간 분석 =====
+def import_profile(module: str = "pi_controller", top: int = 20) -> list[tuple[int, int, str]]:
+    """python -X importtime 결과에서 누적 시간이 큰 모듈 top 개 (self_us, cumulative_us, name)"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={**os.environ, "JOURNAL_PATH": "off"},
+        capture_output=True, text=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+            rows.append((int(self_us), int(cum_us), name.rstrip()))
+        except ValueError:
+            continue
+    rows.sort(key=lambda r: r[1], reverse=True)
+    return rows[:top]
+
+
+if __name__ == "__main__":
+    mod = sys.argv[1] if len(sys.argv) > 1 else "pi_controller"
+    print(f"{'self(ms)':>9} {'cum(ms)':>9}  module")
+    for self_us, cum_us, name in import_profile(mod):
+        print(f"{self_us / 1000:9.1f} {cum_us / 1000:9.1f}  {name}")
@@ -0,0 +1,157 @@
+# telemetry.py
+# 턴 기록(전사, 정규화 텍스트, 구간별 시간, 상태)을 로컬 spool 에 모아 두었다가 gzip 묶음으로 업로드
+# - record() 는 큐에 넣기만 함 (턴 루프에 지연 0). 큐가 차면 버리고 dropped 로 셈 (backpressure)
+# - 묶음은 먼저 spool 디렉터리에 .jsonl.gz 로 써서(재시작해도 유지) 오래된 것부터 올림
+# - 업로드 실패 시 지수 backoff, spool 용량을 넘으면 가장 오래된 묶음부터 지움
+import os, io, gzip, json, time, queue, random, threading
+
+INTERVAL_SEC = float(os.getenv("TELEMETRY_INTERVAL_SEC", "15"))
+MAX_BATCH = int(os.getenv("TELEMETRY_MAX_BATCH", "200"))
+QUEUE_MAX = int(os.getenv("TELEMETRY_QUEUE_MAX", "1000"))
+SPOOL_MAX_BYTES = int(float(os.getenv("TELEMETRY_SPOOL_MB", "20")) * 1024 * 1024)
+BACKOFF_MAX_SEC = 300.0
+
+
+def _records_in(segment: str) -> int:
+    """묶음 파일명 "<시각>-<순번>-<개수>.jsonl.gz" 의 기록 수"""
+    return int(segment.rsplit("-", 1)[1].split(".")[0])
+
+
+class TelemetryUploader:
+    def __init__(self, spool_dir: str, send, interval: float = INTERVAL_SEC):
+        """send(gzip_body: bytes, count: int) — 예외 없이 끝나면 업로드 성공"""
+        self.spool_dir = spool_dir
+        self.send = send
+        self.interval = interval
+        self._q: queue.Queue = queue.Queue(maxsize=QUEUE_MAX)
+        self._wake = threading.Event()
+        self._closed = False
+        self._seq = 0
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self.counts = {"recorded": 0, "dropped": 0, "uploaded": 0, "upload_failed": 0, "spool_evicted": 0}
+        self._count_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    # ---------- 공개 API ----------
+    def start(self) -> "TelemetryUploader":
+        os.makedirs(self.spool_dir, mode=0o700, exist_ok=True)
+        self._thread = threading.Thread(target=self._loop, name="telemetry", daemon=True)
+        self._thread.start()
+        return self
+
+    def record(self, rec: dict) -> bool:
+        """턴 루프에서 부름: 절대 막히지 않음. 큐가 차 있으면 False"""
+        try:
+            self._q.put_nowait(rec)
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("recorded")
+        if self._q.qsize() >= MAX_BATCH:
+            self._wake.set()
+        return True
+
+    def flush(self) -> None:
+        """다음 주기를 기다리지 않고 바로 spool + 업로드"""
+        self._wake.set()
+
+    def close(self, timeout: float = 2.0) -> None:
+        self._closed = True
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def stats(self) -> dict:
+        segs = self._segments()
+        return {**self.counts, "queued": self._q.qsize(), "spooled_batches": len(segs),
+                "spool_bytes": sum(size for _, size in segs), "backoff_sec": round(self._backoff, 1)}
+
+    # ---------- 내부 ----------
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._count_lock:
+            self.counts[name] += n
+
+    def _loop(self) -> None:
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self._spool()
+                self._upload()
+            except Exception as e:
+                print("[TELEMETRY ERROR]", e)
+            if self._closed:
+                return
+
+    def _drain(self) -> list[dict]:
+        out = []
+        while len(out) < MAX_BATCH:
+            try:
+                out.append(self._q.get_nowait())
+            except queue.Empty:
+                break
+        return out
+
+    def _spool(self) -> None:
+        """큐에 쌓인 기록을 gzip 묶음 파일로 (MAX_BATCH 개씩)"""
+        while True:
+            batch = self._drain()
+            if not batch:
+                return
+            buf = io.BytesIO()
+            with gzip.GzipFile(fileobj=buf, mode="wb") as gz:
+                for rec in batch:
+                    gz.write((json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8"))
+            self._seq += 1
+            name = f"{time.time():.3f}-{self._seq:06d}-{len(batch)}.jsonl.gz"
+            tmp = os.path.join(self.spool_dir, name + ".tmp")
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "wb") as f:
+                f.write(buf.getvalue())
+            os.replace(tmp, os.path.join(self.spool_dir, name))
+            self._evict()
+
+    def _segments(self) -> list[tuple[str, int]]:
+        """(파일명, 크기) 오래된 순"""
+        try:
+            names = sorted(n for n in os.listdir(self.spool_dir) if n.endswith(".jsonl.gz"))
+        except FileNotFoundError:
+            return []
+        out = []
+        for n in names:
+            try:
+                out.append((n, os.path.getsize(os.path.join(self.spool_dir, n))))
+            except FileNotFoundError:
+                pass
+        return out
+
+    def _evict(self) -> None:
+        segs = self._segments()
+        total = sum(size for _, size in segs)
+        while segs and total > SPOOL_MAX_BYTES:
+            name, size = segs.pop(0)
+            os.remove(os.path.join(self.spool_dir, name))
+            total -= size
+            self._count("spool_evicted", _records_in(name))
+
+    def _upload(self) -> None:
+        if time.monotonic() < self._retry_at:
+            return
+        for name, _ in self._segments():
+            path = os.path.join(self.spool_dir, name)
+            with open(path, "rb") as f:
+                body = f.read()
+            count = _records_in(name)
+            try:
+                self.send(body, count)
+            except Exception as e:
+                self._count("upload_failed")
+                # 1, 2, 4 … 초 (최대 5분) + jitter: 네트워크가 돌아와도 여러 기기가 한꺼번에 몰리지 않게
+                self._backoff = min(BACKOFF_MAX_SEC, max(1.0, self._backoff * 2))
+                self._retry_at = time.monotonic() + self._backoff * random.uniform(0.8, 1.2)
+                print(f"[TELEMETRY] 업로드 실패 ({e}), {self._backoff:.0f}s 뒤 재시도")
+                return
+            os.remove(path)
+            self._count("uploaded", count)
+            self._backoff = 0.0
@@ -0,0 +1,5 @@
+# conftest.py
+# 저장소 루트의 평평한 모듈들(turn_machine, pi_controller ...)을 테스트에서 import 하도록
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,66 @@
+# test_emit_bridge.py
+# 워커 스레드 → hub emit 다리: 순서/깨우기 묶음, 그리고 eventlet hub 에서 턴이 subprocess/HTTP 로 막혀도 emit 지연이 평소와 같은지
+import threading
+
+import pytest
+
+import emit_bridge
+from emit_bridge import EmitBridge
+
+
+def test_thread_pump_keeps_order_and_coalesces_wakeups():
+    got, done = [], threading.Event()
+
+    def emit(event, payload):
+        got.append((event, payload))
+        if event == "last":
+            done.set()
+
+    bridge = EmitBridge(emit)
+    for i in range(50):          # pump 가 돌기 전에 몰려온 50개 → 깨우기 한 번
+        bridge.send("tick", {"i": i})
+    bridge.send("last")
+    th = threading.Thread(target=bridge.pump, daemon=True)
+    th.start()
+    assert done.wait(2)
+    wakeups = bridge.counts["wakeups"]
+    bridge.close()
+    th.join(2)
+
+    assert [p["i"] for e, p in got if e == "tick"] == list(range(50))
+    assert bridge.counts["sent"] == 51 and bridge.counts["errors"] == 0
+    assert wakeups == 1
+    assert bridge.pending() == 0
+
+
+def test_emit_error_is_counted_and_pump_keeps_going():
+    got, done = [], threading.Event()
+
+    def emit(event, payload):
+        if event == "bad":
+            raise RuntimeError("socket closed")
+        got.append(event)
+        done.set()
+
+    bridge = EmitBridge(emit)
+    th = threading.Thread(target=bridge.pump, daemon=True)
+    th.start()
+    bridge.send("bad")
+    bridge.send("good")
+    assert done.wait(2)
+    bridge.close()
+    th.join(2)
+    assert got == ["good"]
+    assert bridge.counts["errors"] == 1
+
+
+def test_eventlet_hub_emit_latency_flat_while_turn_blocked():
+    pytest.importorskip("eventlet")
+    r = emit_bridge.bench(phase_sec=0.5)
+
+    assert r["hub"] == "eventlet"
+    for phase in ("idle", "subprocess", "http"):
+        assert r[phase]["n"] >= 10, phase
+    # subprocess/HTTP 로 막힌 동안에도 p95 가 평소(idle)보다 5ms 넘게 늘지 않아야 함 (bench --bench 의 "flat" 기준)
+    for phase in ("subprocess", "http"):
+        assert r[phase]["p95"] <= r["idle"]["p95"] + 5, (phase, r)
@@ -0,0 +1,190 @@
+# test_turn_machine.py
+# Runner 의 중지/빈 입력/오류 처리와 퀴즈 모드 setup/teardown 짝 맞춤
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+from turn_machine import Mode, State, Runner, END, BACKEND, say, emit, call
+
+
+class Device:
+    """Runner 에 넣는 say/listen/notify/stopped/await_backend 가짜. heard: listen 이 차례로 돌려줄 말"""
+
+    def __init__(self, heard=(), stop_on_listen=None):
+        self.heard = list(heard)
+        self.stop_on_listen = stop_on_listen     # n 번째 listen 도중 중지 요청
+        self.said, self.events = [], []
+        self.listens = self.awaited = 0
+        self.stop = False
+
+    def say(self, text):
+        self.said.append(text)
+
+    def listen(self):
+        self.listens += 1
+        if self.listens == self.stop_on_listen:
+            self.stop = True
+        return self.heard.pop(0) if self.heard else ""
+
+    def notify(self, event, data=None):
+        self.events.append((event, data))
+
+    def stopped(self):
+        return self.stop
+
+    def await_backend(self, fn, *args):
+        self.awaited += 1
+        return fn(*args)
+
+    def runner(self):
+        return Runner(self.say, self.listen, self.notify, self.stopped, self.await_backend,
+                      log=logging.getLogger("test"))
+
+
+def echo_mode(handle, **kw):
+    """enter 에서 인사, 들은 말을 handle 로"""
+    st = {k: kw.pop(k) for k in ("on_empty", "empty_next", "on_error") if k in kw}
+    return Mode("echo", start="talk", states=[State("talk", enter=[say("안녕")], handle=handle, **st)], **kw)
+
+
+# ===== 중지 =====
+def test_stop_before_first_listen_skips_everything_but_teardown():
+    dev, torn = Device(["사과"]), []
+    dev.stop = True
+    dev.runner().run(echo_mode(lambda ctx, t: END, teardown=lambda ctx: torn.append(1)))
+    assert dev.listens == 0 and dev.said == [] and torn == [1]
+
+
+def test_stop_during_listen_drops_the_heard_text():
+    dev, handled = Device(["사과", "배"], stop_on_listen=1), []
+    dev.runner().run(echo_mode(lambda ctx, t: handled.append(t)))
+    assert handled == [] and dev.listens == 1
+
+
+def test_stop_after_handle_does_not_listen_again():
+    dev = Device(["사과", "배"])
+
+    def handle(ctx, text):
+        dev.stop = True
+
+    dev.runner().run(echo_mode(handle))
+    assert dev.listens == 1
+
+
+def test_stop_keyword_runs_on_stop_and_skips_handle():
+    dev, handled = Device(["이제 그만"]), []
+    mode = echo_mode(lambda ctx, t: handled.append(t), stop=lambda t: "stop" if "그만" in t else None,
+                     on_stop=[say("끝낼게")])
+    dev.runner().run(mode)
+    assert handled == [] and dev.said == ["안녕", "끝낼게"]
+
+
+# ===== 빈 입력 =====
+def test_empty_next_auto_confirms_without_listening_again():
+    dev = Device([""])
+    mode = Mode("confirm", start="confirm", states=[
+        State("confirm", handle=lambda ctx, t: "ask", empty_next=END,
+              on_empty=[emit("auto_confirmed"), call(lambda ctx: setattr(ctx, "confirmed", True))]),
+    ])
+    ctx = dev.runner().run(mode, confirmed=False)
+    assert ctx.confirmed and dev.listens == 1 and dev.events == [("auto_confirmed", None)]
+
+
+def test_empty_without_empty_next_listens_again():
+    dev = Device(["", "사과"])
+    got = []
+    dev.runner().run(echo_mode(lambda ctx, t: got.append(t) or END, on_empty=[say("다시")]))
+    assert got == ["사과"] and dev.said == ["안녕", "다시"] and dev.listens == 2
+
+
+# ===== 오류 =====
+def test_on_error_recovers_and_keeps_listening():
+    dev = Device(["하나", "둘"])
+
+    def handle(ctx, text):
+        if text == "하나":
+            raise RuntimeError("backend down")
+        return END
+
+    ctx = dev.runner().run(echo_mode(handle, on_error=[say("다시 말해줘")], on_fatal=[say("오류")]))
+    assert dev.said == ["안녕", "다시 말해줘"] and dev.listens == 2
+    assert isinstance(ctx.error, RuntimeError)
+
+
+def test_without_on_error_the_mode_fails_through_on_fatal():
+    dev, torn = Device(["하나", "둘"]), []
+
+    def handle(ctx, text):
+        raise RuntimeError("boom")
+
+    ctx = dev.runner().run(echo_mode(handle, on_fatal=[say("오류")], teardown=lambda ctx: torn.append(1)))
+    assert dev.said == ["안녕", "오류"] and dev.listens == 1 and torn == [1]
+    assert str(ctx.error) == "boom"
+
+
+def test_backend_state_is_awaited_and_announced():
+    dev = Device(["사과"])
+    mode = Mode("b", start="talk", states=[State("talk", handle=BACKEND)], thinking=True,
+                backend=lambda ctx, text: {"text": text}, on_reply=lambda ctx, res: END)
+    dev.runner().run(mode)
+    assert dev.awaited == 1 and ("thinking", None) in dev.events
+
+
+# ===== 퀴즈 모드: QuizRunner 를 만들면 반드시 한 번 닫음 =====
+@pytest.fixture
+def quiz(monkeypatch):
+    """pi_controller 의 초성 퀴즈 모드를 가짜 장치/백엔드로 돌림. made: 만들어진 QuizRunner 들"""
+    pytest.importorskip("flask")
+    pytest.importorskip("flask_socketio")
+    for k, v in {"TTS_PROVIDER": "stub", "STT_PROVIDER": "stub", "JOURNAL_PATH": "off", "TELEMETRY": "0",
+                 "CAPTURE_STATS_PATH": "off", "CAPTURE_RING": "0", "PLAYBACK_DAEMON": "0", "WAKE_WORD": "0",
+                 "THINKING_EARCON": "0", "QUIZ_LOCAL": "off"}.items():
+        monkeypatch.setenv(k, v)
+    import pi_controller
+
+    made = []
+
+    class SpyRunner(pi_controller.QuizRunner):
+        def __init__(self, *a, **kw):
+            super().__init__(*a, **kw)
+            self.closed = 0
+            made.append(self)
+
+        def close(self):
+            self.closed += 1
+            super().close()
+
+    monkeypatch.setattr(pi_controller, "QUIZ_LOCAL", "off")
+    monkeypatch.setattr(pi_controller, "QuizRunner", SpyRunner)
+    monkeypatch.setattr(pi_controller, "await_backend", lambda fn, *a: fn(*a))
+    monkeypatch.setattr(pi_controller, "tts_say", lambda text, *a, **kw: None)
+
+    def run(dev, replies):
+        replies = list(replies)
+
+        def talk(session_id, profile_id, text):
+            r = replies.pop(0)
+            if isinstance(r, Exception):
+                raise r
+            return r
+
+        monkeypatch.setattr(pi_controller, "backend_chosung_talk", talk)
+        return dev.runner().run(pi_controller.CHOSUNG_QUIZ, session_id="s", profile_id=1, topic=None)
+
+    return SimpleNamespace(run=run, made=made)
+
+
+@pytest.mark.parametrize("case", ["end", "stop_word", "stopped", "fatal_first", "fatal_answer"])
+def test_quiz_setup_and_teardown_pair(quiz, case):
+    ok = {"status": "ok", "message": "문제"}
+    heard, replies, stop_on = {
+        "end": (["사과"], [ok, {"status": "end", "message": "끝"}], None),
+        "stop_word": (["그만"], [ok], None),
+        "stopped": (["사과", "배"], [ok, ok, ok], 2),
+        "fatal_first": ([], [RuntimeError("down")], None),
+        "fatal_answer": (["사과"], [ok, RuntimeError("down")], None),
+    }[case]
+    ctx = quiz.run(Device(heard, stop_on_listen=stop_on), replies)
+    assert len(quiz.made) == 1 and quiz.made[0].closed == 1
+    assert (ctx.error is not None) == case.startswith("fatal")
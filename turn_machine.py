@@ -0,0 +1,178 @@
+# turn_machine.py
+# 모든 모드(초성/바른생활/동물 퀴즈, 일상 대화, 역할놀이, 역할 확인)의 턴 진행을 선언(Mode/State) + 실행기(Runner) 하나로
+# - 모드 정의: 상태마다 들어올 때 할 말/알림, 들을지, 빈 입력/종료 키워드/오류 때 할 일, 다음 상태, 백엔드 엔드포인트
+# - Runner 가 공통으로: 중지 확인(매 듣기 전/후), 상태별 처리 시간 기록(deadline.stats), 모드 고정 멘트 TTS 미리 합성
+#   → 턴 성능 기능은 Runner 에 한 번만 넣으면 모든 모드에 적용
+import time, traceback
+from types import SimpleNamespace
+
+import deadline
+
+END = "__end__"
+BACKEND = "__backend__"     # State(handle=BACKEND): Mode.backend 호출 → Mode.on_reply(ctx, res)
+
+
+# ===== 동작 (State.enter / on_empty / on_error, Mode.on_stop / on_fatal) =====
+# 값이 callable 이면 실행 시점에 ctx 로 계산
+def say(text):
+    return ("say", text)
+
+def emit(event: str, data=None):
+    return ("notify", event, data)
+
+def call(fn):
+    return ("call", fn)
+
+
+class State:
+    """한 상태
+
+    enter: 들어올 때 동작들. listen=False 면 enter 후 next 로 (state 이름 또는 callable(ctx))
+    before_listen: 매 듣기 전 동작들, prepare(text): 들은 말 전처리, text_event: 들은 말을 알릴 이벤트
+    on_empty: 빈 입력일 때 동작들 (empty_next 가 있으면 그 상태로, 없으면 다시 듣기)
+    stoppable: Mode.stop 확인 여부
+    handle(ctx, text) -> 다음 상태 (None 이면 같은 상태에서 다시 듣기, enter 는 다시 안 함)
+    on_error: handle 예외 때 동작들 (ctx.error 에 예외) 후 다시 듣기. None 이면 모드 전체 오류(Mode.on_fatal)로
+    """
+
+    def __init__(self, name: str, enter=(), listen: bool = True, next=None, before_listen=(), prepare=None,
+                 text_event: str | None = None, on_empty=(), empty_next: str | None = None, stoppable: bool = True,
+                 handle=None, on_error=None):
+        self.name = name
+        self.enter = enter
+        self.listen = listen
+        self.next = next
+        self.before_listen = before_listen
+        self.prepare = prepare
+        self.text_event = text_event
+        self.on_empty = on_empty
+        self.empty_next = empty_next
+        self.stoppable = stoppable
+        self.handle = handle
+        self.on_error = on_error
+
+
+class Mode:
+    """start: 첫 상태 이름 또는 callable(ctx). stop: text -> "stop" | None (intents.IntentMatcher)"""
+
+    def __init__(self, name: str, states: list[State], start, stop=None, on_stop=(), backend=None,
+                 awaited: bool = True, thinking: bool = False, on_reply=None, on_fatal=(), setup=None, teardown=None):
+        self.name = name
+        self.states = {s.name: s for s in states}
+        self.start = start
+        self.stop = stop
+        self.on_stop = on_stop
+        self.backend = backend          # (ctx, text) -> dict
+        self.awaited = awaited          # True: Runner 의 await_backend(earcon/필러/예산)로 감쌈
+        self.thinking = thinking        # 백엔드 호출 전 "thinking" 알림
+        self.on_reply = on_reply        # (ctx, res) -> 다음 상태
+        self.on_fatal = on_fatal
+        self.setup = setup
+        self.teardown = teardown
+
+    def phrases(self) -> list[str]:
+        """정의에 박힌 고정 멘트 (실행 전에 TTS 캐시로 미리 합성)"""
+        groups = [self.on_stop, self.on_fatal]
+        for s in self.states.values():
+            groups += [s.enter, s.before_listen, s.on_empty, s.on_error or ()]
+        return list(dict.fromkeys(a[1] for g in groups for a in g if a[0] == "say" and isinstance(a[1], str)))
+
+
+class Runner:
+    def __init__(self, say, listen, notify, stopped, await_backend, prefetch=None, log=None):
+        self._say = say
+        self._listen = listen
+        self._notify = notify
+        self._stopped = stopped
+        self._await = await_backend
+        self._prefetch = prefetch
+        self._log = log
+
+    def _warn(self, msg: str) -> None:
+        if self._log:
+            self._log.error(msg)
+        else:
+            print(msg)
+
+    def _do(self, actions, ctx) -> None:
+        for a in actions:
+            if a[0] == "say":
+                text = a[1](ctx) if callable(a[1]) else a[1]
+                if text:
+                    self._say(text)
+            elif a[0] == "notify":
+                data = a[2](ctx) if callable(a[2]) else a[2]
+                self._notify(a[1], data)
+            else:
+                a[1](ctx)
+
+    def run(self, mode: Mode, **ctx_fields) -> SimpleNamespace:
+        """모드를 끝(END)이나 중지까지 실행. ctx(세션 값 + 상태들이 채운 값)를 돌려줌"""
+        ctx = SimpleNamespace(error=None, **ctx_fields)
+        if self._prefetch:
+            self._prefetch(mode.phrases())
+        try:
+            if mode.setup:
+                mode.setup(ctx)
+            state = mode.start(ctx) if callable(mode.start) else mode.start
+            while state != END and not self._stopped():
+                deadline.stats.count(f"mode.{mode.name}.{state}")
+                st = mode.states[state]
+                self._do(st.enter, ctx)
+                if st.listen:
+                    state = self._turns(mode, st, ctx)
+                else:
+                    state = (st.next(ctx) if callable(st.next) else st.next) or END
+        except Exception as e:
+            ctx.error = e
+            self._warn(f"[{mode.name}] error: {e}\n{traceback.format_exc()}")
+            self._do(mode.on_fatal, ctx)
+        finally:
+            if mode.teardown:
+                mode.teardown(ctx)
+        return ctx
+
+    def _turns(self, mode: Mode, st: State, ctx) -> str:
+        """한 상태 안에서 다음 상태가 정해질 때까지 듣기/처리 반복"""
+        while not self._stopped():
+            self._do(st.before_listen, ctx)
+            text = self._listen()
+            if self._stopped():
+                break
+            if st.prepare:
+                text = st.prepare(text)
+            if not text:
+                deadline.stats.count(f"mode.{mode.name}.empty")
+                self._do(st.on_empty, ctx)
+                if st.empty_next:
+                    return st.empty_next
+                continue
+            if st.text_event:
+                self._notify(st.text_event, {"text": text})
+            if st.stoppable and mode.stop and mode.stop(text) == "stop":
+                self._do(mode.on_stop, ctx)
+                return END
+
+            t = time.perf_counter()
+            try:
+                nxt = self._handle(mode, st, ctx, text)
+            except Exception as e:
+                if st.on_error is None:
+                    raise
+                ctx.error = e
+                self._warn(f"[{mode.name}.{st.name}] {e}\n{traceback.format_exc()}")
+                self._do(st.on_error, ctx)
+                nxt = None
+            finally:
+                deadline.stats.record(f"state:{mode.name}.{st.name}", (time.perf_counter() - t) * 1000)
+            if nxt:
+                return nxt
+        return END
+
+    def _handle(self, mode: Mode, st: State, ctx, text: str) -> str | None:
+        if st.handle != BACKEND:
+            return st.handle(ctx, text)
+        if mode.thinking:
+            self._notify("thinking", None)
+        res = self._await(mode.backend, ctx, text) if mode.awaited else mode.backend(ctx, text)
+        return mode.on_reply(ctx, res)
@@ -0,0 +1,307 @@
+# wakeword.py
+# 항상 켜 둔 "꾸로" 호출어 감지 (iPad 없이 목소리로 세션 시작)
+# - 캡처 링(audio_capture)을 따라가며 프레임마다 RMS 만 봄 (에너지 게이트) → 평소 CPU 는 프레임당 RMS 한 번
+# - 짧은 소리 덩어리(0.25~1.2초)가 끝났을 때만 MFCC + DTW 로 녹음해 둔 "꾸로" 템플릿들과 비교
+# - 세션이 돌고 있으면(paused) 멈춤 → 대화 중 "꾸로" 에 반응하지 않음
+# 템플릿: WAKE_TEMPLATES 폴더의 wav (48k 스테레오 링 녹음 또는 16k mono). CAPTURE_SAVE_DIR 로 모은 녹음을 골라 넣으면 됨
+#   python wakeword.py --bench          → 합성 소리로 idle CPU(오디오 1초당) / 감지 지연 측정
+#   python wakeword.py --eval a.wav ... → 템플릿과의 거리 / 감지 여부
+import os, sys, glob, time, wave, threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import pcm_frames
+from pcm_frames import FRAME_BYTES, FRAME_MS, OUT_RATE
+
+TEMPLATES_DIR = os.getenv("WAKE_TEMPLATES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "wake_templates"))
+THRESHOLD = float(os.getenv("WAKE_THRESHOLD", "0")) or None    # 0 이면 템플릿끼리 거리로 자동
+SEG_MIN_SEC, SEG_MAX_SEC = 0.25, 1.2
+END_SILENCE_SEC = 0.25       # 이만큼 조용하면 덩어리 끝
+ONSET_FRAMES = 3
+GATE_FACTOR = 3.0            # 잡음 RMS 의 몇 배부터 소리
+MIN_RMS = 300.0
+COOLDOWN_SEC = 2.0
+AUTO_MARGIN = 1.3            # 자동 문턱 = 템플릿끼리 최대 거리 × 이만큼
+
+# MFCC (16k: 25ms 창 / 10ms hop, 26 mel, 13 계수)
+WIN, HOP, NFFT, MELS, CEPS = 400, 160, 512, 26, 13
+
+
+def enabled() -> bool:
+    return np is not None and os.getenv("WAKE_WORD", "1") == "1" and bool(_template_paths())
+
+
+def _template_paths() -> list[str]:
+    return sorted(glob.glob(os.path.join(TEMPLATES_DIR, "*.wav")))
+
+
+# ===== 특징 =====
+_fb = None
+_dct = None
+_win = None
+
+
+def _tables():
+    global _fb, _dct, _win
+    if _fb is None:
+        mel = lambda f: 2595 * np.log10(1 + f / 700)
+        hz = lambda m: 700 * (10 ** (m / 2595) - 1)
+        pts = hz(np.linspace(mel(60), mel(OUT_RATE / 2), MELS + 2))
+        bins = np.floor((NFFT + 1) * pts / OUT_RATE).astype(int)
+        fb = np.zeros((MELS, NFFT // 2 + 1), dtype=np.float32)
+        for i in range(MELS):
+            a, b, c = bins[i], bins[i + 1], bins[i + 2]
+            fb[i, a:b] = (np.arange(a, b) - a) / max(b - a, 1)
+            fb[i, b:c] = (c - np.arange(b, c)) / max(c - b, 1)
+        n = np.arange(MELS)
+        _dct = np.cos(np.pi / MELS * (n + 0.5)[None, :] * np.arange(CEPS)[:, None]).astype(np.float32)
+        _win = np.hamming(WIN).astype(np.float32)
+        _fb = fb
+    return _fb, _dct, _win
+
+
+def mfcc(mono16k) -> "np.ndarray":
+    """16k mono PCM → (프레임, 13) MFCC, 평균 빼기(CMN)"""
+    fb, dct, win = _tables()
+    x = np.frombuffer(mono16k, dtype="<i2").astype(np.float32)
+    x = np.append(x[:1], x[1:] - 0.97 * x[:-1])
+    n = 1 + max(0, len(x) - WIN) // HOP
+    if len(x) < WIN:
+        return np.zeros((0, CEPS), dtype=np.float32)
+    frames = np.lib.stride_tricks.as_strided(x, shape=(n, WIN), strides=(HOP * 4, 4)) * win
+    power = np.abs(np.fft.rfft(frames, NFFT)) ** 2
+    feats = np.log(power @ fb.T + 1e-6) @ dct.T
+    return feats - feats.mean(axis=0)
+
+
+def dtw(a: "np.ndarray", b: "np.ndarray") -> float:
+    """경로 길이로 나눈 DTW 거리. 걸음은 (1,1)/(1,2)/(2,1) → 행마다 이전 두 행만 보니 numpy 로 한 줄씩"""
+    n, m = len(a), len(b)
+    if not n or not m:
+        return float("inf")
+    cost = np.sqrt(np.maximum((a * a).sum(1)[:, None] + (b * b).sum(1)[None, :] - 2 * a @ b.T, 0))
+    D = np.full((n + 2, m + 2), np.inf)
+    D[1, 1] = 0.0
+    for i in range(n):
+        D[i + 2, 2:] = cost[i] + np.minimum(np.minimum(D[i + 1, 1:m + 1], D[i + 1, :m]), D[i, 1:m + 1])
+    return float(D[n + 1, m + 1] / (n + m))
+
+
+def load_pcm16k(path: str) -> bytes:
+    with wave.open(path, "rb") as w:
+        ch, rate, pcm = w.getnchannels(), w.getframerate(), w.readframes(w.getnframes())
+    if ch == 2 and rate == pcm_frames.IN_RATE:
+        return pcm_frames.to_mono16k(pcm)
+    if ch != 1 or rate != OUT_RATE:
+        raise ValueError(f"{path}: 48k 스테레오 또는 16k mono 만 ({ch}ch {rate}Hz)")
+    return pcm
+
+
+def _trim(mono16k: bytes) -> bytes:
+    """템플릿 앞뒤 무음 자르기 (20ms 프레임 RMS 가 최대의 10% 넘는 구간)"""
+    step = OUT_RATE * 2 * FRAME_MS // 1000
+    view = memoryview(mono16k)
+    levels = [pcm_frames.frame_rms(view[i:i + step], 1) for i in range(0, len(view) - step + 1, step)]
+    if not levels:
+        return mono16k
+    loud = [i for i, v in enumerate(levels) if v > max(levels) * 0.1]
+    return bytes(view[loud[0] * step:(loud[-1] + 1) * step])
+
+
+class Templates:
+    def __init__(self, pcms: list[bytes], threshold: float | None = THRESHOLD):
+        self.feats = [mfcc(_trim(p)) for p in pcms]
+        self.feats = [f for f in self.feats if len(f)]
+        pair = [dtw(a, b) for i, a in enumerate(self.feats) for b in self.feats[i + 1:]]
+        self.threshold = threshold or (max(pair) * AUTO_MARGIN if pair else 0.0)
+
+    @classmethod
+    def load(cls, paths: list[str] | None = None) -> "Templates":
+        return cls([load_pcm16k(p) for p in (paths or _template_paths())])
+
+    def score(self, mono16k: bytes) -> float:
+        f = mfcc(mono16k)
+        return min((dtw(f, t) for t in self.feats), default=float("inf"))
+
+
+# ===== 감지기 =====
+class WakeDetector:
+    """source: CaptureRing (frame/read/time_of/_wait_for/total). on_wake(info) 는 감지 스레드에서 불림"""
+
+    def __init__(self, source, templates: Templates, on_wake, paused=None):
+        self.source = source
+        self.templates = templates
+        self.on_wake = on_wake
+        self.paused = paused or (lambda: False)
+        self.floor = None
+        self.counts = {"frames": 0, "segments": 0, "detections": 0, "rejected": 0}
+        self.last: dict = {}
+        self._cpu = 0.0
+        self._t0 = time.perf_counter()
+        self._closed = False
+        self._cool_until = 0.0
+        self._reset()
+
+    def _reset(self) -> None:
+        self._run, self._start, self._last_voice = 0, None, None
+
+    # ---------- 프레임 처리 (idle 에는 RMS 한 번) ----------
+    def feed(self, pos: int) -> None:
+        self.counts["frames"] += 1
+        rms = pcm_frames.frame_rms(self.source.frame(pos))
+        if self.floor is None:
+            self.floor = rms
+        gate = max(MIN_RMS, self.floor * GATE_FACTOR)
+        if rms > gate:
+            self._run += 1
+            self._last_voice = pos + FRAME_BYTES
+            if self._start is None and self._run >= ONSET_FRAMES:
+                self._start = pos - (ONSET_FRAMES - 1) * FRAME_BYTES
+        else:
+            self._run = 0
+            if self._start is None:
+                self.floor = 0.95 * self.floor + 0.05 * rms
+        if self._start is None:
+            return
+        bps = FRAME_BYTES * 1000 // FRAME_MS
+        if pos + FRAME_BYTES - self._start > SEG_MAX_SEC * 1.5 * bps:
+            self._reset()                       # 긴 말 → 호출어 아님
+        elif pos + FRAME_BYTES - self._last_voice >= END_SILENCE_SEC * bps:
+            start, end = self._start, self._last_voice
+            self._reset()
+            if SEG_MIN_SEC * bps <= end - start <= SEG_MAX_SEC * bps:
+                self._check(start, end)
+
+    def _check(self, start: int, end: int) -> None:
+        self.counts["segments"] += 1
+        score = self.templates.score(pcm_frames.to_mono16k(self.source.read(start, end)))
+        now = time.perf_counter()
+        latency_ms = round((now - self.source.time_of(end)) * 1000)
+        self.last = {"score": round(score, 2), "threshold": round(self.templates.threshold, 2), "latency_ms": latency_ms}
+        if score <= self.templates.threshold and now >= self._cool_until:
+            self._cool_until = now + COOLDOWN_SEC
+            self.counts["detections"] += 1
+            self.on_wake(dict(self.last))
+        else:
+            self.counts["rejected"] += 1
+
+    # ---------- 스레드 ----------
+    def start(self) -> "WakeDetector":
+        threading.Thread(target=self._loop, name="wakeword", daemon=True).start()
+        return self
+
+    def close(self) -> None:
+        self._closed = True
+
+    def _loop(self) -> None:
+        pos = self.source.total
+        c0 = time.thread_time()
+        while not self._closed:
+            if self.paused():
+                self._reset()
+                time.sleep(0.2)
+                pos = self.source.total
+            elif self.source._wait_for(pos + FRAME_BYTES, timeout=1.0):
+                pos = max(pos, self.source.total - self.source.size // 2)   # 많이 밀렸으면 건너뜀
+                self.feed(pos)
+                pos += FRAME_BYTES
+            c1 = time.thread_time()
+            self._cpu += c1 - c0
+            c0 = c1
+
+    def stats(self) -> dict:
+        wall = time.perf_counter() - self._t0
+        return {**self.counts, "cpu_pct": round(self._cpu / wall * 100, 2) if wall else 0.0,
+                "threshold": round(self.templates.threshold, 2), "templates": len(self.templates.feats), "last": self.last}
+
+
+# ===== 벤치마크 =====
+class _BufferSource:
+    """녹음 버퍼를 링처럼 (오프라인 측정용)"""
+
+    def __init__(self, pcm: bytes):
+        self.pcm, self.total, self.size = pcm, len(pcm), len(pcm)
+        self._view = memoryview(pcm)
+        self.t0 = time.perf_counter()
+
+    def frame(self, pos: int) -> memoryview:
+        return self._view[pos:pos + FRAME_BYTES]
+
+    def read(self, start: int, end: int) -> bytes:
+        return self.pcm[start:end]
+
+    def time_of(self, pos: int) -> float:
+        return self.t0 + pos / (FRAME_BYTES * 1000 // FRAME_MS)
+
+
+def _synth_word(rng, stretch: float = 1.0) -> "np.ndarray":
+    """'꾸-로' 비슷한 두 음절: 포먼트 두 개가 내려가는 유성음 (48k)"""
+    out = []
+    for f1, f2, dur in ((350, 800, 0.22), (450, 900, 0.28)):
+        n = int(dur * stretch * 48000)
+        t = np.arange(n) / 48000
+        pitch = 220 * (1 - 0.15 * t / t[-1])
+        phase = 2 * np.pi * np.cumsum(pitch) / 48000
+        src = sum(np.sin(k * phase) / k for k in range(1, 12))
+        env = np.sin(np.pi * np.arange(n) / n)
+        tone = src * (np.sin(2 * np.pi * f1 * t) + 0.5 * np.sin(2 * np.pi * f2 * t))
+        out.append(np.concatenate([tone * env * 4000, np.zeros(int(0.04 * 48000))]))
+    return np.concatenate(out) + rng.normal(0, 30, sum(len(o) for o in out))
+
+
+def _stereo(x: "np.ndarray") -> bytes:
+    x = np.clip(x, -32768, 32767).astype("<i2")
+    return np.stack([x, x], axis=1).tobytes()
+
+
+def bench(idle_sec: float = 30.0) -> dict:
+    rng = np.random.default_rng(0)
+    templates = Templates([pcm_frames.to_mono16k(_stereo(_synth_word(rng, s))) for s in (0.9, 1.0, 1.1)])
+    res = {"threshold": round(templates.threshold, 2)}
+
+    # idle: 조용한 방 잡음만
+    src = _BufferSource(_stereo(rng.normal(0, 80, int(idle_sec * 48000))))
+    det = WakeDetector(src, templates, lambda info: None)
+    c0 = time.process_time()
+    for pos in range(0, src.total - FRAME_BYTES + 1, FRAME_BYTES):
+        det.feed(pos)
+    res["idle_cpu_pct"] = round((time.process_time() - c0) / idle_sec * 100, 3)   # 오디오 1초당 CPU
+
+    # 감지: 잡음 1초 + 호출어(처음 보는 길이) + 잡음 1초, 그리고 비슷한 길이의 다른 소리
+    hits = []
+    for name, word in (("wake", _synth_word(rng, 1.05)), ("other", rng.normal(0, 3000, int(0.5 * 48000)))):
+        pcm = _stereo(np.concatenate([rng.normal(0, 80, 48000), word, rng.normal(0, 80, 48000)]))
+        src = _BufferSource(pcm)
+        got = []
+        det = WakeDetector(src, templates, got.append)
+        for pos in range(0, src.total - FRAME_BYTES + 1, FRAME_BYTES):
+            t = time.perf_counter()
+            src.t0 = t - pos / (FRAME_BYTES * 1000 // FRAME_MS)     # 실시간으로 들어오는 것처럼 시각 맞춤
+            det.feed(pos)
+        hits.append((name, bool(got), det.last))
+    res["cases"] = hits
+    # 감지 지연 = 덩어리 끝(마지막 소리 프레임) → on_wake 실측. 끝 판정 무음(END_SILENCE_SEC) + 특징/DTW 가 이미 들어 있음
+    res["latency_ms"] = next((c[2].get("latency_ms") for c in hits if c[0] == "wake"), None)
+    return res
+
+
+if __name__ == "__main__":
+    if np is None:
+        print("wakeword 는 numpy 가 필요함")
+    elif sys.argv[1:2] == ["--bench"]:
+        r = bench()
+        print(f"[WAKE BENCH] idle CPU={r['idle_cpu_pct']}% of one core per audio second (threshold={r['threshold']})")
+        for name, hit, last in r["cases"]:
+            print(f"[WAKE BENCH] {name:>5}: detected={hit} {last}")
+        print(f"[WAKE BENCH] detection latency ≈ {r['latency_ms']}ms after speech end")
+    elif sys.argv[1:2] == ["--eval"] and len(sys.argv) > 2:
+        t = Templates.load()
+        print(f"[WAKE EVAL] templates={len(t.feats)} threshold={t.threshold:.2f}")
+        for p in sys.argv[2:]:
+            s = t.score(_trim(load_pcm16k(p)))
+            print(f"[WAKE EVAL] {os.path.basename(p)}: score={s:.2f} wake={s <= t.threshold}")
+    else:
+        print("usage: python wakeword.py --bench | --eval a.wav ...")
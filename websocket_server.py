@@ -13,7 +13,7 @@ async def _handler(websocket):
         async for _ in websocket:
             pass  # 클라이언트 메시지는 무시 (단방향 알림)
     finally:
-        clients.remove(websocket)
+        clients.discard(websocket)   # _broadcast 가 끊긴 클라이언트를 먼저 뺐을 수 있음 (remove 면 KeyError)
 
 async def _broadcast(msg: dict):
     if not clients: